@@ -0,0 +1,108 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable
+
+class TokenBucketLimiter:
+    """Per-key token buckets: ``rate`` tokens a second, holding at most ``burst``
+
+    Buckets are refilled lazily when touched, so idle keys cost nothing but
+    their entry; the least recently used entries are dropped beyond
+    ``max_keys`` (a dropped key simply starts again with a full bucket).
+    """
+
+    def __init__(self, rate: float, burst: int, max_keys: int = 10000):
+        if rate <= 0 or burst < 1:
+            raise ValueError("Rate must be positive and burst at least 1")
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: 'OrderedDict[Hashable, list]' = OrderedDict()  # key -> [tokens, updated_at]
+        self._lock = threading.Lock()
+
+    def acquire(self, key: Hashable) -> float:
+        """Take a token for ``key``; returns 0 if allowed, else seconds until one is available"""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [float(self.burst), now]
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return 0.0
+            return (1 - bucket[0]) / self.rate
+
+class ConcurrencyLimiter:
+    """Caps requests in flight, queueing briefly before shedding load
+
+    Up to ``limit`` callers run at once. Others wait, at most ``max_queue``
+    of them and each for at most ``queue_timeout`` seconds; anyone beyond
+    that is turned away at once. Keeping the limit at the connection pool
+    size means admitted requests never wait on the pool, so their latency
+    stays bounded while the excess is rejected quickly.
+    """
+
+    def __init__(self, limit: int, queue_timeout: float = 2.0, max_queue: int = 20):
+        if limit < 1:
+            raise ValueError("Limit must be at least 1")
+        self.limit = limit
+        self.queue_timeout = queue_timeout
+        self.max_queue = max_queue
+        self._active = 0
+        self._waiting = 0
+        self._admitted = 0
+        self._rejected = 0
+        self._cond = threading.Condition()
+
+    def acquire(self) -> bool:
+        """Take a slot, waiting up to ``queue_timeout``; False if the request should be shed"""
+        with self._cond:
+            if self._active < self.limit and not self._waiting:
+                self._active += 1
+                self._admitted += 1
+                return True
+            if self._waiting >= self.max_queue:
+                self._rejected += 1
+                return False
+            deadline = time.monotonic() + self.queue_timeout
+            self._waiting += 1
+            try:
+                while self._active >= self.limit:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._rejected += 1
+                        return False
+                    self._cond.wait(remaining)
+            finally:
+                self._waiting -= 1
+            self._active += 1
+            self._admitted += 1
+            return True
+
+    def release(self):
+        """Give back a slot taken by acquire"""
+        with self._cond:
+            self._active -= 1
+            self._cond.notify()
+
+    def retry_after(self) -> int:
+        """Seconds a shed client should wait before retrying"""
+        return max(1, math.ceil(self.queue_timeout))
+
+    def stats(self) -> Dict:
+        """Get the limit, current load and admitted/rejected counts"""
+        with self._cond:
+            return {
+                'limit': self.limit,
+                'active': self._active,
+                'waiting': self._waiting,
+                'admitted': self._admitted,
+                'rejected': self._rejected
+            }
@@ -0,0 +1,562 @@
+"""ASGI variant of the booking API, served on an asyncio Postgres pool
+
+Run with an ASGI server, e.g. ``hypercorn api.asgi:app``. Database calls go
+through AsyncDatabaseManager, so one worker keeps many requests in flight
+while they wait on Postgres. Requires POSTGRES_URL / DATABASE_URL.
+
+Only a subset of api/index.py is served here, with the same requests and
+responses: config, route info, schedules, stops, single and group
+bookings, the seat map, booking lookup and cancellation, and the admin
+login, bookings, search, stats and routes endpoints. A booking may pass the
+``hold_id`` of a hold placed through the Flask app on the same database.
+
+Not supported: seat holds, the waitlist, fare quotes, journey planning and
+multi-leg bookings, Idempotency-Key replay, rate limiting and admission
+control, ETag / 304 responses, /api/metrics and request profiling. Serve
+those from api/index.py.
+"""
+from quart import Quart, Response, request, jsonify, send_from_directory
+import asyncio
+import datetime
+import hashlib
+import json
+import os
+import sys
+import time
+from typing import Awaitable, Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api_shared import (ADMIN_CREDENTIALS, ADMIN_MAX_PAGE_SIZE, ADMIN_PAGE_SIZE, CONFIG_CHECK_INTERVAL,
+                        SEAT_HOLD_SWEEP_INTERVAL, STREAM_CHUNK_ROWS, booking_response, decode_cursor,
+                        default_config, encode_cursor)
+from async_db_manager import AsyncDatabaseManager
+from ticket_ids import TICKET_ID_ATTEMPTS, TicketIdGenerator
+
+app = Quart(__name__, static_folder='../static', static_url_path='/static')
+
+# Per-process config snapshot: (config_version, checked_at, config)
+_config_snapshot = None
+
+_ticket_ids = TicketIdGenerator()
+
+_seat_holds_swept_at = 0.0
+
+@app.before_serving
+async def startup():
+    await AsyncDatabaseManager.initialize_pool()
+
+@app.after_serving
+async def shutdown():
+    await AsyncDatabaseManager.close_pool()
+
+@app.after_request
+async def add_cors_headers(response):
+    response.headers['Access-Control-Allow-Origin'] = '*'
+    response.headers['Access-Control-Allow-Headers'] = 'Content-Type'
+    response.headers['Access-Control-Allow-Methods'] = 'GET, POST, PUT, DELETE, OPTIONS'
+    return response
+
+async def load_config() -> Dict:
+    """Load configuration through the same version-checked snapshot as DataManager.load_config"""
+    global _config_snapshot
+    try:
+        now = time.monotonic()
+        snapshot = _config_snapshot
+        if snapshot is not None and now - snapshot[1] < CONFIG_CHECK_INTERVAL:
+            return snapshot[2]
+
+        version = await AsyncDatabaseManager.get_config_version()
+        if snapshot is not None and snapshot[0] == version:
+            _config_snapshot = (version, now, snapshot[2])
+            return snapshot[2]
+
+        routes_list, stops_list, config = await asyncio.gather(
+            AsyncDatabaseManager.get_all_routes(),
+            AsyncDatabaseManager.get_all_bus_stops(),
+            AsyncDatabaseManager.get_all_config()
+        )
+        loaded = {
+            'bus_routes': {route['route_name']: float(route['fare']) for route in routes_list},
+            'bus_schedules': {route['route_name']: route['schedule'] for route in routes_list},
+            'bus_stops': {stop['city']: stop['stops'] for stop in stops_list},
+            'total_seats': int(config.get('total_seats', 50)),
+            'company_name': config.get('company_name', 'Chikukwa Bus Services'),
+            'contact_phone': config.get('contact_phone', '+263777189947'),
+            'contact_email': config.get('contact_email', 'support@chikukwabus.com')
+        }
+        _config_snapshot = (version, now, loaded)
+        return loaded
+    except Exception as e:
+        print(f"Database error: {e}")
+        if _config_snapshot is not None:
+            return _config_snapshot[2]
+        return default_config()
+
+async def sweep_seat_holds():
+    """Release expired seat holds at most once every SEAT_HOLD_SWEEP_INTERVAL seconds (see DataManager.sweep_seat_holds)"""
+    global _seat_holds_swept_at
+    now = time.monotonic()
+    if now - _seat_holds_swept_at >= SEAT_HOLD_SWEEP_INTERVAL:
+        _seat_holds_swept_at = now
+        await AsyncDatabaseManager.release_expired_seat_holds(_ticket_ids.generate)
+
+async def reserve_with_fresh_ticket_ids(reserve: Callable[[], Awaitable], bookings: List[Dict]):
+    """Run a reservation, minting new ticket IDs for ``bookings`` if one is already taken (see api/index.py)"""
+    for attempt in range(TICKET_ID_ATTEMPTS):
+        try:
+            return await reserve()
+        except Exception as e:
+            if attempt + 1 == TICKET_ID_ATTEMPTS or not AsyncDatabaseManager.is_ticket_id_conflict(e):
+                raise
+        for booking in bookings:
+            booking['ticket_id'] = _ticket_ids.generate()
+
+def invalidate_config():
+    """Drop the cached config snapshot so the next load re-checks the database"""
+    global _config_snapshot
+    _config_snapshot = None
+
+@app.route('/')
+async def index():
+    return await send_from_directory(os.path.dirname(app.root_path), 'index.html')
+
+@app.route('/api/config', methods=['GET'])
+async def get_config():
+    config = await load_config()
+    cities = sorted(set([r.split(' to ')[0] for r in config['bus_routes'].keys()] +
+                       [r.split(' to ')[1] for r in config['bus_routes'].keys()]))
+    return jsonify({
+        'cities': cities,
+        'routes': config['bus_routes'],
+        'schedules': config['bus_schedules'],
+        'stops': config['bus_stops'],
+        'total_seats': config['total_seats'],
+        'company_name': config['company_name'],
+        'contact_phone': config['contact_phone'],
+        'contact_email': config['contact_email']
+    })
+
+@app.route('/api/route-info', methods=['POST'])
+async def get_route_info():
+    data = await request.get_json()
+    departure = data.get('departure')
+    destination = data.get('destination')
+
+    if not departure or not destination:
+        return jsonify({'error': 'Missing departure or destination'}), 400
+
+    config = await load_config()
+    route = f"{departure} to {destination}"
+
+    if route not in config['bus_routes']:
+        return jsonify({'error': 'No direct route available'}), 404
+
+    return jsonify({
+        'fare': config['bus_routes'][route],
+        'schedule': config['bus_schedules'].get(route, 'N/A')
+    })
+
+@app.route('/api/bookings', methods=['POST'])
+async def create_booking():
+    data = await request.get_json()
+
+    required_fields = ['name', 'age', 'phone', 'departure', 'destination', 'date', 'time', 'seat']
+    if not all(field in data for field in required_fields):
+        return jsonify({'error': 'Missing required fields'}), 400
+
+    try:
+        age = int(data['age'])
+        if age < 1 or age > 120:
+            return jsonify({'error': 'Invalid age'}), 400
+    except:
+        return jsonify({'error': 'Invalid age format'}), 400
+
+    try:
+        travel_date = datetime.datetime.strptime(data['date'], "%Y-%m-%d").date()
+        if travel_date < datetime.date.today():
+            return jsonify({'error': 'Date must be in the future'}), 400
+    except:
+        return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+
+    config = await load_config()
+    try:
+        seat = int(data['seat'])
+        if seat < 1 or seat > config['total_seats']:
+            return jsonify({'error': f'Seat must be between 1 and {config["total_seats"]}'}), 400
+    except:
+        return jsonify({'error': 'Invalid seat number'}), 400
+
+    route = f"{data['departure']} to {data['destination']}"
+    if route not in config['bus_routes']:
+        return jsonify({'error': 'No direct route available'}), 404
+
+    booking_data = {
+        'ticket_id': _ticket_ids.generate(),
+        'name': data['name'],
+        'age': age,
+        'phone': data['phone'],
+        'email': data.get('email', ''),
+        'departure': data['departure'],
+        'destination': data['destination'],
+        'date': data['date'],
+        'time': data['time'],
+        'seat': seat,
+        'fare': config['bus_routes'][route],
+        'status': 'confirmed'
+    }
+
+    try:
+        await sweep_seat_holds()
+        # Availability check and insert happen in a single statement
+        result = await reserve_with_fresh_ticket_ids(
+            lambda: AsyncDatabaseManager.reserve_seat(booking_data, data.get('hold_id')), [booking_data])
+    except Exception as e:
+        print(f"Database error: {e}")
+        return jsonify({'error': 'Failed to create booking'}), 500
+    if result is None:
+        return jsonify({'error': 'This seat is already booked or held for this journey'}), 409
+    return jsonify(booking_response(result)), 201
+
+@app.route('/api/bookings/batch', methods=['POST'])
+async def create_group_booking():
+    data = await request.get_json() or {}
+    passengers = data.get('passengers')
+
+    required_fields = ['departure', 'destination', 'date', 'time']
+    if not all(field in data for field in required_fields) or not isinstance(passengers, list) or not passengers:
+        return jsonify({'error': 'Missing required fields'}), 400
+
+    try:
+        travel_date = datetime.datetime.strptime(data['date'], "%Y-%m-%d").date()
+        if travel_date < datetime.date.today():
+            return jsonify({'error': 'Date must be in the future'}), 400
+    except:
+        return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+
+    config = await load_config()
+    route = f"{data['departure']} to {data['destination']}"
+    if route not in config['bus_routes']:
+        return jsonify({'error': 'No direct route available'}), 404
+
+    if len(passengers) > config['total_seats']:
+        return jsonify({'error': f'A group can book at most {config["total_seats"]} seats'}), 400
+
+    fare = config['bus_routes'][route]
+    booking_list = []
+    seats = set()
+    for i, passenger in enumerate(passengers, 1):
+        if not isinstance(passenger, dict) or not all(field in passenger for field in ['name', 'age', 'phone', 'seat']):
+            return jsonify({'error': f'Passenger {i}: missing required fields'}), 400
+
+        try:
+            age = int(passenger['age'])
+        except:
+            return jsonify({'error': f'Passenger {i}: invalid age format'}), 400
+        if age < 1 or age > 120:
+            return jsonify({'error': f'Passenger {i}: invalid age'}), 400
+
+        try:
+            seat = int(passenger['seat'])
+        except:
+            return jsonify({'error': f'Passenger {i}: invalid seat number'}), 400
+        if seat < 1 or seat > config['total_seats']:
+            return jsonify({'error': f'Passenger {i}: seat must be between 1 and {config["total_seats"]}'}), 400
+        if seat in seats:
+            return jsonify({'error': f'Passenger {i}: seat {seat} is already taken by this group'}), 400
+        seats.add(seat)
+
+        booking_list.append({
+            'ticket_id': _ticket_ids.generate(),
+            'name': passenger['name'],
+            'age': age,
+            'phone': passenger['phone'],
+            'email': passenger.get('email', ''),
+            'departure': data['departure'],
+            'destination': data['destination'],
+            'date': data['date'],
+            'time': data['time'],
+            'seat': seat,
+            'fare': fare,
+            'status': 'confirmed'
+        })
+
+    try:
+        await sweep_seat_holds()
+        results = await reserve_with_fresh_ticket_ids(lambda: AsyncDatabaseManager.reserve_seats(booking_list),
+                                                      booking_list)
+    except Exception as e:
+        print(f"Database error: {e}")
+        return jsonify({'error': 'Failed to create bookings'}), 500
+    if results is None:
+        return jsonify({'error': 'One or more seats are already booked or held for this journey'}), 409
+
+    return jsonify({
+        'bookings': [booking_response(result) for result in results],
+        'total_fare': fare * len(results)
+    }), 201
+
+@app.route('/api/journeys/<departure>/<destination>/<date>/<time>/seats', methods=['GET'])
+async def get_seat_map(departure, destination, date, time):
+    try:
+        datetime.datetime.strptime(date, "%Y-%m-%d")
+    except ValueError:
+        return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+
+    config = await load_config()
+    if f"{departure} to {destination}" not in config['bus_routes']:
+        return jsonify({'error': 'No direct route available'}), 404
+
+    try:
+        await sweep_seat_holds()
+        occupied = held = 0
+        for seat in await AsyncDatabaseManager.get_occupied_seats(departure, destination, date, time):
+            occupied |= 1 << (seat - 1)
+        for seat in await AsyncDatabaseManager.get_held_seats(departure, destination, date, time):
+            held |= 1 << (seat - 1)
+        occupied |= held
+    except Exception as e:
+        print(f"Database error: {e}")
+        return jsonify({'error': 'Failed to fetch seat map'}), 500
+
+    # Bit n of occupied_bitmap (hex) is set when seat n + 1 is booked or held;
+    # held_bitmap has just the held seats
+    return jsonify({
+        'total_seats': config['total_seats'],
+        'occupied_bitmap': format(occupied, 'x'),
+        'held_bitmap': format(held, 'x'),
+        'available': config['total_seats'] - bin(occupied).count('1')
+    })
+
+@app.route('/api/bookings/<ticket_id>', methods=['GET'])
+async def get_booking(ticket_id):
+    ticket_id = TicketIdGenerator.normalize(ticket_id)
+    if not TicketIdGenerator.is_valid(ticket_id):
+        return jsonify({'error': 'Invalid ticket ID'}), 400
+    try:
+        booking = await AsyncDatabaseManager.get_booking(ticket_id)
+    except Exception as e:
+        print(f"Database error: {e}")
+        return jsonify({'error': 'Failed to fetch booking'}), 500
+    if not booking:
+        return jsonify({'error': 'Ticket not found'}), 404
+    return jsonify(booking_response(booking))
+
+@app.route('/api/bookings/<ticket_id>', methods=['DELETE'])
+async def cancel_booking(ticket_id):
+    ticket_id = TicketIdGenerator.normalize(ticket_id)
+    if not TicketIdGenerator.is_valid(ticket_id):
+        return jsonify({'error': 'Invalid ticket ID'}), 400
+
+    try:
+        booking = await AsyncDatabaseManager.get_booking(ticket_id)
+        if not booking:
+            return jsonify({'error': 'Ticket not found'}), 404
+
+        if booking['status'] == 'cancelled':
+            return jsonify({'error': 'Ticket already cancelled'}), 400
+
+        await AsyncDatabaseManager.cancel_booking(ticket_id, _ticket_ids.generate())
+        return jsonify({'message': 'Ticket cancelled successfully'})
+    except Exception as e:
+        print(f"Database error: {e}")
+        return jsonify({'error': 'Failed to cancel booking'}), 500
+
+@app.route('/api/admin/login', methods=['POST'])
+async def admin_login():
+    data = await request.get_json()
+    username = data.get('username', '').strip()
+    password = data.get('password', '').strip()
+
+    if username in ADMIN_CREDENTIALS:
+        if ADMIN_CREDENTIALS[username] == hashlib.sha256(password.encode()).hexdigest():
+            return jsonify({'success': True, 'username': username})
+
+    return jsonify({'error': 'Invalid credentials'}), 401
+
+@app.route('/api/admin/bookings', methods=['GET'])
+async def admin_get_all_bookings():
+    """List bookings, newest first (same ``limit``/``cursor`` and ``stream`` options as the Flask app)"""
+    if request.args.get('stream') == '1':
+        return await _stream_all_bookings()
+    if 'limit' in request.args or 'cursor' in request.args:
+        return await _get_bookings_page()
+
+    try:
+        bookings_list = await AsyncDatabaseManager.get_all_bookings()
+        return jsonify([booking_response(booking) for booking in bookings_list])
+    except Exception as e:
+        print(f"Database error: {e}")
+        return jsonify([])
+
+async def _get_bookings_page():
+    try:
+        limit = min(int(request.args.get('limit', ADMIN_PAGE_SIZE)), ADMIN_MAX_PAGE_SIZE)
+        if limit < 1:
+            raise ValueError
+    except ValueError:
+        return jsonify({'error': 'Invalid limit'}), 400
+
+    after = None
+    if request.args.get('cursor'):
+        try:
+            after = decode_cursor(request.args['cursor'], int)
+        except Exception:
+            return jsonify({'error': 'Invalid cursor'}), 400
+
+    try:
+        rows = await AsyncDatabaseManager.get_bookings_page(limit, after)
+    except Exception as e:
+        print(f"Database error: {e}")
+        return jsonify({'error': 'Failed to fetch bookings'}), 500
+
+    next_cursor = encode_cursor(rows[-1]['booked_at'], rows[-1]['id']) if len(rows) == limit else None
+    return jsonify({'bookings': [booking_response(row) for row in rows], 'next_cursor': next_cursor})
+
+async def _stream_all_bookings():
+    rows = AsyncDatabaseManager.iter_all_bookings()
+    try:
+        # Pull the first row up front so connection errors still get a proper status
+        first = await rows.__anext__()
+    except StopAsyncIteration:
+        first = None
+    except Exception as e:
+        print(f"Database error: {e}")
+        return jsonify({'error': 'Failed to fetch bookings'}), 500
+
+    async def generate():
+        yield '['
+        if first is None:
+            yield ']'
+            return
+        chunk = [json.dumps(booking_response(first))]
+        async for row in rows:
+            chunk.append(',' + json.dumps(booking_response(row)))
+            if len(chunk) >= STREAM_CHUNK_ROWS:
+                yield ''.join(chunk)
+                chunk = []
+        yield ''.join(chunk) + ']'
+
+    return Response(generate(), mimetype='application/json')
+
+@app.route('/api/admin/bookings/search', methods=['GET'])
+async def admin_search_bookings():
+    """Search bookings by ticket_id / phone prefix, name fragment, departure, destination and date_from/date_to"""
+    criteria = {
+        'ticket_id': request.args.get('ticket_id', '').strip().upper() or None,
+        'phone': request.args.get('phone', '').strip() or None,
+        'name': request.args.get('name', '').strip() or None,
+        'departure': request.args.get('departure', '').strip() or None,
+        'destination': request.args.get('destination', '').strip() or None,
+        'date_from': request.args.get('date_from', '').strip() or None,
+        'date_to': request.args.get('date_to', '').strip() or None,
+    }
+    if not any(criteria.values()):
+        return jsonify({'error': 'Provide at least one search filter'}), 400
+
+    for key in ('date_from', 'date_to'):
+        if criteria[key]:
+            try:
+                datetime.datetime.strptime(criteria[key], "%Y-%m-%d")
+            except ValueError:
+                return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+
+    try:
+        limit = min(int(request.args.get('limit', ADMIN_PAGE_SIZE)), ADMIN_MAX_PAGE_SIZE)
+        if limit < 1:
+            raise ValueError
+    except ValueError:
+        return jsonify({'error': 'Invalid limit'}), 400
+
+    try:
+        results = await AsyncDatabaseManager.search_bookings(limit=limit, **criteria)
+        return jsonify([booking_response(booking) for booking in results])
+    except Exception as e:
+        print(f"Database error: {e}")
+        return jsonify({'error': 'Search failed'}), 500
+
+@app.route('/api/admin/stats', methods=['GET'])
+async def admin_stats():
+    try:
+        stats, top_routes = await asyncio.gather(
+            AsyncDatabaseManager.get_booking_stats(),
+            AsyncDatabaseManager.get_top_routes(5)
+        )
+
+        return jsonify({
+            'total_bookings': int(stats['total_bookings']),
+            'confirmed': int(stats['confirmed']),
+            'cancelled': int(stats['cancelled']),
+            'total_revenue': float(stats['total_revenue']),
+            'top_routes': [{'route': r['route'], 'count': int(r['count'])} for r in top_routes]
+        })
+    except Exception as e:
+        print(f"Database error: {e}")
+        return jsonify({
+            'total_bookings': 0,
+            'confirmed': 0,
+            'cancelled': 0,
+            'total_revenue': 0,
+            'top_routes': []
+        })
+
+@app.route('/api/admin/routes', methods=['GET'])
+async def admin_get_routes():
+    config = await load_config()
+    routes = []
+    for route, fare in config['bus_routes'].items():
+        schedule = config['bus_schedules'].get(route, 'N/A')
+        routes.append({
+            'route': route,
+            'fare': fare,
+            'schedule': schedule
+        })
+    return jsonify(routes)
+
+@app.route('/api/admin/routes', methods=['PUT'])
+async def admin_update_route():
+    data = await request.get_json()
+    route = data.get('route')
+    new_fare = data.get('fare')
+
+    if not route or new_fare is None:
+        return jsonify({'error': 'Missing route or fare'}), 400
+
+    config = await load_config()
+    if route not in config['bus_routes']:
+        return jsonify({'error': 'Route not found'}), 404
+
+    try:
+        await AsyncDatabaseManager.update_route_fare(route, float(new_fare))
+        invalidate_config()
+    except Exception as e:
+        print(f"Database error: {e}")
+        return jsonify({'error': 'Failed to update route'}), 500
+
+    return jsonify({'message': 'Route updated successfully'})
+
+@app.route('/api/schedules', methods=['GET'])
+async def get_schedules():
+    config = await load_config()
+    schedules = []
+    for route, schedule in sorted(config['bus_schedules'].items()):
+        fare = config['bus_routes'].get(route, 0)
+        schedules.append({
+            'route': route,
+            'schedule': schedule,
+            'fare': fare
+        })
+    return jsonify(schedules)
+
+@app.route('/api/stops/<city>', methods=['GET'])
+async def get_stops(city):
+    config = await load_config()
+    stops = config['bus_stops'].get(city)
+
+    if not stops:
+        return jsonify({'error': 'City not found'}), 404
+
+    return jsonify({'city': city, 'stops': stops})
+
+if __name__ == '__main__':
+    app.run(debug=True)
@@ -1,15 +1,37 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, g, request, jsonify, send_from_directory, stream_with_context
 from flask_cors import CORS
-import uuid
+import functools
+import itertools
+import json
+import math
 import datetime
 import os
+import secrets
+import time
 import hashlib
+import hmac
 import sys
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional
 
 # Add parent directory to path to import db_manager
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+import metrics
+from admission import ConcurrencyLimiter, TokenBucketLimiter
+from api_shared import (ADMIN_CREDENTIALS, ADMIN_MAX_PAGE_SIZE, ADMIN_PAGE_SIZE, CONFIG_CHECK_INTERVAL,
+                        SEAT_HOLD_SWEEP_INTERVAL, STREAM_CHUNK_ROWS, booking_response, decode_cursor,
+                        default_config, encode_cursor)
+from booking_index import BookingSearchIndex
+from booking_stats import BookingStats
+from fare_matrix import FareMatrix
+from idempotency_store import IdempotencyStore
+from journey_planner import JourneyPlanner
+from request_profiler import RequestProfiler
+from seat_holds import SeatHolds
+from seat_inventory import SeatInventory
+from ticket_ids import TICKET_ID_ATTEMPTS, TicketIdGenerator
+from waitlist import Waitlist
+
 try:
     from db_manager import DatabaseManager
     USE_DATABASE = True
@@ -20,22 +42,98 @@ except ImportError:
 app = Flask(__name__, static_folder='../static', static_url_path='/static')
 CORS(app)
 
-ADMIN_CREDENTIALS = {
-    "admin": hashlib.sha256("admin123".encode()).hexdigest(),
-    "manager": hashlib.sha256("manager123".encode()).hexdigest()
-}
+FARE_QUOTE_MAX_ITEMS = 1000
+# Minutes a passenger needs to change buses on a multi-leg journey
+MIN_CONNECTION_MINUTES = int(os.environ.get('MIN_CONNECTION_MINUTES', '30'))
+
+# Use the database when one is configured. The pool connects lazily on the
+# first query, so serverless cold starts do not wait on a database handshake.
+if USE_DATABASE and not DatabaseManager.is_configured():
+    USE_DATABASE = False
 
-# Initialize database connection if available
-if USE_DATABASE:
+# Without Postgres, use the embedded SQLite backend when a file path is configured
+if not USE_DATABASE and os.environ.get('SQLITE_PATH'):
+    from sqlite_manager import SQLiteDatabaseManager as DatabaseManager
     try:
         DatabaseManager.initialize_pool()
+        USE_DATABASE = True
     except Exception as e:
         print(f"Database initialization failed: {e}")
-        USE_DATABASE = False
 
 # Fallback to in-memory storage if database is not available
 _bookings_cache = None
 _config_cache = None
+_seat_inventory = None
+_seat_holds = None
+_waitlist = None
+_search_index = None
+_booking_stats = None
+_journey_planner = None
+_fare_matrix = None
+
+# Per-process config snapshot for database mode: (config_version, checked_at, config)
+_config_snapshot = None
+
+# HTTP validators for the reference-data endpoints: (config object, etag, last_modified)
+REFERENCE_CDN_MAX_AGE = int(os.environ.get('REFERENCE_CDN_MAX_AGE', '300'))
+_config_validators = None
+
+# On-demand request profiling, off unless PROFILE_TOKEN is set
+_request_profiler = RequestProfiler(
+    token=os.environ.get('PROFILE_TOKEN'),
+    min_interval=float(os.environ.get('PROFILE_MIN_INTERVAL', '10')),
+    keep=int(os.environ.get('PROFILE_KEEP', '20'))
+)
+
+_ticket_ids = TicketIdGenerator()
+
+# Idempotency-Key replay for booking and cancellation retries
+IDEMPOTENCY_TTL = int(os.environ.get('IDEMPOTENCY_TTL', '86400'))
+IDEMPOTENCY_LOCK_TIMEOUT = 60
+IDEMPOTENCY_PURGE_INTERVAL = 60
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+IDEMPOTENCY_SECRET = os.environ.get('IDEMPOTENCY_SECRET', '').encode()
+_idempotency_store = None
+_idempotency_purged_at = 0.0
+
+# Seat holds while a customer fills in the booking form
+SEAT_HOLD_MINUTES = float(os.environ.get('SEAT_HOLD_MINUTES', '10'))
+_seat_holds_swept_at = 0.0
+
+# Per-client token buckets, as requests per minute with bursts of up to half that (0 disables)
+RATE_LIMITS = {
+    'bookings': int(os.environ.get('RATE_LIMIT_BOOKINGS', '20')),
+    'lookups': int(os.environ.get('RATE_LIMIT_LOOKUPS', '120'))
+}
+RATE_LIMITED_ENDPOINTS = {
+    'create_booking': 'bookings',
+    'create_group_booking': 'bookings',
+    'create_multi_leg_booking': 'bookings',
+    'cancel_booking': 'bookings',
+    'create_seat_hold': 'bookings',
+    'join_waitlist': 'bookings',
+    'get_route_info': 'lookups',
+    'quote_fares': 'lookups',
+    'plan_journey': 'lookups'
+}
+# Proxies in front of the app that append to X-Forwarded-For; the client is the
+# address the outermost of them saw. With none (the default outside Vercel) the
+# header is client-supplied and ignored.
+TRUSTED_PROXY_HOPS = int(os.environ.get('TRUSTED_PROXY_HOPS', '1' if os.environ.get('VERCEL') else '0'))
+_rate_limiters = {
+    group: TokenBucketLimiter(rate=per_minute / 60, burst=max(1, per_minute // 2))
+    for group, per_minute in RATE_LIMITS.items() if per_minute > 0
+}
+
+# Admission control in database mode: no more requests in flight than pooled
+# connections, so a burst queues briefly and is then shed instead of every
+# request timing out on the pool together
+ADMISSION_EXEMPT_PATHS = ('/api/metrics', '/api/admin/pool', '/api/admin/profiles')
+_admission = ConcurrencyLimiter(
+    limit=int(os.environ.get('MAX_CONCURRENT_REQUESTS') or (DatabaseManager.max_connections() if USE_DATABASE else 10)),
+    queue_timeout=float(os.environ.get('ADMISSION_QUEUE_TIMEOUT', '2')),
+    max_queue=int(os.environ.get('ADMISSION_MAX_QUEUE', '20'))
+)
 
 class DataManager:
     """Data manager that uses database when available, falls back to in-memory storage"""
@@ -45,23 +143,8 @@ class DataManager:
         """Load all bookings - returns dict for backwards compatibility"""
         if USE_DATABASE:
             try:
-                bookings_list = DatabaseManager.get_all_bookings()
-                # Convert list to dict with ticket_id as key
-                return {booking['ticket_id']: {
-                    'ticket_id': booking['ticket_id'],
-                    'name': booking['name'],
-                    'age': booking['age'],
-                    'phone': booking['phone'],
-                    'email': booking['email'],
-                    'departure': booking['departure'],
-                    'destination': booking['destination'],
-                    'date': booking['date'].isoformat() if hasattr(booking['date'], 'isoformat') else str(booking['date']),
-                    'time': booking['time'],
-                    'seat': booking['seat'],
-                    'fare': float(booking['fare']),
-                    'status': booking['status'],
-                    'booked_at': booking['booked_at'].isoformat() if hasattr(booking['booked_at'], 'isoformat') else str(booking['booked_at'])
-                } for booking in bookings_list}
+                # The database renders the ticket_id -> booking object itself
+                return json.loads(DatabaseManager.get_all_bookings_json(keyed=True))
             except Exception as e:
                 print(f"Database error: {e}")
                 return DataManager._load_from_memory()
@@ -80,37 +163,275 @@ class DataManager:
         global _bookings_cache
         _bookings_cache = bookings
     
+    @staticmethod
+    def store_booking(booking: Dict):
+        """Add a booking, whose seat is already reserved, to the in-memory store and its indexes"""
+        # Build the indexes before inserting so the new booking is not counted twice
+        search_index = DataManager.get_search_index()
+        booking_stats = DataManager.get_booking_stats()
+        DataManager._load_from_memory()[booking['ticket_id']] = booking
+        search_index.add(booking)
+        booking_stats.record(booking)
+    
+    @staticmethod
+    def get_seat_inventory() -> SeatInventory:
+        """Get the seat bitmaps for the in-memory store, built once from existing bookings"""
+        global _seat_inventory
+        if _seat_inventory is None:
+            _seat_inventory = SeatInventory.from_bookings(
+                DataManager._load_from_memory(), DataManager.load_config()['total_seats']
+            )
+        if _seat_holds is not None:
+            # Hand back seats whose holds ran out before anyone looks at availability
+            _seat_holds.expire()
+        return _seat_inventory
+    
+    @staticmethod
+    def get_seat_holds() -> SeatHolds:
+        """Get the seat holds for the in-memory store"""
+        global _seat_holds
+        if _seat_holds is None:
+            _seat_holds = SeatHolds(DataManager.get_seat_inventory(), hand_over=DataManager.hand_seat_to_waitlist)
+        return _seat_holds
+    
+    @staticmethod
+    def sweep_seat_holds():
+        """Release expired seat holds, booking their seats for waitlisted customers
+
+        In database mode this is one DELETE, run at most once every
+        SEAT_HOLD_SWEEP_INTERVAL seconds by the seat map, booking, hold and
+        waitlist endpoints; until then expired holds on waitlisted journeys
+        keep blocking their seats.
+        """
+        global _seat_holds_swept_at
+        if not USE_DATABASE:
+            if _seat_holds is not None:
+                _seat_holds.expire()
+            return
+        now = time.monotonic()
+        if now - _seat_holds_swept_at >= SEAT_HOLD_SWEEP_INTERVAL:
+            _seat_holds_swept_at = now
+            DatabaseManager.release_expired_seat_holds(_ticket_ids.generate)
+    
+    @staticmethod
+    def place_seat_hold(journey: tuple, seat: int) -> Optional[str]:
+        """Hold a seat for SEAT_HOLD_MINUTES; returns the hold ID, or None if it is booked or held"""
+        ttl = int(SEAT_HOLD_MINUTES * 60)
+        DataManager.sweep_seat_holds()
+        if USE_DATABASE:
+            hold_id = secrets.token_hex(16)
+            return hold_id if DatabaseManager.place_seat_hold(hold_id, *journey, seat, ttl) else None
+        return DataManager.get_seat_holds().place(journey, seat, ttl)
+    
+    @staticmethod
+    def release_seat_hold(hold_id: str) -> bool:
+        """Release a seat hold before it expires, booking the seat for the first waitlisted customer if any"""
+        if USE_DATABASE:
+            return DatabaseManager.release_seat_hold(hold_id, _ticket_ids.generate())
+        return DataManager.get_seat_holds().release(hold_id)
+    
+    @staticmethod
+    def get_waitlist() -> Waitlist:
+        """Get the journey waitlists for the in-memory store"""
+        global _waitlist
+        if _waitlist is None:
+            _waitlist = Waitlist()
+        return _waitlist
+    
+    @staticmethod
+    def hand_seat_to_waitlist(journey: tuple, seat: int) -> bool:
+        """Book a freed seat, still reserved in the inventory, for the journey's first waitlisted customer
+
+        Returns False, leaving the seat for the caller to release, if nobody is waiting.
+        """
+        promoted = DataManager.get_waitlist().promote(journey, _ticket_ids.generate())
+        if promoted is None:
+            return False
+        DataManager.store_booking({
+            'ticket_id': promoted['ticket_id'],
+            'name': promoted['name'],
+            'age': promoted['age'],
+            'phone': promoted['phone'],
+            'email': promoted['email'],
+            'departure': promoted['departure'],
+            'destination': promoted['destination'],
+            'date': promoted['date'],
+            'time': promoted['time'],
+            'seat': seat,
+            'fare': promoted['fare'],
+            'status': 'confirmed',
+            'booked_at': datetime.datetime.now().isoformat(),
+        })
+        return True
+    
+    @staticmethod
+    def get_search_index() -> BookingSearchIndex:
+        """Get the admin search index for the in-memory store, built once from existing bookings"""
+        global _search_index
+        if _search_index is None:
+            _search_index = BookingSearchIndex.from_bookings(DataManager._load_from_memory())
+        return _search_index
+    
+    @staticmethod
+    def get_booking_stats() -> BookingStats:
+        """Get the running booking counters for the in-memory store, built once from existing bookings"""
+        global _booking_stats
+        if _booking_stats is None:
+            _booking_stats = BookingStats.from_bookings(DataManager._load_from_memory())
+        return _booking_stats
+    
     @staticmethod
     def load_config() -> Dict:
-        """Load configuration"""
+        """Load configuration
+
+        In database mode the config is cached as a per-process snapshot keyed by
+        the ``config_version`` counter in ``system_config``. The counter is
+        re-checked at most once every ``CONFIG_CHECK_INTERVAL`` seconds, so most
+        calls cost no queries. The returned dict is shared and must not be mutated.
+        """
+        global _config_snapshot
         if USE_DATABASE:
             try:
-                # Get routes
-                routes_list = DatabaseManager.get_all_routes()
-                bus_routes = {route['route_name']: float(route['fare']) for route in routes_list}
-                bus_schedules = {route['route_name']: route['schedule'] for route in routes_list}
+                now = time.monotonic()
+                snapshot = _config_snapshot
+                if snapshot is not None and now - snapshot[1] < CONFIG_CHECK_INTERVAL:
+                    return snapshot[2]
                 
-                # Get bus stops
-                stops_list = DatabaseManager.get_all_bus_stops()
-                bus_stops = {stop['city']: stop['stops'] for stop in stops_list}
+                # Read the version before the data so a concurrent change can
+                # only ever make the snapshot look older than it is
+                version = DatabaseManager.get_config_version()
+                if snapshot is not None and snapshot[0] == version:
+                    _config_snapshot = (version, now, snapshot[2])
+                    return snapshot[2]
                 
-                # Get system config
-                config = DatabaseManager.get_all_config()
-                
-                return {
-                    'bus_routes': bus_routes,
-                    'bus_schedules': bus_schedules,
-                    'bus_stops': bus_stops,
-                    'total_seats': int(config.get('total_seats', 50)),
-                    'company_name': config.get('company_name', 'Chikukwa Bus Services'),
-                    'contact_phone': config.get('contact_phone', '+263777189947'),
-                    'contact_email': config.get('contact_email', 'support@chikukwabus.com')
-                }
+                config = DataManager._load_config_from_database()
+                _config_snapshot = (version, now, config)
+                return config
             except Exception as e:
                 print(f"Database error: {e}")
+                if _config_snapshot is not None:
+                    return _config_snapshot[2]
                 return DataManager._load_config_from_memory()
         return DataManager._load_config_from_memory()
     
+    @staticmethod
+    def _load_config_from_database() -> Dict:
+        # Get routes
+        routes_list = DatabaseManager.get_all_routes()
+        bus_routes = {route['route_name']: float(route['fare']) for route in routes_list}
+        bus_schedules = {route['route_name']: route['schedule'] for route in routes_list}
+        route_durations = {route['route_name']: route['duration_minutes'] for route in routes_list
+                           if route.get('duration_minutes') is not None}
+        
+        # Get bus stops
+        stops_list = DatabaseManager.get_all_bus_stops()
+        bus_stops = {stop['city']: stop['stops'] for stop in stops_list}
+        
+        # Get system config
+        config = DatabaseManager.get_all_config()
+        
+        return {
+            'bus_routes': bus_routes,
+            'bus_schedules': bus_schedules,
+            'route_durations': route_durations,
+            'bus_stops': bus_stops,
+            'total_seats': int(config.get('total_seats', 50)),
+            'company_name': config.get('company_name', 'Chikukwa Bus Services'),
+            'contact_phone': config.get('contact_phone', '+263777189947'),
+            'contact_email': config.get('contact_email', 'support@chikukwabus.com')
+        }
+    
+    @staticmethod
+    def invalidate_config():
+        """Drop the cached config snapshot so the next load re-checks the database"""
+        global _config_snapshot
+        _config_snapshot = None
+        DataManager._invalidate_validators()
+    
+    @staticmethod
+    def get_journey_planner() -> JourneyPlanner:
+        """Get the all-pairs journey planner, rebuilt only when the routes change"""
+        global _journey_planner
+        config = DataManager.load_config()
+        planner = _journey_planner
+        route_durations = config.get('route_durations')
+        if (planner is None or planner.bus_routes is not config['bus_routes']
+                or planner.bus_schedules is not config['bus_schedules'] or planner.route_durations is not route_durations):
+            planner = JourneyPlanner(config['bus_routes'], config['bus_schedules'], route_durations,
+                                     MIN_CONNECTION_MINUTES)
+            _journey_planner = planner
+        return planner
+    
+    @staticmethod
+    def get_fare_matrix() -> FareMatrix:
+        """Get the city-indexed fare matrix, rebuilt only when the routes change"""
+        global _fare_matrix
+        bus_routes = DataManager.load_config()['bus_routes']
+        matrix = _fare_matrix
+        if matrix is None or matrix.bus_routes is not bus_routes:
+            matrix = FareMatrix(bus_routes)
+            _fare_matrix = matrix
+        return matrix
+    
+    @staticmethod
+    def config_validators() -> tuple:
+        """Get the (etag, last_modified) pair for the current config
+
+        The etag is a hash of the config content, recomputed only when
+        load_config hands out a new snapshot; last_modified is when this
+        process first saw that content.
+        """
+        global _config_validators
+        config = DataManager.load_config()
+        validators = _config_validators
+        if validators is None or validators[0] is not config:
+            etag = hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()[:20]
+            if validators is not None and validators[1] == etag:
+                last_modified = validators[2]
+            else:
+                last_modified = datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0)
+            validators = (config, etag, last_modified)
+            _config_validators = validators
+        return validators[1], validators[2]
+    
+    @staticmethod
+    def claim_idempotency_key(key: str, request_hash: str, claim_token: str) -> Optional[Dict]:
+        """Claim an Idempotency-Key; None if claimed, else the stored (or in-progress) entry"""
+        global _idempotency_store, _idempotency_purged_at
+        if USE_DATABASE:
+            now = time.monotonic()
+            if now - _idempotency_purged_at >= IDEMPOTENCY_PURGE_INTERVAL:
+                _idempotency_purged_at = now
+                DatabaseManager.purge_idempotency_keys()
+            return DatabaseManager.claim_idempotency_key(key, request_hash, claim_token, IDEMPOTENCY_TTL,
+                                                         IDEMPOTENCY_LOCK_TIMEOUT)
+        if _idempotency_store is None:
+            _idempotency_store = IdempotencyStore()
+        return _idempotency_store.claim(key, request_hash, claim_token, IDEMPOTENCY_TTL, IDEMPOTENCY_LOCK_TIMEOUT)
+    
+    @staticmethod
+    def complete_idempotency_key(key: str, request_hash: str, claim_token: str, status_code: int, response_body: str):
+        """Store the response for an Idempotency-Key this request still holds"""
+        if USE_DATABASE:
+            DatabaseManager.complete_idempotency_key(key, request_hash, claim_token, status_code, response_body)
+        else:
+            _idempotency_store.complete(key, request_hash, claim_token, status_code, response_body)
+    
+    @staticmethod
+    def release_idempotency_key(key: str, request_hash: str, claim_token: str):
+        """Drop an Idempotency-Key this request still holds so it can be retried"""
+        if USE_DATABASE:
+            DatabaseManager.release_idempotency_key(key, request_hash, claim_token)
+        else:
+            _idempotency_store.release(key, request_hash, claim_token)
+    
+    @staticmethod
+    def _invalidate_validators():
+        # Keep the old etag so unchanged content keeps its last_modified
+        global _config_validators
+        if _config_validators is not None:
+            _config_validators = (None,) + _config_validators[1:]
+    
     @staticmethod
     def _load_config_from_memory() -> Dict:
         global _config_cache
@@ -121,71 +442,195 @@ class DataManager:
     @staticmethod
     def save_config(config: Dict):
         """Save configuration"""
-        global _config_cache
+        global _config_cache, _journey_planner, _fare_matrix
         _config_cache = config
+        _journey_planner = None
+        _fare_matrix = None
+        DataManager._invalidate_validators()
     
     @staticmethod
     def get_default_config() -> Dict:
-        return {
-            "bus_routes": {
-                "Bulawayo to Gweru": 5, "Gweru to Bulawayo": 5,
-                "Bulawayo to Kwekwe": 7, "Kwekwe to Bulawayo": 7,
-                "Bulawayo to Kadoma": 8, "Kadoma to Bulawayo": 8,
-                "Bulawayo to Chegutu": 10, "Chegutu to Bulawayo": 10,
-                "Bulawayo to Norton": 13, "Norton to Bulawayo": 13,
-                "Bulawayo to Harare": 15, "Harare to Bulawayo": 15,
-                "Gweru to Kwekwe": 3, "Kwekwe to Gweru": 3,
-                "Gweru to Kadoma": 4, "Kadoma to Gweru": 4,
-                "Gweru to Chegutu": 5, "Chegutu to Gweru": 5,
-                "Gweru to Norton": 6, "Norton to Gweru": 6,
-                "Gweru to Harare": 7, "Harare to Gweru": 7,
-                "Kwekwe to Kadoma": 2, "Kadoma to Kwekwe": 2,
-                "Kwekwe to Chegutu": 6, "Chegutu to Kwekwe": 6,
-                "Kwekwe to Norton": 9, "Norton to Kwekwe": 9,
-                "Kwekwe to Harare": 10, "Harare to Kwekwe": 10,
-                "Kadoma to Chegutu": 4, "Chegutu to Kadoma": 4,
-                "Kadoma to Norton": 5, "Norton to Kadoma": 5,
-                "Kadoma to Harare": 6, "Harare to Kadoma": 6,
-                "Chegutu to Norton": 1, "Norton to Chegutu": 1,
-                "Chegutu to Harare": 3, "Harare to Chegutu": 3,
-                "Norton to Harare": 2, "Harare to Norton": 2,
-            },
-            "bus_schedules": {
-                "Bulawayo to Gweru": "08:00 AM", "Gweru to Bulawayo": "02:00 PM",
-                "Gweru to Kwekwe": "09:00 AM", "Kwekwe to Gweru": "03:00 PM",
-                "Bulawayo to Kwekwe": "09:00 AM", "Kwekwe to Bulawayo": "03:30 PM",
-                "Kwekwe to Kadoma": "10:00 AM", "Kadoma to Kwekwe": "04:00 PM",
-                "Bulawayo to Kadoma": "10:00 AM", "Kadoma to Bulawayo": "04:30 PM",
-                "Kadoma to Chegutu": "10:30 AM", "Chegutu to Kadoma": "04:45 PM",
-                "Bulawayo to Chegutu": "11:00 AM", "Chegutu to Bulawayo": "05:00 PM",
-                "Bulawayo to Harare": "12:00 PM", "Harare to Bulawayo": "06:00 PM",
-                "Gweru to Kadoma": "09:30 AM", "Kadoma to Gweru": "02:30 PM",
-                "Gweru to Chegutu": "10:15 AM", "Chegutu to Gweru": "03:15 PM",
-                "Gweru to Norton": "11:00 AM", "Norton to Gweru": "04:00 PM",
-                "Gweru to Harare": "11:30 AM", "Harare to Gweru": "05:00 PM",
-                "Kwekwe to Chegutu": "10:45 AM", "Chegutu to Kwekwe": "04:15 PM",
-                "Kwekwe to Norton": "11:30 AM", "Norton to Kwekwe": "05:15 PM",
-                "Kwekwe to Harare": "12:15 PM", "Harare to Kwekwe": "06:15 PM",
-                "Kadoma to Norton": "11:00 AM", "Norton to Kadoma": "05:00 PM",
-                "Kadoma to Harare": "11:30 AM", "Harare to Kadoma": "05:30 PM",
-                "Chegutu to Norton": "11:45 AM", "Norton to Chegutu": "05:45 PM",
-                "Chegutu to Harare": "12:15 PM", "Harare to Chegutu": "06:15 PM",
-                "Norton to Harare": "12:30 PM", "Harare to Norton": "06:30 PM",
-            },
-            "bus_stops": {
-                "Bulawayo": "City Hall, Renkini Bus Terminus, and National Railways of Zimbabwe Station.",
-                "Gweru": "Main Street, City Centre, and Railway Station.",
-                "Kwekwe": "City Centre, Kwekwe Mall, and Railway Station.",
-                "Kadoma": "City Centre, Kadoma Mall, and Railway Station.",
-                "Chegutu": "City Centre, Chegutu Mall, and Railway Station.",
-                "Norton": "Main Street, Town Centre, and near the Post Office.",
-                "Harare": "City Centre, Avondale, and Mbare Musika Bus Terminus."
-            },
-            "total_seats": 50,
-            "company_name": "Chikukwa Bus Services",
-            "contact_phone": "+263777189947",
-            "contact_email": "support@chikukwabus.com"
-        }
+        return default_config()
+
+def _idempotency_scope(key: str) -> str:
+    """Scope an Idempotency-Key to the client that sent it
+
+    Keys are chosen by clients, so two clients may pick the same one; the
+    stored key is an HMAC of the client ID and the key, which also keeps
+    raw keys and client addresses out of the store.
+    """
+    return hmac.new(IDEMPOTENCY_SECRET, f"{_client_id()}\n{key}".encode(), hashlib.sha256).hexdigest()
+
+def idempotent(view):
+    """Replay the stored response when a request repeats its Idempotency-Key
+
+    The first request with a key claims it and runs; its response is stored
+    for IDEMPOTENCY_TTL seconds. Repeats get that response back without
+    running the handler, a repeat that arrives while the first is still
+    running gets 409, and reusing a key for a different request gets 422.
+    Server errors are not stored, so those requests can be retried.
+
+    Keys are scoped to the client (see _idempotency_scope), and each claim
+    carries a random token, so a request whose claim was taken over after
+    IDEMPOTENCY_LOCK_TIMEOUT cannot store or drop the new owner's entry.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if not key:
+            return view(*args, **kwargs)
+        if len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+            return jsonify({'error': f'Idempotency-Key must be at most {IDEMPOTENCY_KEY_MAX_LENGTH} characters'}), 400
+        
+        key = _idempotency_scope(key)
+        request_hash = hashlib.sha256(
+            b'\n'.join([request.method.encode(), request.path.encode(), request.get_data()])
+        ).hexdigest()
+        claim_token = secrets.token_hex(16)
+        try:
+            stored = DataManager.claim_idempotency_key(key, request_hash, claim_token)
+        except Exception as e:
+            print(f"Database error: {e}")
+            return jsonify({'error': 'Failed to process request'}), 500
+        
+        if stored is not None:
+            if stored['request_hash'] != request_hash:
+                return jsonify({'error': 'Idempotency-Key was already used for a different request'}), 422
+            if stored['status_code'] is None:
+                return jsonify({'error': 'A request with this Idempotency-Key is still being processed'}), 409, {'Retry-After': '1'}
+            return Response(stored['response_body'], status=stored['status_code'], mimetype='application/json',
+                            headers={'Idempotent-Replayed': 'true'})
+        
+        try:
+            response = app.make_response(view(*args, **kwargs))
+        except Exception:
+            DataManager.release_idempotency_key(key, request_hash, claim_token)
+            raise
+        try:
+            if response.status_code >= 500:
+                DataManager.release_idempotency_key(key, request_hash, claim_token)
+            else:
+                DataManager.complete_idempotency_key(key, request_hash, claim_token, response.status_code,
+                                                     response.get_data(as_text=True))
+        except Exception as e:
+            print(f"Database error: {e}")
+        return response
+    return wrapper
+
+def _reference_response(build, public: bool = True):
+    """Serve config-derived data with ETag/Last-Modified, answering revalidations with 304
+
+    ``build`` is only called when the client's copy is stale. Public data may
+    be cached at the edge for REFERENCE_CDN_MAX_AGE seconds; browsers always
+    revalidate, which costs a 304 and no database work.
+    """
+    etag, last_modified = DataManager.config_validators()
+    if request.if_none_match:
+        not_modified = request.if_none_match.contains_weak(etag)
+    else:
+        not_modified = request.if_modified_since is not None and request.if_modified_since >= last_modified
+    
+    response = Response(status=304) if not_modified else app.make_response(build())
+    if response.status_code not in (200, 304):
+        return response
+    
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    if public:
+        response.headers['Cache-Control'] = (f'public, max-age=0, must-revalidate, s-maxage={REFERENCE_CDN_MAX_AGE}, '
+                                             f'stale-while-revalidate={REFERENCE_CDN_MAX_AGE}')
+    else:
+        response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+@app.before_request
+def _start_request_timer():
+    g.request_started = time.perf_counter()
+
+def _profile_token() -> Optional[str]:
+    # Header only: a query string ends up in access logs, proxies and browser history
+    return request.headers.get('X-Profile-Token')
+
+def _client_id() -> str:
+    # Each trusted proxy appends the address it received from, so entries left
+    # of the last TRUSTED_PROXY_HOPS may be forged by the client
+    if TRUSTED_PROXY_HOPS:
+        forwarded = [hop.strip() for hop in request.headers.get('X-Forwarded-For', '').split(',') if hop.strip()]
+        if forwarded:
+            return forwarded[-min(TRUSTED_PROXY_HOPS, len(forwarded))]
+    return request.remote_addr or 'unknown'
+
+@app.before_request
+def _limit_rate():
+    limiter = _rate_limiters.get(RATE_LIMITED_ENDPOINTS.get(request.endpoint))
+    if limiter is None:
+        return None
+    wait = limiter.acquire((_client_id(), request.endpoint))
+    if wait:
+        return (jsonify({'error': 'Too many requests, please slow down'}), 429,
+                {'Retry-After': str(max(1, math.ceil(wait)))})
+    return None
+
+@app.before_request
+def _admit_request():
+    if not USE_DATABASE or not request.path.startswith('/api/') or request.path.startswith(ADMISSION_EXEMPT_PATHS):
+        return None
+    if not _admission.acquire():
+        return (jsonify({'error': 'Service is busy, please try again shortly'}), 503,
+                {'Retry-After': str(_admission.retry_after())})
+    g.admitted = True
+    return None
+
+@app.teardown_request
+def _release_admission(error=None):
+    if g.pop('admitted', False):
+        _admission.release()
+
+@app.before_request
+def _start_profile():
+    # Requests that carry the profile token in X-Profile-Token run under cProfile
+    if not _request_profiler.enabled or request.path.startswith('/api/admin/profiles'):
+        return
+    token = _profile_token()
+    if not token:
+        return
+    if not _request_profiler.authorized(token):
+        g.profile_skipped = 'unauthorized'
+        return
+    g.profile, g.profile_skipped = _request_profiler.begin()
+
+@app.after_request
+def _finish_profile(response):
+    profile = g.pop('profile', None)
+    if profile is None:
+        skipped = g.pop('profile_skipped', None)
+        if skipped:
+            response.headers['X-Profile-Skipped'] = skipped
+        return response
+    record = _request_profiler.end(profile, request.method, request.path, response.status_code)
+    if (request.headers.get('X-Profile-Output') or request.args.get('profile_output')) == 'inline':
+        # Serverless instances may not serve the follow-up download, so the report can replace the body
+        response = Response(record['report'], mimetype='text/plain')
+        response.headers['X-Profile-Response-Status'] = str(record['status'])
+    response.headers['X-Profile-Id'] = record['id']
+    response.headers['X-Profile-Url'] = f"/api/admin/profiles/{record['id']}"
+    return response
+
+@app.teardown_request
+def _abort_profile(error=None):
+    # after_request does not run when an exception propagates; never leave the profiler on
+    profile = g.pop('profile', None)
+    if profile is not None:
+        _request_profiler.abort(profile)
+
+@app.after_request
+def _record_request_metrics(response):
+    # Label by URL rule ("/api/bookings/<ticket_id>"), not path, to keep series bounded
+    started = g.pop('request_started', None)
+    if started is not None:
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.observe_request(request.method, endpoint, response.status_code, time.perf_counter() - started)
+    return response
 
 @app.route('/')
 def index():
@@ -193,19 +638,21 @@ def index():
 
 @app.route('/api/config', methods=['GET'])
 def get_config():
-    config = DataManager.load_config()
-    cities = sorted(set([r.split(' to ')[0] for r in config['bus_routes'].keys()] +
-                       [r.split(' to ')[1] for r in config['bus_routes'].keys()]))
-    return jsonify({
-        'cities': cities,
-        'routes': config['bus_routes'],
-        'schedules': config['bus_schedules'],
-        'stops': config['bus_stops'],
-        'total_seats': config['total_seats'],
-        'company_name': config['company_name'],
-        'contact_phone': config['contact_phone'],
-        'contact_email': config['contact_email']
-    })
+    def build():
+        config = DataManager.load_config()
+        cities = sorted(set([r.split(' to ')[0] for r in config['bus_routes'].keys()] +
+                           [r.split(' to ')[1] for r in config['bus_routes'].keys()]))
+        return jsonify({
+            'cities': cities,
+            'routes': config['bus_routes'],
+            'schedules': config['bus_schedules'],
+            'stops': config['bus_stops'],
+            'total_seats': config['total_seats'],
+            'company_name': config['company_name'],
+            'contact_phone': config['contact_phone'],
+            'contact_email': config['contact_email']
+        })
+    return _reference_response(build)
 
 @app.route('/api/route-info', methods=['POST'])
 def get_route_info():
@@ -227,7 +674,62 @@ def get_route_info():
         'schedule': config['bus_schedules'].get(route, 'N/A')
     })
 
+@app.route('/api/fares/quote', methods=['POST'])
+def quote_fares():
+    """Price many direct trips in one call: ``{"quotes": [{"departure", "destination", "passengers"}, ...]}``"""
+    data = request.json or {}
+    quotes = data.get('quotes')
+    if not isinstance(quotes, list) or not quotes:
+        return jsonify({'error': 'Missing quotes'}), 400
+    if len(quotes) > FARE_QUOTE_MAX_ITEMS:
+        return jsonify({'error': f'At most {FARE_QUOTE_MAX_ITEMS} quotes per request'}), 400
+    
+    # A trip cannot carry more passengers than the bus has seats
+    max_passengers = DataManager.load_config()['total_seats']
+    departures, destinations, passengers = [], [], []
+    for i, quote in enumerate(quotes, 1):
+        if not isinstance(quote, dict) or not quote.get('departure') or not quote.get('destination'):
+            return jsonify({'error': f'Quote {i}: missing departure or destination'}), 400
+        try:
+            count = int(quote.get('passengers', 1))
+        except (TypeError, ValueError, OverflowError):
+            return jsonify({'error': f'Quote {i}: invalid passengers'}), 400
+        if count < 1 or count > max_passengers:
+            return jsonify({'error': f'Quote {i}: passengers must be between 1 and {max_passengers}'}), 400
+        departures.append(quote['departure'])
+        destinations.append(quote['destination'])
+        passengers.append(count)
+    
+    totals = DataManager.get_fare_matrix().quote(departures, destinations, passengers)
+    results = []
+    for departure, destination, count, total in zip(departures, destinations, passengers, totals):
+        result = {'departure': departure, 'destination': destination, 'passengers': count}
+        if total is None:
+            result['error'] = 'No direct route available'
+        else:
+            result['fare'] = total / count
+            result['total'] = total
+        results.append(result)
+    
+    return jsonify({'quotes': results})
+
+def _reserve_with_fresh_ticket_ids(reserve: Callable, bookings: List[Dict]):
+    """Run a database reservation, minting new ticket IDs for ``bookings`` if one is already taken
+
+    Another instance without a distinct TICKET_WORKER_ID can mint the same ID;
+    the failed insert is rolled back, so it is simply tried again.
+    """
+    for attempt in range(TICKET_ID_ATTEMPTS):
+        try:
+            return reserve()
+        except Exception as e:
+            if attempt + 1 == TICKET_ID_ATTEMPTS or not DatabaseManager.is_ticket_id_conflict(e):
+                raise
+        for booking in bookings:
+            booking['ticket_id'] = _ticket_ids.generate()
+
 @app.route('/api/bookings', methods=['POST'])
+@idempotent
 def create_booking():
     data = request.json
     
@@ -262,17 +764,11 @@ def create_booking():
         return jsonify({'error': 'No direct route available'}), 404
     
     fare = config['bus_routes'][route]
-    ticket_id = str(uuid.uuid4())[:8].upper()
+    ticket_id = _ticket_ids.generate()
     
     if USE_DATABASE:
         try:
-            # Check seat availability
-            if not DatabaseManager.check_seat_availability(
-                data['departure'], data['destination'], data['date'], data['time'], seat
-            ):
-                return jsonify({'error': 'This seat is already booked for this journey'}), 409
-            
-            # Create booking
+            DataManager.sweep_seat_holds()
             booking_data = {
                 'ticket_id': ticket_id,
                 'name': data['name'],
@@ -288,40 +784,25 @@ def create_booking():
                 'status': 'confirmed'
             }
             
-            result = DatabaseManager.create_booking(booking_data)
+            # Availability check and insert happen in a single statement,
+            # which also renders the response body
+            result = _reserve_with_fresh_ticket_ids(
+                lambda: DatabaseManager.reserve_seat_json(booking_data, data.get('hold_id')), [booking_data])
+            if result is None:
+                return jsonify({'error': 'This seat is already booked or held for this journey'}), 409
             
-            # Convert datetime objects to strings for JSON response
-            return jsonify({
-                'ticket_id': result['ticket_id'],
-                'name': result['name'],
-                'age': result['age'],
-                'phone': result['phone'],
-                'email': result.get('email', ''),
-                'departure': result['departure'],
-                'destination': result['destination'],
-                'date': result['date'].isoformat() if hasattr(result['date'], 'isoformat') else str(result['date']),
-                'time': result['time'],
-                'seat': result['seat'],
-                'fare': float(result['fare']),
-                'status': result['status'],
-                'booked_at': result['booked_at'].isoformat() if hasattr(result['booked_at'], 'isoformat') else str(result['booked_at'])
-            }), 201
+            return Response(result, status=201, mimetype='application/json')
         except Exception as e:
             print(f"Database error: {e}")
             return jsonify({'error': 'Failed to create booking'}), 500
     else:
         # Fallback to in-memory storage
-        bookings = DataManager.load_bookings()
-        
-        # Check seat availability
-        for booking in bookings.values():
-            if (booking['departure'] == data['departure'] and 
-                booking['destination'] == data['destination'] and
-                booking['date'] == data['date'] and
-                booking['time'] == data['time'] and
-                booking['seat'] == seat and
-                booking.get('status') != 'cancelled'):
-                return jsonify({'error': 'This seat is already booked for this journey'}), 409
+        # Check and claim the seat in one step; a live hold already has it claimed,
+        # an expired one falls back to an ordinary reservation
+        journey = (data['departure'], data['destination'], data['date'], data['time'])
+        held = bool(data.get('hold_id')) and DataManager.get_seat_holds().consume(data['hold_id'], journey, seat)
+        if not held and not DataManager.get_seat_inventory().reserve(journey, seat):
+            return jsonify({'error': 'This seat is already booked or held for this journey'}), 409
         
         booking_data = {
             'ticket_id': ticket_id,
@@ -339,36 +820,439 @@ def create_booking():
             'booked_at': datetime.datetime.now().isoformat(),
         }
         
-        bookings[ticket_id] = booking_data
-        DataManager.save_bookings(bookings)
+        DataManager.store_booking(booking_data)
         
         return jsonify(booking_data), 201
 
+@app.route('/api/bookings/batch', methods=['POST'])
+@idempotent
+def create_group_booking():
+    data = request.json or {}
+    passengers = data.get('passengers')
+    
+    required_fields = ['departure', 'destination', 'date', 'time']
+    if not all(field in data for field in required_fields) or not isinstance(passengers, list) or not passengers:
+        return jsonify({'error': 'Missing required fields'}), 400
+    
+    try:
+        travel_date = datetime.datetime.strptime(data['date'], "%Y-%m-%d").date()
+        if travel_date < datetime.date.today():
+            return jsonify({'error': 'Date must be in the future'}), 400
+    except:
+        return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+    
+    config = DataManager.load_config()
+    route = f"{data['departure']} to {data['destination']}"
+    if route not in config['bus_routes']:
+        return jsonify({'error': 'No direct route available'}), 404
+    
+    if len(passengers) > config['total_seats']:
+        return jsonify({'error': f'A group can book at most {config["total_seats"]} seats'}), 400
+    
+    fare = config['bus_routes'][route]
+    booking_list = []
+    seats = set()
+    for i, passenger in enumerate(passengers, 1):
+        if not isinstance(passenger, dict) or not all(field in passenger for field in ['name', 'age', 'phone', 'seat']):
+            return jsonify({'error': f'Passenger {i}: missing required fields'}), 400
+        
+        try:
+            age = int(passenger['age'])
+        except:
+            return jsonify({'error': f'Passenger {i}: invalid age format'}), 400
+        if age < 1 or age > 120:
+            return jsonify({'error': f'Passenger {i}: invalid age'}), 400
+        
+        try:
+            seat = int(passenger['seat'])
+        except:
+            return jsonify({'error': f'Passenger {i}: invalid seat number'}), 400
+        if seat < 1 or seat > config['total_seats']:
+            return jsonify({'error': f'Passenger {i}: seat must be between 1 and {config["total_seats"]}'}), 400
+        if seat in seats:
+            return jsonify({'error': f'Passenger {i}: seat {seat} is already taken by this group'}), 400
+        seats.add(seat)
+        
+        booking_list.append({
+            'ticket_id': _ticket_ids.generate(),
+            'name': passenger['name'],
+            'age': age,
+            'phone': passenger['phone'],
+            'email': passenger.get('email', ''),
+            'departure': data['departure'],
+            'destination': data['destination'],
+            'date': data['date'],
+            'time': data['time'],
+            'seat': seat,
+            'fare': fare,
+            'status': 'confirmed'
+        })
+    
+    if USE_DATABASE:
+        try:
+            DataManager.sweep_seat_holds()
+            results = _reserve_with_fresh_ticket_ids(lambda: DatabaseManager.reserve_seats(booking_list), booking_list)
+            if results is None:
+                return jsonify({'error': 'One or more seats are already booked or held for this journey'}), 409
+            booking_list = [booking_response(result) for result in results]
+        except Exception as e:
+            print(f"Database error: {e}")
+            return jsonify({'error': 'Failed to create bookings'}), 500
+    else:
+        # Claim every seat first and roll back the claims if any one is taken
+        inventory = DataManager.get_seat_inventory()
+        journey = (data['departure'], data['destination'], data['date'], data['time'])
+        reserved = []
+        for booking in booking_list:
+            if not inventory.reserve(journey, booking['seat']):
+                for seat in reserved:
+                    inventory.release(journey, seat)
+                return jsonify({'error': 'One or more seats are already booked or held for this journey'}), 409
+            reserved.append(booking['seat'])
+        
+        booked_at = datetime.datetime.now().isoformat()
+        for booking in booking_list:
+            booking['booked_at'] = booked_at
+            DataManager.store_booking(booking)
+    
+    return jsonify({
+        'bookings': booking_list,
+        'total_fare': fare * len(booking_list)
+    }), 201
+
+@app.route('/api/holds', methods=['POST'])
+def create_seat_hold():
+    """Hold a seat for SEAT_HOLD_MINUTES while the customer fills in the booking form"""
+    data = request.json or {}
+    
+    required_fields = ['departure', 'destination', 'date', 'time', 'seat']
+    if not all(field in data for field in required_fields):
+        return jsonify({'error': 'Missing required fields'}), 400
+    
+    try:
+        travel_date = datetime.datetime.strptime(data['date'], "%Y-%m-%d").date()
+        if travel_date < datetime.date.today():
+            return jsonify({'error': 'Date must be in the future'}), 400
+    except:
+        return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+    
+    config = DataManager.load_config()
+    try:
+        seat = int(data['seat'])
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Invalid seat number'}), 400
+    if seat < 1 or seat > config['total_seats']:
+        return jsonify({'error': f'Seat must be between 1 and {config["total_seats"]}'}), 400
+    
+    if f"{data['departure']} to {data['destination']}" not in config['bus_routes']:
+        return jsonify({'error': 'No direct route available'}), 404
+    
+    journey = (data['departure'], data['destination'], data['date'], data['time'])
+    try:
+        hold_id = DataManager.place_seat_hold(journey, seat)
+    except Exception as e:
+        print(f"Database error: {e}")
+        return jsonify({'error': 'Failed to hold seat'}), 500
+    if hold_id is None:
+        return jsonify({'error': 'This seat is already booked or held for this journey'}), 409
+    
+    ttl = int(SEAT_HOLD_MINUTES * 60)
+    expires_at = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=ttl)
+    return jsonify({
+        'hold_id': hold_id,
+        'departure': data['departure'],
+        'destination': data['destination'],
+        'date': data['date'],
+        'time': data['time'],
+        'seat': seat,
+        'expires_in': ttl,
+        'expires_at': expires_at.replace(microsecond=0).isoformat()
+    }), 201
+
+@app.route('/api/holds/<hold_id>', methods=['DELETE'])
+def release_seat_hold(hold_id):
+    try:
+        released = DataManager.release_seat_hold(hold_id)
+    except Exception as e:
+        print(f"Database error: {e}")
+        return jsonify({'error': 'Failed to release hold'}), 500
+    if not released:
+        return jsonify({'error': 'Hold not found or already expired'}), 404
+    return jsonify({'message': 'Seat hold released'})
+
+def _waitlist_response(entry: Dict) -> Dict:
+    """Public view of a waitlist entry: journey, status, position while waiting, ticket ID once promoted"""
+    return {key: entry[key] for key in ('waitlist_id', 'departure', 'destination', 'date', 'time',
+                                        'status', 'position', 'ticket_id')}
+
+@app.route('/api/waitlist', methods=['POST'])
+@idempotent
+def join_waitlist():
+    """Queue for a sold-out journey; the next cancelled seat is booked for the first customer in line"""
+    data = request.json or {}
+    
+    required_fields = ['name', 'age', 'phone', 'departure', 'destination', 'date', 'time']
+    if not all(field in data for field in required_fields):
+        return jsonify({'error': 'Missing required fields'}), 400
+    
+    try:
+        age = int(data['age'])
+        if age < 1 or age > 120:
+            return jsonify({'error': 'Invalid age'}), 400
+    except:
+        return jsonify({'error': 'Invalid age format'}), 400
+    
+    try:
+        travel_date = datetime.datetime.strptime(data['date'], "%Y-%m-%d").date()
+        if travel_date < datetime.date.today():
+            return jsonify({'error': 'Date must be in the future'}), 400
+    except:
+        return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+    
+    config = DataManager.load_config()
+    route = f"{data['departure']} to {data['destination']}"
+    if route not in config['bus_routes']:
+        return jsonify({'error': 'No direct route available'}), 404
+    
+    details = {
+        'name': data['name'],
+        'age': age,
+        'phone': data['phone'],
+        'email': data.get('email', ''),
+        'departure': data['departure'],
+        'destination': data['destination'],
+        'date': data['date'],
+        'time': data['time'],
+        'fare': config['bus_routes'][route]
+    }
+    
+    if USE_DATABASE:
+        try:
+            DataManager.sweep_seat_holds()
+            waitlist_id = secrets.token_hex(16)
+            # The sold-out check and the insert are one statement
+            position = DatabaseManager.join_waitlist(dict(details, waitlist_id=waitlist_id), config['total_seats'])
+        except Exception as e:
+            print(f"Database error: {e}")
+            return jsonify({'error': 'Failed to join waitlist'}), 500
+        if position is None:
+            return jsonify({'error': 'Seats are still available on this journey'}), 409
+    else:
+        journey = SeatInventory.journey_of(details)
+        if bin(DataManager.get_seat_inventory().occupied_bitmap(journey)).count('1') < config['total_seats']:
+            return jsonify({'error': 'Seats are still available on this journey'}), 409
+        waitlist_id, position = DataManager.get_waitlist().join(journey, details)
+    
+    return jsonify(_waitlist_response(dict(details, waitlist_id=waitlist_id, status='waiting',
+                                           position=position, ticket_id=None))), 201
+
+@app.route('/api/waitlist/<waitlist_id>', methods=['GET'])
+def get_waitlist_entry(waitlist_id):
+    try:
+        # Expired holds on the journey may be due to go to this customer
+        DataManager.sweep_seat_holds()
+        if USE_DATABASE:
+            entry = DatabaseManager.get_waitlist_entry(waitlist_id)
+        else:
+            entry = DataManager.get_waitlist().get(waitlist_id)
+    except Exception as e:
+        print(f"Database error: {e}")
+        return jsonify({'error': 'Failed to fetch waitlist entry'}), 500
+    if entry is None:
+        return jsonify({'error': 'Waitlist entry not found'}), 404
+    return jsonify(_waitlist_response(entry))
+
+@app.route('/api/waitlist/<waitlist_id>', methods=['DELETE'])
+def leave_waitlist(waitlist_id):
+    try:
+        if USE_DATABASE:
+            left = DatabaseManager.leave_waitlist(waitlist_id)
+        else:
+            left = DataManager.get_waitlist().leave(waitlist_id)
+    except Exception as e:
+        print(f"Database error: {e}")
+        return jsonify({'error': 'Failed to leave waitlist'}), 500
+    if not left:
+        return jsonify({'error': 'Waitlist entry not found or no longer waiting'}), 404
+    return jsonify({'message': 'Removed from waitlist'})
+
+@app.route('/api/journeys/<departure>/<destination>/<date>/<time>/seats', methods=['GET'])
+def get_seat_map(departure, destination, date, time):
+    try:
+        datetime.datetime.strptime(date, "%Y-%m-%d")
+    except ValueError:
+        return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+    
+    config = DataManager.load_config()
+    if f"{departure} to {destination}" not in config['bus_routes']:
+        return jsonify({'error': 'No direct route available'}), 404
+    
+    if USE_DATABASE:
+        try:
+            DataManager.sweep_seat_holds()
+            occupied = held = 0
+            for seat in DatabaseManager.get_occupied_seats(departure, destination, date, time):
+                occupied |= 1 << (seat - 1)
+            for seat in DatabaseManager.get_held_seats(departure, destination, date, time):
+                held |= 1 << (seat - 1)
+            occupied |= held
+        except Exception as e:
+            print(f"Database error: {e}")
+            return jsonify({'error': 'Failed to fetch seat map'}), 500
+    else:
+        journey = (departure, destination, date, time)
+        occupied = DataManager.get_seat_inventory().occupied_bitmap(journey)
+        held = DataManager.get_seat_holds().held_bitmap(journey)
+    
+    # Bit n of occupied_bitmap (hex) is set when seat n + 1 is booked or held;
+    # held_bitmap has just the held seats
+    return jsonify({
+        'total_seats': config['total_seats'],
+        'occupied_bitmap': format(occupied, 'x'),
+        'held_bitmap': format(held, 'x'),
+        'available': config['total_seats'] - bin(occupied).count('1')
+    })
+
+@app.route('/api/journeys/plan', methods=['GET'])
+def plan_journey():
+    """Plan a journey, changing buses if needed (``optimize`` is ``cheapest`` or ``fewest_legs``)"""
+    departure = request.args.get('departure', '').strip()
+    destination = request.args.get('destination', '').strip()
+    optimize = request.args.get('optimize', 'cheapest')
+    
+    if not departure or not destination:
+        return jsonify({'error': 'Missing departure or destination'}), 400
+    if optimize not in JourneyPlanner.OBJECTIVES:
+        return jsonify({'error': f'optimize must be one of: {", ".join(JourneyPlanner.OBJECTIVES)}'}), 400
+    
+    itinerary = DataManager.get_journey_planner().plan(departure, destination, optimize)
+    if itinerary is None:
+        return jsonify({'error': 'No route available'}), 404
+    
+    return jsonify(dict(itinerary, departure=departure, destination=destination, optimize=optimize))
+
+@app.route('/api/bookings/multi-leg', methods=['POST'])
+@idempotent
+def create_multi_leg_booking():
+    """Book every leg of a planned journey, all-or-nothing; one ticket per leg"""
+    data = request.json or {}
+    
+    required_fields = ['name', 'age', 'phone', 'departure', 'destination', 'date']
+    if not all(field in data for field in required_fields):
+        return jsonify({'error': 'Missing required fields'}), 400
+    
+    try:
+        age = int(data['age'])
+        if age < 1 or age > 120:
+            return jsonify({'error': 'Invalid age'}), 400
+    except:
+        return jsonify({'error': 'Invalid age format'}), 400
+    
+    try:
+        travel_date = datetime.datetime.strptime(data['date'], "%Y-%m-%d").date()
+        if travel_date < datetime.date.today():
+            return jsonify({'error': 'Date must be in the future'}), 400
+    except:
+        return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+    
+    optimize = data.get('optimize', 'cheapest')
+    if optimize not in JourneyPlanner.OBJECTIVES:
+        return jsonify({'error': f'optimize must be one of: {", ".join(JourneyPlanner.OBJECTIVES)}'}), 400
+    
+    itinerary = DataManager.get_journey_planner().plan(data['departure'], data['destination'], optimize)
+    if itinerary is None:
+        return jsonify({'error': 'No route available'}), 404
+    legs = itinerary['legs']
+    
+    # Seats are optional, one per leg; missing ones get the lowest free seat
+    config = DataManager.load_config()
+    seats = data.get('seats')
+    if seats is not None:
+        try:
+            if len(seats) != len(legs):
+                return jsonify({'error': f'Provide one seat per leg ({len(legs)} legs)'}), 400
+            seats = [int(seat) for seat in seats]
+        except (TypeError, ValueError):
+            return jsonify({'error': 'Invalid seat number'}), 400
+        if any(seat < 1 or seat > config['total_seats'] for seat in seats):
+            return jsonify({'error': f'Seat must be between 1 and {config["total_seats"]}'}), 400
+    
+    booking_list = []
+    for i, leg in enumerate(legs):
+        booking_list.append({
+            'ticket_id': _ticket_ids.generate(),
+            'name': data['name'],
+            'age': age,
+            'phone': data['phone'],
+            'email': data.get('email', ''),
+            'departure': leg['departure'],
+            'destination': leg['destination'],
+            'date': (travel_date + datetime.timedelta(days=leg['day_offset'])).isoformat(),
+            'time': leg['time'],
+            'seat': seats[i] if seats else None,
+            'fare': leg['fare'],
+            'status': 'confirmed'
+        })
+    
+    if USE_DATABASE:
+        try:
+            DataManager.sweep_seat_holds()
+            for booking in booking_list:
+                if booking['seat'] is None:
+                    journey = SeatInventory.journey_of(booking)
+                    taken = set(DatabaseManager.get_occupied_seats(*journey)) | set(DatabaseManager.get_held_seats(*journey))
+                    booking['seat'] = next((seat for seat in range(1, config['total_seats'] + 1) if seat not in taken), None)
+                    if booking['seat'] is None:
+                        return jsonify({'error': f'No seats left from {booking["departure"]} to {booking["destination"]}'}), 409
+            
+            # Legs are different journeys, but the multi-row insert still
+            # checks every (journey, seat) pair and rolls back on any conflict
+            results = _reserve_with_fresh_ticket_ids(lambda: DatabaseManager.reserve_seats(booking_list), booking_list)
+            if results is None:
+                return jsonify({'error': 'A seat on one of the legs is already booked or held'}), 409
+            booking_list = [booking_response(result) for result in results]
+        except Exception as e:
+            print(f"Database error: {e}")
+            return jsonify({'error': 'Failed to create bookings'}), 500
+    else:
+        inventory = DataManager.get_seat_inventory()
+        reserved = []
+        for booking in booking_list:
+            journey = SeatInventory.journey_of(booking)
+            if booking['seat'] is None:
+                booking['seat'] = inventory.first_free(journey)
+            if booking['seat'] is None or not inventory.reserve(journey, booking['seat']):
+                for journey, seat in reserved:
+                    inventory.release(journey, seat)
+                return jsonify({'error': 'A seat on one of the legs is already booked or held'}), 409
+            reserved.append((journey, booking['seat']))
+        
+        booked_at = datetime.datetime.now().isoformat()
+        for booking in booking_list:
+            booking['booked_at'] = booked_at
+            DataManager.store_booking(booking)
+    
+    return jsonify({
+        'departure': data['departure'],
+        'destination': data['destination'],
+        'transfers': itinerary['transfers'],
+        'bookings': booking_list,
+        'total_fare': itinerary['total_fare']
+    }), 201
+
 @app.route('/api/bookings/<ticket_id>', methods=['GET'])
 def get_booking(ticket_id):
-    ticket_id = ticket_id.upper()
+    ticket_id = TicketIdGenerator.normalize(ticket_id)
+    if not TicketIdGenerator.is_valid(ticket_id):
+        return jsonify({'error': 'Invalid ticket ID'}), 400
     
     if USE_DATABASE:
         try:
-            booking = DatabaseManager.get_booking(ticket_id)
+            booking = DatabaseManager.get_booking_json(ticket_id)
             if not booking:
                 return jsonify({'error': 'Ticket not found'}), 404
             
-            return jsonify({
-                'ticket_id': booking['ticket_id'],
-                'name': booking['name'],
-                'age': booking['age'],
-                'phone': booking['phone'],
-                'email': booking.get('email', ''),
-                'departure': booking['departure'],
-                'destination': booking['destination'],
-                'date': booking['date'].isoformat() if hasattr(booking['date'], 'isoformat') else str(booking['date']),
-                'time': booking['time'],
-                'seat': booking['seat'],
-                'fare': float(booking['fare']),
-                'status': booking['status'],
-                'booked_at': booking['booked_at'].isoformat() if hasattr(booking['booked_at'], 'isoformat') else str(booking['booked_at'])
-            })
+            return Response(booking, mimetype='application/json')
         except Exception as e:
             print(f"Database error: {e}")
             return jsonify({'error': 'Failed to fetch booking'}), 500
@@ -379,8 +1263,11 @@ def get_booking(ticket_id):
         return jsonify(bookings[ticket_id])
 
 @app.route('/api/bookings/<ticket_id>', methods=['DELETE'])
+@idempotent
 def cancel_booking(ticket_id):
-    ticket_id = ticket_id.upper()
+    ticket_id = TicketIdGenerator.normalize(ticket_id)
+    if not TicketIdGenerator.is_valid(ticket_id):
+        return jsonify({'error': 'Invalid ticket ID'}), 400
     
     if USE_DATABASE:
         try:
@@ -391,7 +1278,8 @@ def cancel_booking(ticket_id):
             if booking['status'] == 'cancelled':
                 return jsonify({'error': 'Ticket already cancelled'}), 400
             
-            DatabaseManager.cancel_booking(ticket_id)
+            # The freed seat goes to the first waitlisted customer, if any, in the same transaction
+            DatabaseManager.cancel_booking(ticket_id, _ticket_ids.generate())
             return jsonify({'message': 'Ticket cancelled successfully'})
         except Exception as e:
             print(f"Database error: {e}")
@@ -404,7 +1292,16 @@ def cancel_booking(ticket_id):
         if bookings[ticket_id].get('status') == 'cancelled':
             return jsonify({'error': 'Ticket already cancelled'}), 400
         
-        bookings[ticket_id]['status'] = 'cancelled'
+        booking = bookings[ticket_id]
+        old_status = booking.get('status')
+        booking['status'] = 'cancelled'
+        DataManager.get_booking_stats().change_status(booking, old_status, 'cancelled')
+        
+        # The freed seat passes straight to the first waitlisted customer without
+        # being released, so no other request can take it in between
+        journey = SeatInventory.journey_of(booking)
+        if not DataManager.hand_seat_to_waitlist(journey, booking['seat']):
+            DataManager.get_seat_inventory().release(journey, booking['seat'])
         DataManager.save_bookings(bookings)
         return jsonify({'message': 'Ticket cancelled successfully'})
 
@@ -422,28 +1319,19 @@ def admin_login():
 
 @app.route('/api/admin/bookings', methods=['GET'])
 def admin_get_all_bookings():
+    """List bookings, newest first.
+    
+    ``?limit=N[&cursor=...]`` returns one keyset-paginated page with a
+    ``next_cursor``; ``?stream=1`` streams the full list as a JSON array.
+    """
+    if request.args.get('stream') == '1':
+        return _stream_all_bookings()
+    if 'limit' in request.args or 'cursor' in request.args:
+        return _get_bookings_page()
+    
     if USE_DATABASE:
         try:
-            bookings_list = DatabaseManager.get_all_bookings()
-            # Convert datetime objects for JSON
-            result = []
-            for booking in bookings_list:
-                result.append({
-                    'ticket_id': booking['ticket_id'],
-                    'name': booking['name'],
-                    'age': booking['age'],
-                    'phone': booking['phone'],
-                    'email': booking.get('email', ''),
-                    'departure': booking['departure'],
-                    'destination': booking['destination'],
-                    'date': booking['date'].isoformat() if hasattr(booking['date'], 'isoformat') else str(booking['date']),
-                    'time': booking['time'],
-                    'seat': booking['seat'],
-                    'fare': float(booking['fare']),
-                    'status': booking['status'],
-                    'booked_at': booking['booked_at'].isoformat() if hasattr(booking['booked_at'], 'isoformat') else str(booking['booked_at'])
-                })
-            return jsonify(result)
+            return Response(DatabaseManager.get_all_bookings_json(), mimetype='application/json')
         except Exception as e:
             print(f"Database error: {e}")
             return jsonify([])
@@ -451,6 +1339,111 @@ def admin_get_all_bookings():
         bookings = DataManager.load_bookings()
         return jsonify(list(bookings.values()))
 
+def _get_bookings_page():
+    try:
+        limit = min(int(request.args.get('limit', ADMIN_PAGE_SIZE)), ADMIN_MAX_PAGE_SIZE)
+        if limit < 1:
+            raise ValueError
+    except ValueError:
+        return jsonify({'error': 'Invalid limit'}), 400
+    
+    after = None
+    if request.args.get('cursor'):
+        try:
+            # Database pages break ties on the serial id, in-memory ones on ticket_id
+            after = decode_cursor(request.args['cursor'], int if USE_DATABASE else str)
+        except Exception:
+            return jsonify({'error': 'Invalid cursor'}), 400
+    
+    if USE_DATABASE:
+        try:
+            rows = DatabaseManager.get_bookings_page(limit, after)
+        except Exception as e:
+            print(f"Database error: {e}")
+            return jsonify({'error': 'Failed to fetch bookings'}), 500
+        page = [booking_response(row) for row in rows]
+        next_cursor = encode_cursor(rows[-1]['booked_at'], rows[-1]['id']) if len(rows) == limit else None
+    else:
+        # The in-memory store has no serial id, so ticket_id breaks ties instead
+        bookings = sorted(DataManager.load_bookings().values(),
+                          key=lambda b: (b['booked_at'], b['ticket_id']), reverse=True)
+        if after is not None:
+            after = tuple(after)
+            bookings = [b for b in bookings if (b['booked_at'], b['ticket_id']) < after]
+        page = bookings[:limit]
+        next_cursor = encode_cursor(page[-1]['booked_at'], page[-1]['ticket_id']) if len(bookings) > limit else None
+    
+    return jsonify({'bookings': page, 'next_cursor': next_cursor})
+
+def _stream_all_bookings():
+    if USE_DATABASE:
+        # Rows arrive as JSON text rendered by the database
+        bookings = DatabaseManager.iter_all_bookings_json()
+        try:
+            # Pull the first row up front so connection errors still get a proper status
+            first = next(bookings, None)
+        except Exception as e:
+            print(f"Database error: {e}")
+            return jsonify({'error': 'Failed to fetch bookings'}), 500
+        if first is not None:
+            bookings = itertools.chain([first], bookings)
+    else:
+        # Insertion order is booking order, so reverse it for newest first
+        bookings = (json.dumps(booking) for booking in reversed(list(DataManager.load_bookings().values())))
+    
+    def generate():
+        yield '['
+        chunk = []
+        for i, booking in enumerate(bookings):
+            chunk.append(('' if i == 0 else ',') + booking)
+            if len(chunk) >= STREAM_CHUNK_ROWS:
+                yield ''.join(chunk)
+                chunk = []
+        yield ''.join(chunk) + ']'
+    
+    # Keep the request context, and with it the admission slot, until the
+    # last row is sent; the pooled connection is held that long too
+    return Response(stream_with_context(generate()), mimetype='application/json')
+
+@app.route('/api/admin/bookings/search', methods=['GET'])
+def admin_search_bookings():
+    """Search bookings by ticket_id / phone prefix, name fragment, departure, destination and date_from/date_to"""
+    criteria = {
+        'ticket_id': request.args.get('ticket_id', '').strip().upper() or None,
+        'phone': request.args.get('phone', '').strip() or None,
+        'name': request.args.get('name', '').strip() or None,
+        'departure': request.args.get('departure', '').strip() or None,
+        'destination': request.args.get('destination', '').strip() or None,
+        'date_from': request.args.get('date_from', '').strip() or None,
+        'date_to': request.args.get('date_to', '').strip() or None,
+    }
+    if not any(criteria.values()):
+        return jsonify({'error': 'Provide at least one search filter'}), 400
+    
+    for key in ('date_from', 'date_to'):
+        if criteria[key]:
+            try:
+                datetime.datetime.strptime(criteria[key], "%Y-%m-%d")
+            except ValueError:
+                return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+    
+    try:
+        limit = min(int(request.args.get('limit', ADMIN_PAGE_SIZE)), ADMIN_MAX_PAGE_SIZE)
+        if limit < 1:
+            raise ValueError
+    except ValueError:
+        return jsonify({'error': 'Invalid limit'}), 400
+    
+    if USE_DATABASE:
+        try:
+            results = DatabaseManager.search_bookings(limit=limit, **criteria)
+            return jsonify([booking_response(booking) for booking in results])
+        except Exception as e:
+            print(f"Database error: {e}")
+            return jsonify({'error': 'Search failed'}), 500
+    else:
+        return jsonify(DataManager.get_search_index().search(limit=limit, **criteria))
+
 @app.route('/api/admin/stats', methods=['GET'])
 def admin_stats():
     if USE_DATABASE:
@@ -459,11 +1452,11 @@ def admin_stats():
             top_routes = DatabaseManager.get_top_routes(5)
             
             return jsonify({
-                'total_bookings': stats['total_bookings'],
-                'confirmed': stats['confirmed'],
-                'cancelled': stats['cancelled'],
+                'total_bookings': int(stats['total_bookings']),
+                'confirmed': int(stats['confirmed']),
+                'cancelled': int(stats['cancelled']),
                 'total_revenue': float(stats['total_revenue']),
-                'top_routes': [{'route': r['route'], 'count': r['count']} for r in top_routes]
+                'top_routes': [{'route': r['route'], 'count': int(r['count'])} for r in top_routes]
             })
         except Exception as e:
             print(f"Database error: {e}")
@@ -475,42 +1468,68 @@ def admin_stats():
                 'top_routes': []
             })
     else:
-        bookings = DataManager.load_bookings()
-        
-        total_bookings = len(bookings)
-        confirmed = sum(1 for b in bookings.values() if b.get('status') == 'confirmed')
-        cancelled = sum(1 for b in bookings.values() if b.get('status') == 'cancelled')
-        total_revenue = sum(b.get('fare', 0) for b in bookings.values() 
-                           if b.get('status') == 'confirmed')
+        booking_stats = DataManager.get_booking_stats()
+        top_routes = booking_stats.top_routes(5)
         
-        route_stats = {}
-        for booking in bookings.values():
-            if booking.get('status') == 'confirmed':
-                route = f"{booking.get('departure')} to {booking.get('destination')}"
-                route_stats[route] = route_stats.get(route, 0) + 1
-        
-        top_routes = sorted(route_stats.items(), key=lambda x: x[1], reverse=True)[:5]
-        
-        return jsonify({
-            'total_bookings': total_bookings,
-            'confirmed': confirmed,
-            'cancelled': cancelled,
-            'total_revenue': total_revenue,
-            'top_routes': [{'route': r, 'count': c} for r, c in top_routes]
-        })
+        return jsonify(dict(booking_stats.summary(),
+                            top_routes=[{'route': r, 'count': c} for r, c in top_routes]))
+
+@app.route('/api/admin/pool', methods=['GET'])
+def admin_pool_stats():
+    """Connection pool usage: size, in-use, waiting, timeouts, recycles and checkout latency"""
+    if not USE_DATABASE:
+        return jsonify({'error': 'No database configured'}), 404
+    return jsonify(DatabaseManager.pool_stats())
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Request, query and connection pool metrics in Prometheus text format"""
+    pool_stats = DatabaseManager.pool_stats() if USE_DATABASE else {}
+    return Response(metrics.render(pool_stats, _admission.stats()), mimetype='text/plain; version=0.0.4')
+
+def _profile_access_error():
+    if not _request_profiler.enabled:
+        return jsonify({'error': 'Profiling is not enabled'}), 404
+    if not _request_profiler.authorized(_profile_token()):
+        return jsonify({'error': 'Invalid profile token'}), 403
+    return None
+
+@app.route('/api/admin/profiles', methods=['GET'])
+def admin_list_profiles():
+    """Stored request profiles on this instance, newest first"""
+    error = _profile_access_error()
+    if error:
+        return error
+    return jsonify({'profiles': _request_profiler.list()})
+
+@app.route('/api/admin/profiles/<profile_id>', methods=['GET'])
+def admin_get_profile(profile_id):
+    """Download a stored profile as a text report, or ?format=pstats for the raw cProfile data"""
+    error = _profile_access_error()
+    if error:
+        return error
+    record = _request_profiler.get(profile_id)
+    if not record:
+        return jsonify({'error': 'Profile not found'}), 404
+    if request.args.get('format') == 'pstats':
+        return Response(record['pstats'], mimetype='application/octet-stream',
+                        headers={'Content-Disposition': f'attachment; filename=profile-{profile_id}.prof'})
+    return Response(record['report'], mimetype='text/plain')
 
 @app.route('/api/admin/routes', methods=['GET'])
 def admin_get_routes():
-    config = DataManager.load_config()
-    routes = []
-    for route, fare in config['bus_routes'].items():
-        schedule = config['bus_schedules'].get(route, 'N/A')
-        routes.append({
-            'route': route,
-            'fare': fare,
-            'schedule': schedule
-        })
-    return jsonify(routes)
+    def build():
+        config = DataManager.load_config()
+        routes = []
+        for route, fare in config['bus_routes'].items():
+            schedule = config['bus_schedules'].get(route, 'N/A')
+            routes.append({
+                'route': route,
+                'fare': fare,
+                'schedule': schedule
+            })
+        return jsonify(routes)
+    return _reference_response(build, public=False)
 
 @app.route('/api/admin/routes', methods=['PUT'])
 def admin_update_route():
@@ -525,33 +1544,45 @@ def admin_update_route():
     if route not in config['bus_routes']:
         return jsonify({'error': 'Route not found'}), 404
     
-    config['bus_routes'][route] = float(new_fare)
-    DataManager.save_config(config)
+    if USE_DATABASE:
+        try:
+            DatabaseManager.update_route_fare(route, float(new_fare))
+            DataManager.invalidate_config()
+        except Exception as e:
+            print(f"Database error: {e}")
+            return jsonify({'error': 'Failed to update route'}), 500
+    else:
+        config['bus_routes'][route] = float(new_fare)
+        DataManager.save_config(config)
     
     return jsonify({'message': 'Route updated successfully'})
 
 @app.route('/api/schedules', methods=['GET'])
 def get_schedules():
-    config = DataManager.load_config()
-    schedules = []
-    for route, schedule in sorted(config['bus_schedules'].items()):
-        fare = config['bus_routes'].get(route, 0)
-        schedules.append({
-            'route': route,
-            'schedule': schedule,
-            'fare': fare
-        })
-    return jsonify(schedules)
+    def build():
+        config = DataManager.load_config()
+        schedules = []
+        for route, schedule in sorted(config['bus_schedules'].items()):
+            fare = config['bus_routes'].get(route, 0)
+            schedules.append({
+                'route': route,
+                'schedule': schedule,
+                'fare': fare
+            })
+        return jsonify(schedules)
+    return _reference_response(build)
 
 @app.route('/api/stops/<city>', methods=['GET'])
 def get_stops(city):
-    config = DataManager.load_config()
-    stops = config['bus_stops'].get(city)
-    
-    if not stops:
-        return jsonify({'error': 'City not found'}), 404
-    
-    return jsonify({'city': city, 'stops': stops})
+    def build():
+        config = DataManager.load_config()
+        stops = config['bus_stops'].get(city)
+        
+        if not stops:
+            return jsonify({'error': 'City not found'}), 404
+        
+        return jsonify({'city': city, 'stops': stops})
+    return _reference_response(build)
 
 if __name__ == '__main__':
     app.run(debug=True)
@@ -0,0 +1,149 @@
+"""Constants and helpers shared by the Flask (api/index.py) and ASGI (api/asgi.py) apps
+
+Importing this module has no side effects, so each app can use it without
+loading the other.
+"""
+import base64
+import datetime
+import hashlib
+import json
+import os
+from typing import Dict
+
+ADMIN_PAGE_SIZE = 100
+ADMIN_MAX_PAGE_SIZE = 1000
+STREAM_CHUNK_ROWS = 500
+
+ADMIN_CREDENTIALS = {
+    "admin": hashlib.sha256("admin123".encode()).hexdigest(),
+    "manager": hashlib.sha256("manager123".encode()).hexdigest()
+}
+
+# How often a per-process config snapshot checks the database's config_version
+CONFIG_CHECK_INTERVAL = float(os.environ.get('CONFIG_CHECK_INTERVAL', '30'))
+
+# How often a database-backed app deletes expired seat holds, in seconds
+SEAT_HOLD_SWEEP_INTERVAL = 30
+
+def default_config() -> Dict:
+    """The configuration used until one is saved"""
+    return {
+        "bus_routes": {
+            "Bulawayo to Gweru": 5, "Gweru to Bulawayo": 5,
+            "Bulawayo to Kwekwe": 7, "Kwekwe to Bulawayo": 7,
+            "Bulawayo to Kadoma": 8, "Kadoma to Bulawayo": 8,
+            "Bulawayo to Chegutu": 10, "Chegutu to Bulawayo": 10,
+            "Bulawayo to Norton": 13, "Norton to Bulawayo": 13,
+            "Bulawayo to Harare": 15, "Harare to Bulawayo": 15,
+            "Gweru to Kwekwe": 3, "Kwekwe to Gweru": 3,
+            "Gweru to Kadoma": 4, "Kadoma to Gweru": 4,
+            "Gweru to Chegutu": 5, "Chegutu to Gweru": 5,
+            "Gweru to Norton": 6, "Norton to Gweru": 6,
+            "Gweru to Harare": 7, "Harare to Gweru": 7,
+            "Kwekwe to Kadoma": 2, "Kadoma to Kwekwe": 2,
+            "Kwekwe to Chegutu": 6, "Chegutu to Kwekwe": 6,
+            "Kwekwe to Norton": 9, "Norton to Kwekwe": 9,
+            "Kwekwe to Harare": 10, "Harare to Kwekwe": 10,
+            "Kadoma to Chegutu": 4, "Chegutu to Kadoma": 4,
+            "Kadoma to Norton": 5, "Norton to Kadoma": 5,
+            "Kadoma to Harare": 6, "Harare to Kadoma": 6,
+            "Chegutu to Norton": 1, "Norton to Chegutu": 1,
+            "Chegutu to Harare": 3, "Harare to Chegutu": 3,
+            "Norton to Harare": 2, "Harare to Norton": 2,
+        },
+        # Minutes on the road, used to check connections between legs
+        "route_durations": {
+            "Bulawayo to Gweru": 135, "Gweru to Bulawayo": 135,
+            "Bulawayo to Kwekwe": 185, "Kwekwe to Bulawayo": 185,
+            "Bulawayo to Kadoma": 245, "Kadoma to Bulawayo": 245,
+            "Bulawayo to Chegutu": 280, "Chegutu to Bulawayo": 280,
+            "Bulawayo to Norton": 335, "Norton to Bulawayo": 335,
+            "Bulawayo to Harare": 375, "Harare to Bulawayo": 375,
+            "Gweru to Kwekwe": 50, "Kwekwe to Gweru": 50,
+            "Gweru to Kadoma": 110, "Kadoma to Gweru": 110,
+            "Gweru to Chegutu": 145, "Chegutu to Gweru": 145,
+            "Gweru to Norton": 200, "Norton to Gweru": 200,
+            "Gweru to Harare": 240, "Harare to Gweru": 240,
+            "Kwekwe to Kadoma": 60, "Kadoma to Kwekwe": 60,
+            "Kwekwe to Chegutu": 95, "Chegutu to Kwekwe": 95,
+            "Kwekwe to Norton": 150, "Norton to Kwekwe": 150,
+            "Kwekwe to Harare": 190, "Harare to Kwekwe": 190,
+            "Kadoma to Chegutu": 35, "Chegutu to Kadoma": 35,
+            "Kadoma to Norton": 90, "Norton to Kadoma": 90,
+            "Kadoma to Harare": 130, "Harare to Kadoma": 130,
+            "Chegutu to Norton": 55, "Norton to Chegutu": 55,
+            "Chegutu to Harare": 95, "Harare to Chegutu": 95,
+            "Norton to Harare": 40, "Harare to Norton": 40
+        },
+        "bus_schedules": {
+            "Bulawayo to Gweru": "08:00 AM", "Gweru to Bulawayo": "02:00 PM",
+            "Gweru to Kwekwe": "09:00 AM", "Kwekwe to Gweru": "03:00 PM",
+            "Bulawayo to Kwekwe": "09:00 AM", "Kwekwe to Bulawayo": "03:30 PM",
+            "Kwekwe to Kadoma": "10:00 AM", "Kadoma to Kwekwe": "04:00 PM",
+            "Bulawayo to Kadoma": "10:00 AM", "Kadoma to Bulawayo": "04:30 PM",
+            "Kadoma to Chegutu": "10:30 AM", "Chegutu to Kadoma": "04:45 PM",
+            "Bulawayo to Chegutu": "11:00 AM", "Chegutu to Bulawayo": "05:00 PM",
+            "Bulawayo to Harare": "12:00 PM", "Harare to Bulawayo": "06:00 PM",
+            "Gweru to Kadoma": "09:30 AM", "Kadoma to Gweru": "02:30 PM",
+            "Gweru to Chegutu": "10:15 AM", "Chegutu to Gweru": "03:15 PM",
+            "Gweru to Norton": "11:00 AM", "Norton to Gweru": "04:00 PM",
+            "Gweru to Harare": "11:30 AM", "Harare to Gweru": "05:00 PM",
+            "Kwekwe to Chegutu": "10:45 AM", "Chegutu to Kwekwe": "04:15 PM",
+            "Kwekwe to Norton": "11:30 AM", "Norton to Kwekwe": "05:15 PM",
+            "Kwekwe to Harare": "12:15 PM", "Harare to Kwekwe": "06:15 PM",
+            "Kadoma to Norton": "11:00 AM", "Norton to Kadoma": "05:00 PM",
+            "Kadoma to Harare": "11:30 AM", "Harare to Kadoma": "05:30 PM",
+            "Chegutu to Norton": "11:45 AM", "Norton to Chegutu": "05:45 PM",
+            "Chegutu to Harare": "12:15 PM", "Harare to Chegutu": "06:15 PM",
+            "Norton to Harare": "12:30 PM", "Harare to Norton": "06:30 PM",
+        },
+        "bus_stops": {
+            "Bulawayo": "City Hall, Renkini Bus Terminus, and National Railways of Zimbabwe Station.",
+            "Gweru": "Main Street, City Centre, and Railway Station.",
+            "Kwekwe": "City Centre, Kwekwe Mall, and Railway Station.",
+            "Kadoma": "City Centre, Kadoma Mall, and Railway Station.",
+            "Chegutu": "City Centre, Chegutu Mall, and Railway Station.",
+            "Norton": "Main Street, Town Centre, and near the Post Office.",
+            "Harare": "City Centre, Avondale, and Mbare Musika Bus Terminus."
+        },
+        "total_seats": 50,
+        "company_name": "Chikukwa Bus Services",
+        "contact_phone": "+263777189947",
+        "contact_email": "support@chikukwabus.com"
+    }
+
+def booking_response(booking: Dict) -> Dict:
+    """Convert a bookings row into a JSON-safe dict"""
+    return {
+        'ticket_id': booking['ticket_id'],
+        'name': booking['name'],
+        'age': booking['age'],
+        'phone': booking['phone'],
+        'email': booking.get('email', ''),
+        'departure': booking['departure'],
+        'destination': booking['destination'],
+        'date': booking['date'].isoformat() if hasattr(booking['date'], 'isoformat') else str(booking['date']),
+        'time': booking['time'],
+        'seat': booking['seat'],
+        'fare': float(booking['fare']),
+        'status': booking['status'],
+        'booked_at': booking['booked_at'].isoformat() if hasattr(booking['booked_at'], 'isoformat') else str(booking['booked_at'])
+    }
+
+def encode_cursor(booked_at, key) -> str:
+    """Encode a (booked_at, tiebreak key) position as an opaque pagination cursor"""
+    if hasattr(booked_at, 'isoformat'):
+        booked_at = booked_at.isoformat()
+    return base64.urlsafe_b64encode(json.dumps([booked_at, key]).encode()).decode()
+
+def decode_cursor(cursor: str, key_type: type) -> tuple:
+    """Decode a cursor made by encode_cursor; raises ValueError unless it holds a booked_at string and a key_type key"""
+    position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    if not isinstance(position, list) or len(position) != 2:
+        raise ValueError("Cursor is not a (booked_at, key) pair")
+    booked_at, key = position
+    # type() rather than isinstance(), so true is not taken for the int key 1
+    if not isinstance(booked_at, str) or type(key) is not key_type:
+        raise ValueError("Cursor has the wrong types")
+    datetime.datetime.fromisoformat(booked_at)
+    return booked_at, key
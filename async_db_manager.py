@@ -0,0 +1,296 @@
+import datetime
+import os
+import asyncpg
+from decimal import Decimal
+from typing import AsyncIterator, Callable, Dict, List, Optional
+from contextlib import asynccontextmanager
+
+import pg_sql
+from db_manager import DatabaseManager
+
+class AsyncDatabaseManager:
+    """Asyncio database manager with an asyncpg connection pool for PostgreSQL
+
+    Async counterpart of DatabaseManager for the ASGI app in api/asgi.py;
+    both run the statements in pg_sql, numbered for asyncpg's placeholders.
+    asyncpg binds parameters by type, so dates, timestamps and fares are
+    converted from their JSON string/float forms before they are sent.
+    """
+
+    _pool = None
+
+    @classmethod
+    async def initialize_pool(cls):
+        """Initialize database connection pool"""
+        if cls._pool is None:
+            # Transaction-mode poolers cannot keep named prepared statements
+            # across transactions, so turn asyncpg's statement cache off there
+            cls._pool = await asyncpg.create_pool(
+                dsn=DatabaseManager.database_url(),
+                min_size=int(os.environ.get('ASYNC_POOL_MIN', '1')),
+                max_size=int(os.environ.get('ASYNC_POOL_MAX', '20')),
+                statement_cache_size=0 if DatabaseManager.uses_transaction_pooler() else 100
+            )
+
+    @classmethod
+    async def close_pool(cls):
+        """Close all pooled connections"""
+        if cls._pool is not None:
+            await cls._pool.close()
+            cls._pool = None
+
+    @classmethod
+    @asynccontextmanager
+    async def get_connection(cls):
+        """Get a database connection from the pool, inside a transaction"""
+        if cls._pool is None:
+            await cls.initialize_pool()
+
+        async with cls._pool.acquire() as conn:
+            async with conn.transaction():
+                yield conn
+
+    @classmethod
+    async def execute_query(cls, query: str, *params, fetch: bool = True):
+        """Execute a query and return results"""
+        async with cls.get_connection() as conn:
+            if fetch:
+                return [dict(row) for row in await conn.fetch(query, *params)]
+            status = await conn.execute(query, *params)
+            # Status is e.g. "UPDATE 1"; the last word is the row count
+            return int(status.split()[-1])
+
+    @classmethod
+    async def execute_one(cls, query: str, *params) -> Optional[Dict]:
+        """Execute a query and return a single result"""
+        async with cls.get_connection() as conn:
+            row = await conn.fetchrow(query, *params)
+            return dict(row) if row else None
+
+    @staticmethod
+    def _to_date(value) -> datetime.date:
+        return datetime.date.fromisoformat(value) if isinstance(value, str) else value
+
+    # Booking operations
+    @staticmethod
+    def is_ticket_id_conflict(error: Exception) -> bool:
+        """Whether an insert failed because its ticket ID is already taken"""
+        return (isinstance(error, asyncpg.UniqueViolationError)
+                and error.constraint_name == pg_sql.TICKET_ID_CONSTRAINT)
+
+    @classmethod
+    def _booking_params(cls, booking_data: Dict, status: str) -> tuple:
+        return (
+            booking_data['ticket_id'],
+            booking_data['name'],
+            booking_data['age'],
+            booking_data['phone'],
+            booking_data.get('email', ''),
+            booking_data['departure'],
+            booking_data['destination'],
+            cls._to_date(booking_data['date']),
+            booking_data['time'],
+            booking_data['seat'],
+            Decimal(str(booking_data['fare'])),
+            status
+        )
+
+    @classmethod
+    async def create_booking(cls, booking_data: Dict) -> Dict:
+        """Create a new booking"""
+        query = pg_sql.numbered(pg_sql.CREATE_BOOKING)
+        params = cls._booking_params(booking_data, booking_data.get('status', 'confirmed'))
+        return await cls.execute_one(query, *params)
+
+    @classmethod
+    async def reserve_seat(cls, booking_data: Dict, hold_id: Optional[str] = None) -> Optional[Dict]:
+        """Atomically book a seat in one statement.
+
+        Returns the confirmed booking, or None if the seat is already taken
+        for this journey (enforced by the idx_confirmed_seat partial index).
+        With ``hold_id`` the caller's own hold on the seat is released in the
+        same transaction, so it does not block the booking.
+        """
+        query = pg_sql.numbered(pg_sql.RESERVE_SEAT)
+        params = cls._booking_params(booking_data, 'confirmed')
+        async with cls.get_connection() as conn:
+            if hold_id:
+                await conn.execute(pg_sql.numbered(pg_sql.RELEASE_OWN_SEAT_HOLD), hold_id, *params[5:10])
+            row = await conn.fetchrow(query, *params)
+            return dict(row) if row else None
+
+    @classmethod
+    async def reserve_seats(cls, bookings: List[Dict]) -> Optional[List[Dict]]:
+        """Atomically book several seats with one multi-row insert.
+
+        All-or-nothing: returns every confirmed booking, or None (and inserts
+        nothing) if any of the seats is already taken.
+        """
+        rows = [cls._booking_params(booking, 'confirmed') for booking in bookings]
+        values = ', '.join([pg_sql.BOOKING_VALUES] * len(rows))
+        query = pg_sql.numbered(pg_sql.RESERVE_SEATS.format(values=values))
+        params = [value for row in rows for value in row]
+        if cls._pool is None:
+            await cls.initialize_pool()
+        async with cls._pool.acquire() as conn:
+            transaction = conn.transaction()
+            await transaction.start()
+            try:
+                results = await conn.fetch(query, *params)
+            except Exception:
+                await transaction.rollback()
+                raise
+            if len(results) < len(rows):
+                await transaction.rollback()
+                return None
+            await transaction.commit()
+            return [dict(row) for row in results]
+
+    @classmethod
+    async def get_booking(cls, ticket_id: str) -> Optional[Dict]:
+        """Get a booking by ticket ID"""
+        query = pg_sql.numbered(pg_sql.GET_BOOKING)
+        return await cls.execute_one(query, ticket_id)
+
+    @classmethod
+    async def get_all_bookings(cls) -> List[Dict]:
+        """Get all bookings"""
+        query = pg_sql.GET_ALL_BOOKINGS
+        return await cls.execute_query(query)
+
+    @classmethod
+    async def get_bookings_page(cls, limit: int, after: Optional[tuple] = None) -> List[Dict]:
+        """Get one page of bookings, newest first, keyset-paginated on (booked_at, id)"""
+        if after is None:
+            query = pg_sql.numbered(pg_sql.GET_BOOKINGS_FIRST_PAGE)
+            return await cls.execute_query(query, limit)
+        query = pg_sql.numbered(pg_sql.GET_BOOKINGS_PAGE_AFTER)
+        return await cls.execute_query(query, datetime.datetime.fromisoformat(after[0]), int(after[1]), limit)
+
+    @classmethod
+    async def iter_all_bookings(cls, batch_size: int = 1000) -> AsyncIterator[Dict]:
+        """Stream all bookings, newest first, through a server-side cursor"""
+        async with cls.get_connection() as conn:
+            async for row in conn.cursor(pg_sql.STREAM_ALL_BOOKINGS, prefetch=batch_size):
+                yield dict(row)
+
+    @classmethod
+    async def search_bookings(cls, ticket_id: Optional[str] = None, phone: Optional[str] = None,
+                              name: Optional[str] = None, departure: Optional[str] = None,
+                              destination: Optional[str] = None, date_from: Optional[str] = None,
+                              date_to: Optional[str] = None, limit: int = 100) -> List[Dict]:
+        """Search bookings by ticket ID prefix, phone prefix, name fragment, route and date range"""
+        filters = {
+            'ticket_id': pg_sql.like_escape(ticket_id) + '%' if ticket_id else None,
+            'phone': pg_sql.like_escape(phone) + '%' if phone else None,
+            'name': '%' + pg_sql.like_escape(name) + '%' if name else None,
+            'departure': departure,
+            'destination': destination,
+            'date_from': cls._to_date(date_from) if date_from else None,
+            'date_to': cls._to_date(date_to) if date_to else None,
+        }
+        conditions = [pg_sql.SEARCH_CONDITIONS[field] for field, value in filters.items() if value]
+        params = [value for value in filters.values() if value]
+        if not conditions:
+            return []
+
+        query = pg_sql.numbered(pg_sql.SEARCH_BOOKINGS.format(conditions=' AND '.join(conditions)))
+        return await cls.execute_query(query, *params, limit)
+
+    @classmethod
+    async def cancel_booking(cls, ticket_id: str, promoted_ticket_id: Optional[str] = None) -> bool:
+        """Cancel a booking, booking the freed seat for the first waitlisted customer (see DatabaseManager)"""
+        if promoted_ticket_id is None:
+            return await cls.execute_query(pg_sql.numbered(pg_sql.CANCEL_BOOKING), ticket_id, fetch=False) > 0
+
+        async with cls.get_connection() as conn:
+            freed = await conn.fetchrow(pg_sql.numbered(pg_sql.CANCEL_BOOKING_FREEING), ticket_id)
+            if freed is None:
+                return False
+            if freed['waitlisted']:
+                await conn.execute(pg_sql.numbered(pg_sql.PROMOTE_WAITLIST), freed['departure'], freed['destination'],
+                                   freed['date'], freed['time'], promoted_ticket_id, freed['seat'])
+            return True
+
+    @classmethod
+    async def check_seat_availability(cls, departure: str, destination: str, date: str, time: str, seat: int) -> bool:
+        """Check if a seat is neither booked nor held for a specific journey"""
+        query = pg_sql.numbered(pg_sql.CHECK_SEAT_AVAILABILITY)
+        journey = (departure, destination, cls._to_date(date), time, seat)
+        result = await cls.execute_one(query, *journey, *journey)
+        return result['count'] == 0
+
+    @classmethod
+    async def get_occupied_seats(cls, departure: str, destination: str, date: str, time: str) -> List[int]:
+        """Get the taken seat numbers for a journey (served by the idx_confirmed_seat index)"""
+        query = pg_sql.numbered(pg_sql.GET_OCCUPIED_SEATS)
+        rows = await cls.execute_query(query, departure, destination, cls._to_date(date), time)
+        return [row['seat'] for row in rows]
+
+    @classmethod
+    async def get_held_seats(cls, departure: str, destination: str, date: str, time: str) -> List[int]:
+        """Get the seat numbers under a hold that blocks booking for a journey (see pg_sql.HOLD_BLOCKS)"""
+        query = pg_sql.numbered(pg_sql.GET_HELD_SEATS)
+        rows = await cls.execute_query(query, departure, destination, cls._to_date(date), time)
+        return [row['seat'] for row in rows]
+
+    @classmethod
+    async def release_expired_seat_holds(cls, new_ticket_id: Callable[[], str]) -> int:
+        """Delete expired seat holds, booking each freed seat for the first waitlisted customer (see DatabaseManager)"""
+        async with cls.get_connection() as conn:
+            freed = await conn.fetch(pg_sql.numbered(pg_sql.RELEASE_EXPIRED_SEAT_HOLDS))
+            for seat in freed:
+                if seat['waitlisted']:
+                    await conn.execute(pg_sql.numbered(pg_sql.PROMOTE_WAITLIST), seat['departure'],
+                                       seat['destination'], seat['date'], seat['time'], new_ticket_id(), seat['seat'])
+            return len(freed)
+
+    # Route operations
+    @classmethod
+    async def get_all_routes(cls) -> List[Dict]:
+        """Get all routes"""
+        return await cls.execute_query(pg_sql.GET_ALL_ROUTES)
+
+    @classmethod
+    async def update_route_fare(cls, route_name: str, fare: float) -> bool:
+        """Update route fare"""
+        query = pg_sql.numbered(pg_sql.UPDATE_ROUTE_FARE)
+        return await cls.execute_query(query, Decimal(str(fare)), route_name, fetch=False) > 0
+
+    # Bus stops operations
+    @classmethod
+    async def get_all_bus_stops(cls) -> List[Dict]:
+        """Get all bus stops"""
+        return await cls.execute_query(pg_sql.GET_ALL_BUS_STOPS)
+
+    # Config operations
+    @classmethod
+    async def get_config(cls, key: str) -> Optional[str]:
+        """Get a configuration value"""
+        result = await cls.execute_one(pg_sql.numbered(pg_sql.GET_CONFIG), key)
+        return result['config_value'] if result else None
+
+    @classmethod
+    async def get_all_config(cls) -> Dict:
+        """Get all configuration"""
+        results = await cls.execute_query(pg_sql.GET_ALL_CONFIG)
+        return {row['config_key']: row['config_value'] for row in results}
+
+    @classmethod
+    async def get_config_version(cls) -> int:
+        """Get the config version counter, bumped by triggers whenever routes, stops or config change"""
+        value = await cls.get_config('config_version')
+        return int(value) if value else 0
+
+    # Statistics (read from the trigger-maintained booking_stats rollup)
+    @classmethod
+    async def get_booking_stats(cls) -> Dict:
+        """Get booking statistics"""
+        query = pg_sql.GET_BOOKING_STATS
+        return await cls.execute_one(query)
+
+    @classmethod
+    async def get_top_routes(cls, limit: int = 5) -> List[Dict]:
+        """Get top routes by booking count"""
+        query = pg_sql.numbered(pg_sql.GET_TOP_ROUTES)
+        return await cls.execute_query(query, limit)
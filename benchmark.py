@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+Load-testing benchmark for the booking API
+Drives a realistic request mix against the Flask app, either in-process
+(Flask test client) or over HTTP, and reports throughput plus p50/p95/p99
+latency per endpoint. Results are written as JSON so runs can be compared
+between commits with --compare.
+
+Examples:
+  python benchmark.py --backend memory --concurrency 8 --duration 20
+  POSTGRES_URL=postgresql://localhost/bus python benchmark.py --backend postgres
+  python benchmark.py --target http --url http://localhost:5000 --concurrency 32
+  python benchmark.py --compare benchmark-results/old.json
+"""
+
+import argparse
+import datetime
+import http.client
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+from urllib.parse import quote, urlsplit
+
+# (endpoint name, weight); weights are relative
+REQUEST_MIX = [
+    ('config', 20),
+    ('route_info', 20),
+    ('seat_map', 10),
+    ('create_booking', 15),
+    ('get_booking', 20),
+    ('cancel_booking', 5),
+    ('admin_bookings_page', 5),
+    ('admin_stats', 5),
+]
+
+# Statuses from the rate limits and admission control rather than the handlers
+REJECTED_STATUSES = (429, 503)
+
+TRAVEL_DAYS_AHEAD = 30
+
+class InProcessClient:
+    """Calls the Flask app through its test client, without a network hop"""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method: str, path: str, body: Optional[Dict] = None):
+        response = self.client.open(path, method=method, json=body)
+        data = response.get_data()
+        return response.status_code, data
+
+class HttpClient:
+    """Calls a running server over one persistent HTTP connection"""
+
+    def __init__(self, base_url: str):
+        parts = urlsplit(base_url)
+        connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        self.connection = connection_class(parts.netloc, timeout=30)
+        self.prefix = parts.path.rstrip('/')
+
+    def request(self, method: str, path: str, body: Optional[Dict] = None):
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        payload = json.dumps(body) if body is not None else None
+        try:
+            self.connection.request(method, self.prefix + path, body=payload, headers=headers)
+            response = self.connection.getresponse()
+            return response.status, response.read()
+        except (http.client.HTTPException, OSError):
+            self.connection.close()
+            raise
+
+class Workload:
+    """Builds requests for each endpoint in the mix from a seeded RNG"""
+
+    def __init__(self, config: Dict, seed: int):
+        self.routes = sorted(config['routes'].keys())
+        self.schedules = config['schedules']
+        self.total_seats = config['total_seats']
+        self.travel_date = (datetime.date.today() + datetime.timedelta(days=TRAVEL_DAYS_AHEAD)).isoformat()
+        self.tickets: List[str] = []
+        self.lock = threading.Lock()
+        self.seed = seed
+
+    def _journey(self, rng: random.Random):
+        route = rng.choice(self.routes)
+        departure, destination = route.split(' to ')
+        return departure, destination, self.schedules.get(route, '08:00 AM')
+
+    def _ticket(self, rng: random.Random, remove: bool = False) -> Optional[str]:
+        with self.lock:
+            if not self.tickets:
+                return None
+            i = rng.randrange(len(self.tickets))
+            if remove:
+                self.tickets[i], self.tickets[-1] = self.tickets[-1], self.tickets[i]
+                return self.tickets.pop()
+            return self.tickets[i]
+
+    def next_request(self, rng: random.Random, endpoint: str):
+        """Get (endpoint, method, path, body) for one request"""
+        if endpoint == 'config':
+            return endpoint, 'GET', '/api/config', None
+        if endpoint == 'route_info':
+            departure, destination, _ = self._journey(rng)
+            return endpoint, 'POST', '/api/route-info', {'departure': departure, 'destination': destination}
+        if endpoint == 'seat_map':
+            departure, destination, time_ = self._journey(rng)
+            path = f"/api/journeys/{quote(departure)}/{quote(destination)}/{self.travel_date}/{quote(time_)}/seats"
+            return endpoint, 'GET', path, None
+        if endpoint == 'admin_bookings_page':
+            return endpoint, 'GET', '/api/admin/bookings?limit=100', None
+        if endpoint == 'admin_stats':
+            return endpoint, 'GET', '/api/admin/stats', None
+        if endpoint in ('get_booking', 'cancel_booking'):
+            ticket_id = self._ticket(rng, remove=endpoint == 'cancel_booking')
+            if ticket_id is not None:
+                method = 'GET' if endpoint == 'get_booking' else 'DELETE'
+                return endpoint, method, f'/api/bookings/{ticket_id}', None
+            # Nothing booked yet, so book instead
+        departure, destination, time_ = self._journey(rng)
+        return 'create_booking', 'POST', '/api/bookings', {
+            'name': f'Bench Passenger {rng.randrange(10 ** 6)}',
+            'age': rng.randint(18, 80),
+            'phone': f'07{rng.randrange(10 ** 8):08d}',
+            'email': '',
+            'departure': departure,
+            'destination': destination,
+            'date': self.travel_date,
+            'time': time_,
+            'seat': rng.randint(1, self.total_seats)
+        }
+
+    def record(self, endpoint: str, status: int, body: bytes):
+        if endpoint == 'create_booking' and status == 201:
+            with self.lock:
+                self.tickets.append(json.loads(body)['ticket_id'])
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+def run_worker(worker_id: int, make_client, workload: Workload, deadline: float,
+               max_requests: Optional[int], warmup: int, samples: Dict, lock: threading.Lock):
+    rng = random.Random(workload.seed * 1000 + worker_id)
+    endpoints = [name for name, _ in REQUEST_MIX]
+    weights = [weight for _, weight in REQUEST_MIX]
+    client = make_client()
+    local = {}
+    done = 0
+
+    while time.monotonic() < deadline and (max_requests is None or done < max_requests + warmup):
+        endpoint, method, path, body = workload.next_request(rng, rng.choices(endpoints, weights)[0])
+        started = time.perf_counter()
+        try:
+            status, data = client.request(method, path, body)
+        except Exception:
+            status, data = 0, b''
+        elapsed = time.perf_counter() - started
+        workload.record(endpoint, status, data)
+
+        done += 1
+        if done <= warmup:
+            continue
+        latencies, statuses = local.setdefault(endpoint, ([], {}))
+        latencies.append(elapsed)
+        statuses[status] = statuses.get(status, 0) + 1
+
+    with lock:
+        for endpoint, (latencies, statuses) in local.items():
+            merged = samples.setdefault(endpoint, ([], {}))
+            merged[0].extend(latencies)
+            for status, count in statuses.items():
+                merged[1][status] = merged[1].get(status, 0) + count
+
+def summarize(latencies: List[float], statuses: Dict[int, int], wall_time: float) -> Dict:
+    latencies = sorted(latencies)
+    # 409 (seat taken) and 400 (already cancelled) are expected under load.
+    # 429 and 503 are admission control turning requests away; they are fast,
+    # so they are counted apart from errors rather than hidden in the latencies
+    rejected = sum(count for status, count in statuses.items() if status in REJECTED_STATUSES)
+    errors = sum(count for status, count in statuses.items()
+                 if status == 0 or (status >= 500 and status not in REJECTED_STATUSES))
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'rejected': rejected,
+        'throughput_rps': round(len(latencies) / wall_time, 2) if wall_time else 0.0,
+        'mean_ms': round(1000 * sum(latencies) / len(latencies), 3) if latencies else 0.0,
+        'p50_ms': round(1000 * percentile(latencies, 50), 3),
+        'p95_ms': round(1000 * percentile(latencies, 95), 3),
+        'p99_ms': round(1000 * percentile(latencies, 99), 3),
+        'max_ms': round(1000 * latencies[-1], 3) if latencies else 0.0,
+        'status_codes': {str(status): count for status, count in sorted(statuses.items())}
+    }
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def load_app(backend: str):
+    """Import the Flask app with the storage backend selected through the environment"""
+    if backend == 'memory':
+        for key in ('POSTGRES_URL', 'DATABASE_URL', 'SQLITE_PATH'):
+            os.environ.pop(key, None)
+    elif backend == 'postgres' and not (os.environ.get('POSTGRES_URL') or os.environ.get('DATABASE_URL')):
+        sys.exit("Set POSTGRES_URL to benchmark the postgres backend")
+    elif backend == 'sqlite' and not os.environ.get('SQLITE_PATH'):
+        sys.exit("Set SQLITE_PATH to benchmark the sqlite backend")
+
+    # Every in-process worker shares one client identity, so the per-client
+    # rate limits would turn nearly all of the load into 429s
+    os.environ['RATE_LIMIT_BOOKINGS'] = '0'
+    os.environ['RATE_LIMIT_LOOKUPS'] = '0'
+
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'api'))
+    import index
+    expected = backend != 'memory'
+    if index.USE_DATABASE != expected:
+        sys.exit(f"App did not start with the {backend} backend")
+    return index.app
+
+def print_report(results: Dict, baseline: Optional[Dict] = None):
+    print(f"{'endpoint':<22}{'reqs':>8}{'err':>6}{'rej':>6}{'rps':>10}{'p50':>10}{'p95':>10}{'p99':>10}")
+    rows = dict(results['endpoints'], overall=results['overall'])
+    for endpoint, stats in rows.items():
+        line = (f"{endpoint:<22}{stats['requests']:>8}{stats['errors']:>6}{stats['rejected']:>6}"
+                f"{stats['throughput_rps']:>10.1f}"
+                f"{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}{stats['p99_ms']:>10.2f}")
+        previous = (baseline or {}).get('endpoints', {}).get(endpoint) if endpoint != 'overall' else (baseline or {}).get('overall')
+        if previous and previous['p95_ms']:
+            change = 100 * (stats['p95_ms'] - previous['p95_ms']) / previous['p95_ms']
+            line += f"   p95 {change:+.1f}% vs {baseline['meta'].get('commit')}"
+        print(line)
+    print("(latencies in ms)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the booking API")
+    parser.add_argument('--target', choices=['inprocess', 'http'], default='inprocess')
+    parser.add_argument('--url', default='http://localhost:5000', help="Base URL for --target http")
+    parser.add_argument('--backend', choices=['memory', 'sqlite', 'postgres'], default='memory',
+                        help="Storage backend for --target inprocess")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10.0, help="Seconds to run")
+    parser.add_argument('--requests', type=int, default=None, help="Requests per worker (overrides --duration)")
+    parser.add_argument('--warmup', type=int, default=20, help="Unrecorded requests per worker")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', default=None, help="Results file (default benchmark-results/<commit>-<target>-<backend>.json)")
+    parser.add_argument('--compare', default=None, help="Earlier results file to compare p95 latencies against")
+    parser.add_argument('--max-rejected', type=float, default=0.1,
+                        help="Fail if more than this fraction of requests is rejected with 429/503")
+    args = parser.parse_args()
+
+    if args.target == 'inprocess':
+        app = load_app(args.backend)
+        make_client = lambda: InProcessClient(app)
+    else:
+        make_client = lambda: HttpClient(args.url)
+
+    status, body = make_client().request('GET', '/api/config')
+    if status != 200:
+        sys.exit(f"GET /api/config returned {status}")
+    workload = Workload(json.loads(body), args.seed)
+
+    samples: Dict = {}
+    lock = threading.Lock()
+    deadline = time.monotonic() + (args.duration if args.requests is None else float('inf'))
+    workers = [threading.Thread(target=run_worker,
+                                args=(i, make_client, workload, deadline, args.requests, args.warmup, samples, lock))
+               for i in range(args.concurrency)]
+    started = time.monotonic()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    wall_time = time.monotonic() - started
+
+    all_latencies = [latency for latencies, _ in samples.values() for latency in latencies]
+    all_statuses: Dict[int, int] = {}
+    for _, statuses in samples.values():
+        for status, count in statuses.items():
+            all_statuses[status] = all_statuses.get(status, 0) + count
+
+    commit = git_commit()
+    backend = args.backend if args.target == 'inprocess' else 'server'
+    results = {
+        'meta': {
+            'commit': commit,
+            'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'target': args.target,
+            'url': args.url if args.target == 'http' else None,
+            'backend': backend,
+            'concurrency': args.concurrency,
+            'duration_s': round(wall_time, 3),
+            'requests_per_worker': args.requests,
+            'warmup': args.warmup,
+            'seed': args.seed,
+            'mix': dict(REQUEST_MIX),
+            'python': platform.python_version(),
+            'platform': platform.platform()
+        },
+        'endpoints': {endpoint: summarize(latencies, statuses, wall_time)
+                      for endpoint, (latencies, statuses) in sorted(samples.items())},
+        'overall': summarize(all_latencies, all_statuses, wall_time)
+    }
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+    print_report(results, baseline)
+
+    output = args.output or os.path.join('benchmark-results', f"{commit or 'nocommit'}-{args.target}-{backend}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+
+    overall = results['overall']
+    if overall['requests'] and overall['rejected'] / overall['requests'] > args.max_rejected:
+        sys.exit(f"{overall['rejected']} of {overall['requests']} requests were rejected with 429/503, so the "
+                 f"latencies mostly measure admission control; raise the server's limits or lower --concurrency")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+import bisect
+import threading
+from collections import defaultdict
+from typing import Dict, List, Optional, Set
+
+class BookingSearchIndex:
+    """Inverted indexes over the in-memory booking store for admin search
+
+    Mirrors the Postgres search indexes: sorted keys for ticket ID and phone
+    prefixes and date ranges, trigram postings for name fragments and a
+    route map for departure/destination. Bookings are never deleted, only
+    cancelled, so the index only ever needs ``add``; the stored booking
+    dicts are shared with the store, so status changes show up as-is.
+    """
+
+    def __init__(self):
+        self._bookings: Dict[str, Dict] = {}
+        self._ticket_ids: List[str] = []
+        self._phones: List[tuple] = []
+        self._dates: List[tuple] = []
+        self._trigrams: Dict[str, Set[str]] = defaultdict(set)
+        self._departures: Dict[str, Set[str]] = defaultdict(set)
+        self._destinations: Dict[str, Set[str]] = defaultdict(set)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_bookings(cls, bookings: Dict) -> 'BookingSearchIndex':
+        """Build an index from a ticket_id -> booking dict"""
+        index = cls()
+        for booking in bookings.values():
+            index.add(booking)
+        return index
+
+    @staticmethod
+    def _trigrams_of(text: str) -> Set[str]:
+        return {text[i:i + 3] for i in range(len(text) - 2)}
+
+    def add(self, booking: Dict):
+        """Index a new booking"""
+        ticket_id = booking['ticket_id']
+        with self._lock:
+            if ticket_id in self._bookings:
+                return
+            self._bookings[ticket_id] = booking
+            bisect.insort(self._ticket_ids, ticket_id)
+            bisect.insort(self._phones, (str(booking.get('phone', '')), ticket_id))
+            bisect.insort(self._dates, (str(booking.get('date', '')), ticket_id))
+            for trigram in self._trigrams_of(str(booking.get('name', '')).lower()):
+                self._trigrams[trigram].add(ticket_id)
+            self._departures[booking.get('departure')].add(ticket_id)
+            self._destinations[booking.get('destination')].add(ticket_id)
+
+    @staticmethod
+    def _prefix_range(keys: List, prefix: str) -> range:
+        start = bisect.bisect_left(keys, (prefix,))
+        end = bisect.bisect_left(keys, (prefix + '\uffff',))
+        return range(start, end)
+
+    def _match_ticket_prefix(self, prefix: str) -> Set[str]:
+        start = bisect.bisect_left(self._ticket_ids, prefix)
+        end = bisect.bisect_left(self._ticket_ids, prefix + '\uffff')
+        return set(self._ticket_ids[start:end])
+
+    def _match_phone_prefix(self, prefix: str) -> Set[str]:
+        return {self._phones[i][1] for i in self._prefix_range(self._phones, prefix)}
+
+    def _match_date_range(self, date_from: Optional[str], date_to: Optional[str]) -> Set[str]:
+        start = bisect.bisect_left(self._dates, (date_from,)) if date_from else 0
+        end = bisect.bisect_left(self._dates, (date_to + '\uffff',)) if date_to else len(self._dates)
+        return {self._dates[i][1] for i in range(start, end)}
+
+    def _match_name(self, fragment: str) -> Set[str]:
+        fragment = fragment.lower()
+        trigrams = self._trigrams_of(fragment)
+        if trigrams:
+            postings = sorted((self._trigrams.get(t, set()) for t in trigrams), key=len)
+            candidates = set.intersection(*postings)
+        else:
+            # Fragments shorter than a trigram cannot use the postings
+            candidates = self._bookings.keys()
+        return {t for t in candidates if fragment in str(self._bookings[t].get('name', '')).lower()}
+
+    def search(self, ticket_id: Optional[str] = None, phone: Optional[str] = None,
+               name: Optional[str] = None, departure: Optional[str] = None,
+               destination: Optional[str] = None, date_from: Optional[str] = None,
+               date_to: Optional[str] = None, limit: Optional[int] = None) -> List[Dict]:
+        """Find bookings matching every given filter, newest first"""
+        with self._lock:
+            matches = []
+            if ticket_id:
+                matches.append(self._match_ticket_prefix(ticket_id))
+            if phone:
+                matches.append(self._match_phone_prefix(phone))
+            if departure:
+                matches.append(self._departures.get(departure, set()))
+            if destination:
+                matches.append(self._destinations.get(destination, set()))
+            if date_from or date_to:
+                matches.append(self._match_date_range(date_from, date_to))
+            if name:
+                matches.append(self._match_name(name))
+
+            if not matches:
+                return []
+            matches.sort(key=len)
+            ticket_ids = set.intersection(*matches)
+            results = [self._bookings[t] for t in ticket_ids]
+
+        results.sort(key=lambda b: (str(b.get('booked_at', '')), b['ticket_id']), reverse=True)
+        return results[:limit] if limit else results
@@ -0,0 +1,147 @@
+import json
+import os
+import threading
+from typing import Dict, Optional
+
+class BookingJournal:
+    """Snapshot plus append-only journal storage for the desktop booking store
+
+    Every mutation is appended to the journal as one JSON line holding the
+    booking's full current record, then fsynced, so each booking or
+    cancellation costs one small write. Loading replays the journal over
+    the snapshot (records are idempotent puts, so replaying twice is safe).
+    Once ``compact_every`` records have accumulated, the journal is rotated
+    and a background thread folds it into a fresh snapshot.
+    """
+
+    def __init__(self, snapshot_path: str, journal_path: str, compact_every: int = 1000):
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path
+        self.compacting_path = journal_path + '.compacting'
+        self.compact_every = compact_every
+        self._bookings: Dict = {}
+        self._file = None
+        self._entries = 0
+        self._compaction: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def load(self) -> Dict:
+        """Load the snapshot, replay any journals over it and return the bookings dict"""
+        if self._file is not None:
+            return self._bookings
+
+        bookings = {}
+        if os.path.exists(self.snapshot_path):
+            try:
+                with open(self.snapshot_path, 'r') as f:
+                    bookings = json.load(f)
+            except (OSError, ValueError):
+                bookings = {}
+
+        replayed = self._replay(self.compacting_path, bookings) + self._replay(self.journal_path, bookings)
+        self._bookings = bookings
+        self._file = open(self.journal_path, 'a')
+
+        # Fold leftovers from the last run straight into the snapshot
+        if replayed:
+            self._rotate_and_compact(background=False)
+        return bookings
+
+    def _replay(self, path: str, bookings: Dict) -> int:
+        if not os.path.exists(path):
+            return 0
+
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        # A crash mid-append can leave a partial last line; drop it so the
+        # next append starts on a clean line
+        end = data.rfind(b'\n') + 1
+        if end < len(data):
+            with open(path, 'r+b') as f:
+                f.truncate(end)
+
+        count = 0
+        for line in data[:end].splitlines():
+            try:
+                booking = json.loads(line)
+            except ValueError:
+                continue
+            bookings[booking['ticket_id']] = booking
+            count += 1
+        return count
+
+    def append(self, booking: Dict):
+        """Durably record the current state of one booking"""
+        with self._lock:
+            self._file.write(json.dumps(booking) + '\n')
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._entries += 1
+            due = self._entries >= self.compact_every and self._compaction is None
+        if due:
+            self._rotate_and_compact(background=True)
+
+    def _rotate_and_compact(self, background: bool):
+        with self._lock:
+            if self._compaction is not None:
+                return
+            # Records after this point go to a fresh journal; the rotated one
+            # stays on disk until the new snapshot is safely in place
+            self._file.close()
+            if not os.path.exists(self.compacting_path):
+                os.replace(self.journal_path, self.compacting_path)
+            else:
+                self._append_file(self.journal_path, self.compacting_path)
+                os.remove(self.journal_path)
+            self._file = open(self.journal_path, 'a')
+            self._entries = 0
+            snapshot = {ticket_id: dict(booking) for ticket_id, booking in self._bookings.items()}
+            self._compaction = threading.Thread(target=self._write_snapshot, args=(snapshot,), daemon=True)
+
+        if background:
+            self._compaction.start()
+        else:
+            self._compaction.run()
+
+    @staticmethod
+    def _append_file(source: str, target: str):
+        with open(source, 'rb') as src, open(target, 'ab') as dst:
+            dst.write(src.read())
+            dst.flush()
+            os.fsync(dst.fileno())
+
+    def _write_snapshot(self, snapshot: Dict):
+        try:
+            tmp_path = self.snapshot_path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(snapshot, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.snapshot_path)
+            self._fsync_dir()
+            os.remove(self.compacting_path)
+        except OSError as e:
+            print(f"Journal compaction failed: {e}")
+        finally:
+            with self._lock:
+                self._compaction = None
+
+    def _fsync_dir(self):
+        if not hasattr(os, 'O_DIRECTORY'):
+            return
+        fd = os.open(os.path.dirname(os.path.abspath(self.snapshot_path)), os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def close(self):
+        """Wait for any running compaction and close the journal"""
+        compaction = self._compaction
+        if compaction is not None and compaction.is_alive():
+            compaction.join()
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
@@ -0,0 +1,62 @@
+import threading
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+class BookingStats:
+    """Running booking counters for the in-memory stores
+
+    The in-memory counterpart of the ``booking_stats`` rollup table: built
+    once from the existing bookings, then updated on every booking and
+    status change, so dashboards and reports never loop over history.
+    """
+
+    def __init__(self):
+        self._totals: Dict[Optional[str], List] = defaultdict(lambda: [0, 0])
+        self._confirmed_routes: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_bookings(cls, bookings: Dict) -> 'BookingStats':
+        """Build counters from a ticket_id -> booking dict"""
+        stats = cls()
+        for booking in bookings.values():
+            stats.record(booking)
+        return stats
+
+    @staticmethod
+    def _route(booking: Dict) -> str:
+        return f"{booking.get('departure')} to {booking.get('destination')}"
+
+    def _apply(self, booking: Dict, status: Optional[str], delta: int):
+        totals = self._totals[status]
+        totals[0] += delta
+        totals[1] += delta * booking.get('fare', 0)
+        if status == 'confirmed':
+            self._confirmed_routes[self._route(booking)] += delta
+
+    def record(self, booking: Dict):
+        """Count a new booking under its current status"""
+        with self._lock:
+            self._apply(booking, booking.get('status'), 1)
+
+    def change_status(self, booking: Dict, old_status: Optional[str], new_status: Optional[str]):
+        """Move a booking from one status bucket to another"""
+        with self._lock:
+            self._apply(booking, old_status, -1)
+            self._apply(booking, new_status, 1)
+
+    def summary(self) -> Dict:
+        """Get total, confirmed and cancelled counts plus confirmed revenue"""
+        with self._lock:
+            return {
+                'total_bookings': sum(count for count, _ in self._totals.values()),
+                'confirmed': self._totals['confirmed'][0] if 'confirmed' in self._totals else 0,
+                'cancelled': self._totals['cancelled'][0] if 'cancelled' in self._totals else 0,
+                'total_revenue': self._totals['confirmed'][1] if 'confirmed' in self._totals else 0
+            }
+
+    def top_routes(self, limit: int = 5) -> List[Tuple[str, int]]:
+        """Get (route, confirmed bookings) pairs for the busiest routes"""
+        with self._lock:
+            routes = [(route, count) for route, count in self._confirmed_routes.items() if count > 0]
+        return sorted(routes, key=lambda x: x[1], reverse=True)[:limit]
@@ -1,12 +1,18 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
-import uuid
 import datetime
 import json
 import os
 from typing import Dict, List, Optional
 import hashlib
 
+from booking_index import BookingSearchIndex
+from booking_journal import BookingJournal
+from booking_stats import BookingStats
+from seat_inventory import SeatInventory
+from sqlite_manager import SQLiteDatabaseManager
+from ticket_ids import TICKET_ID_ATTEMPTS, TicketIdGenerator
+
 # Admin credentials (in production, use proper authentication)
 ADMIN_CREDENTIALS = {
     "admin": hashlib.sha256("admin123".encode()).hexdigest(),
@@ -16,11 +22,26 @@ ADMIN_CREDENTIALS = {
 DATA_FILE = "bookings_data.json"
 CONFIG_FILE = "system_config.json"
 
+# Booking storage: "json" rewrites DATA_FILE on every change, "journal"
+# appends each change to JOURNAL_FILE (DATA_FILE then only changes on
+# compaction) and "sqlite" keeps bookings in the indexed SQLITE_FILE database
+STORAGE_BACKEND = "journal"
+JOURNAL_FILE = "bookings_journal.jsonl"
+JOURNAL_COMPACT_EVERY = 1000
+SQLITE_FILE = "bookings.db"
+
+_journal = BookingJournal(DATA_FILE, JOURNAL_FILE, JOURNAL_COMPACT_EVERY) if STORAGE_BACKEND == "journal" else None
+
 class DataManager:
     """Manages persistent storage of bookings and configuration"""
     
     @staticmethod
     def load_bookings() -> Dict:
+        if STORAGE_BACKEND == "sqlite":
+            SQLiteDatabaseManager.initialize_pool(SQLITE_FILE)
+            return {row['ticket_id']: row for row in reversed(SQLiteDatabaseManager.get_all_bookings())}
+        if _journal is not None:
+            return _journal.load()
         if os.path.exists(DATA_FILE):
             try:
                 with open(DATA_FILE, 'r') as f:
@@ -34,6 +55,48 @@ class DataManager:
         with open(DATA_FILE, 'w') as f:
             json.dump(bookings, f, indent=2)
     
+    @staticmethod
+    def record_booking(bookings: Dict, booking: Dict) -> bool:
+        """Persist a new or changed booking; bookings is the full dict it belongs to
+
+        With the sqlite backend a new booking is only stored if its seat is
+        neither booked nor held in SQLITE_FILE, which other apps may share;
+        returns False otherwise. Database errors are raised to the caller.
+        """
+        if STORAGE_BACKEND == "sqlite":
+            if booking.get('status') == 'cancelled':
+                return SQLiteDatabaseManager.cancel_booking(booking['ticket_id'])
+            return SQLiteDatabaseManager.reserve_seat(booking) is not None
+        if _journal is not None:
+            _journal.append(booking)
+        else:
+            DataManager.save_bookings(bookings)
+        return True
+    
+    @staticmethod
+    def cancel_booking(bookings: Dict, booking: Dict, promoted_ticket_id: str) -> Optional[Dict]:
+        """Mark a booking cancelled and persist it
+
+        With the sqlite backend the freed seat is booked under
+        ``promoted_ticket_id`` for the first customer on the journey's
+        waitlist; returns that booking, or None if nobody was waiting.
+        Raises ValueError, leaving the booking as it was, if it is no longer
+        confirmed in SQLITE_FILE (e.g. another app cancelled it).
+        """
+        if STORAGE_BACKEND == "sqlite":
+            if not SQLiteDatabaseManager.cancel_booking(booking['ticket_id'], promoted_ticket_id):
+                raise ValueError(f"Ticket {booking['ticket_id']} is not a confirmed booking in {SQLITE_FILE}")
+            booking['status'] = 'cancelled'
+            return SQLiteDatabaseManager.get_booking(promoted_ticket_id)
+        booking['status'] = 'cancelled'
+        DataManager.record_booking(bookings, booking)
+        return None
+    
+    @staticmethod
+    def close():
+        if _journal is not None:
+            _journal.close()
+    
     @staticmethod
     def load_config() -> Dict:
         if os.path.exists(CONFIG_FILE):
@@ -124,6 +187,10 @@ class BusBookingSystem:
         
         self.bookings = DataManager.load_bookings()
         self.config = DataManager.load_config()
+        self.seats = SeatInventory.from_bookings(self.bookings, self.config['total_seats'])
+        self.search_index = BookingSearchIndex.from_bookings(self.bookings)
+        self.stats = BookingStats.from_bookings(self.bookings)
+        self.ticket_ids = TicketIdGenerator()
         
         self.setup_styles()
         self.create_main_interface()
@@ -283,11 +350,11 @@ class BusBookingSystem:
         stats_frame = ttk.LabelFrame(self.admin_content_frame, text="Statistics", padding="15")
         stats_frame.pack(fill='x', pady=10)
         
-        total_bookings = len(self.bookings)
-        confirmed = sum(1 for b in self.bookings.values() if b.get('status') == 'confirmed')
-        cancelled = sum(1 for b in self.bookings.values() if b.get('status') == 'cancelled')
-        total_revenue = sum(b.get('fare', 0) for b in self.bookings.values() 
-                          if b.get('status') == 'confirmed')
+        summary = self.stats.summary()
+        total_bookings = summary['total_bookings']
+        confirmed = summary['confirmed']
+        cancelled = summary['cancelled']
+        total_revenue = summary['total_revenue']
         
         stats = [
             (f"Total Bookings: {total_bookings}", 0),
@@ -378,9 +445,7 @@ class BusBookingSystem:
             ticket_id = item['values'][0]
             
             if messagebox.askyesno("Confirm", f"Cancel booking {ticket_id}?"):
-                if ticket_id in self.bookings:
-                    self.bookings[ticket_id]['status'] = 'cancelled'
-                    DataManager.save_bookings(self.bookings)
+                if ticket_id in self.bookings and self.cancel_booking(self.bookings[ticket_id]):
                     messagebox.showinfo("Success", "Booking cancelled")
                     self.admin_view_bookings()
         
@@ -428,23 +493,31 @@ class BusBookingSystem:
         def perform_search():
             self.clear_frame(results_frame)
             
-            search_term = search_entry.get().strip().upper()
+            search_term = search_entry.get().strip()
             if not search_term:
                 messagebox.showwarning("Input Required", "Enter search term")
                 return
             
             search_field = search_type.get().lower().replace(" ", "_")
-            if search_field == "ticket_id":
-                search_field = "ticket_id"
             
-            results = []
-            for ticket_id, booking in self.bookings.items():
-                if search_field == "route":
-                    route = f"{booking.get('departure', '')} to {booking.get('destination', '')}"
-                    if search_term in route.upper():
-                        results.append((ticket_id, booking))
-                elif search_term in str(booking.get(search_field, '')).upper():
-                    results.append((ticket_id, booking))
+            # Ticket ID and phone match by prefix, names by fragment, routes
+            # as "City" (either end) or "City to City", dates exactly
+            if search_field == "ticket_id":
+                matches = self.search_index.search(ticket_id=search_term.upper())
+            elif search_field == "phone":
+                matches = self.search_index.search(phone=search_term)
+            elif search_field == "name":
+                matches = self.search_index.search(name=search_term)
+            elif search_field == "date":
+                matches = self.search_index.search(date_from=search_term, date_to=search_term)
+            else:
+                cities = [c.strip().title() for c in search_term.lower().split(' to ')]
+                if len(cities) == 2:
+                    matches = self.search_index.search(departure=cities[0], destination=cities[1])
+                else:
+                    matches = self.search_index.search(departure=cities[0])
+                    matches += self.search_index.search(destination=cities[0])
+            results = [(booking['ticket_id'], booking) for booking in matches]
             
             if not results:
                 ttk.Label(results_frame, text="No results found", 
@@ -530,19 +603,13 @@ class BusBookingSystem:
         report_frame = ttk.LabelFrame(self.admin_work_area, text="Booking Summary", padding="20")
         report_frame.pack(fill='both', expand=True, padx=20, pady=20)
         
-        total_bookings = len(self.bookings)
-        confirmed = sum(1 for b in self.bookings.values() if b.get('status') == 'confirmed')
-        cancelled = sum(1 for b in self.bookings.values() if b.get('status') == 'cancelled')
+        summary = self.stats.summary()
+        total_bookings = summary['total_bookings']
+        confirmed = summary['confirmed']
+        cancelled = summary['cancelled']
         pending = total_bookings - confirmed - cancelled
         
-        total_revenue = sum(b.get('fare', 0) for b in self.bookings.values() 
-                          if b.get('status') == 'confirmed')
-        
-        route_stats = {}
-        for booking in self.bookings.values():
-            if booking.get('status') == 'confirmed':
-                route = f"{booking.get('departure')} to {booking.get('destination')}"
-                route_stats[route] = route_stats.get(route, 0) + 1
+        total_revenue = summary['total_revenue']
         
         report_text = f"""
 ╔══════════════════════════════════════╗
@@ -561,7 +628,7 @@ Financial Summary:
 Top Routes:
 """
         
-        top_routes = sorted(route_stats.items(), key=lambda x: x[1], reverse=True)[:5]
+        top_routes = self.stats.top_routes(5)
         for i, (route, count) in enumerate(top_routes, 1):
             report_text += f"  {i}. {route}: {count} bookings\n"
         
@@ -735,15 +802,10 @@ Top Routes:
             messagebox.showerror("Invalid Seat", f"Choose seat 1-{self.config['total_seats']}")
             return
         
-        for booking in self.bookings.values():
-            if (booking['departure'] == data['departure'] and 
-                booking['destination'] == data['destination'] and
-                booking['date'] == data['date'] and
-                booking['time'] == data['time'] and
-                booking['seat'] == seat and
-                booking.get('status') != 'cancelled'):
-                messagebox.showerror("Seat Taken", "This seat is already booked for this journey")
-                return
+        journey = (data['departure'], data['destination'], data['date'], data['time'])
+        if not self.seats.is_available(journey, seat):
+            messagebox.showerror("Seat Taken", "This seat is already booked for this journey")
+            return
         
         route = f"{data['departure']} to {data['destination']}"
         if route not in self.config['bus_routes']:
@@ -751,7 +813,7 @@ Top Routes:
             return
         
         fare = self.config['bus_routes'][route]
-        ticket_id = str(uuid.uuid4())[:8].upper()
+        ticket_id = self.ticket_ids.generate()
         
         booking_data = {
             'ticket_id': ticket_id,
@@ -769,8 +831,24 @@ Top Routes:
             'booked_at': datetime.datetime.now().isoformat(),
         }
         
-        self.bookings[ticket_id] = booking_data
-        DataManager.save_bookings(self.bookings)
+        for attempt in range(TICKET_ID_ATTEMPTS):
+            self.bookings[ticket_id] = booking_data
+            try:
+                stored = DataManager.record_booking(self.bookings, booking_data)
+                break
+            except Exception as e:
+                del self.bookings[ticket_id]
+                if attempt + 1 < TICKET_ID_ATTEMPTS and SQLiteDatabaseManager.is_ticket_id_conflict(e):
+                    # Another app sharing SQLITE_FILE minted the same ID
+                    ticket_id = booking_data['ticket_id'] = self.ticket_ids.generate()
+                    continue
+                messagebox.showerror("Booking Failed", f"The booking could not be saved: {e}")
+                return
+        if not stored:
+            del self.bookings[ticket_id]
+            messagebox.showerror("Seat Taken", "This seat is already booked or held for this journey")
+            return
+        self.track_booking(booking_data)
         
         receipt = f"""
 ╔══════════════════════════════════════╗
@@ -810,11 +888,15 @@ Please arrive 15 minutes before departure.
         ticket_entry.pack(pady=5)
         
         def search_ticket():
-            ticket_id = ticket_entry.get().strip().upper()
+            ticket_id = TicketIdGenerator.normalize(ticket_entry.get())
             if not ticket_id:
                 messagebox.showwarning("Input Required", "Enter Ticket ID")
                 return
             
+            if not TicketIdGenerator.is_valid(ticket_id):
+                messagebox.showerror("Invalid Ticket ID", "Check the Ticket ID for typing mistakes")
+                return
+            
             if ticket_id in self.bookings:
                 booking = self.bookings[ticket_id]
                 details = f"""
@@ -844,11 +926,15 @@ Status: {booking['status'].upper()}
         ticket_entry.pack(pady=5)
         
         def cancel_ticket():
-            ticket_id = ticket_entry.get().strip().upper()
+            ticket_id = TicketIdGenerator.normalize(ticket_entry.get())
             if not ticket_id:
                 messagebox.showwarning("Input Required", "Enter Ticket ID")
                 return
             
+            if not TicketIdGenerator.is_valid(ticket_id):
+                messagebox.showerror("Invalid Ticket ID", "Check the Ticket ID for typing mistakes")
+                return
+            
             if ticket_id not in self.bookings:
                 messagebox.showerror("Not Found", "Invalid Ticket ID")
                 return
@@ -858,10 +944,9 @@ Status: {booking['status'].upper()}
                 return
             
             if messagebox.askyesno("Confirm", f"Cancel ticket {ticket_id}?"):
-                self.bookings[ticket_id]['status'] = 'cancelled'
-                DataManager.save_bookings(self.bookings)
-                messagebox.showinfo("Success", "Ticket cancelled successfully")
-                self.show_welcome_customer()
+                if self.cancel_booking(self.bookings[ticket_id]):
+                    messagebox.showinfo("Success", "Ticket cancelled successfully")
+                    self.show_welcome_customer()
         
         ttk.Button(self.customer_content, text="Cancel Ticket", 
                   command=cancel_ticket, style='Danger.TButton').pack(pady=10)
@@ -877,11 +962,15 @@ Status: {booking['status'].upper()}
         ticket_entry.pack(pady=5)
         
         def load_booking():
-            ticket_id = ticket_entry.get().strip().upper()
+            ticket_id = TicketIdGenerator.normalize(ticket_entry.get())
             if not ticket_id:
                 messagebox.showwarning("Input Required", "Enter Ticket ID")
                 return
             
+            if not TicketIdGenerator.is_valid(ticket_id):
+                messagebox.showerror("Invalid Ticket ID", "Check the Ticket ID for typing mistakes")
+                return
+            
             if ticket_id not in self.bookings:
                 messagebox.showerror("Not Found", "Invalid Ticket ID")
                 return
@@ -986,6 +1075,32 @@ Status: {booking['status'].upper()}
         
         ttk.Button(self.customer_content, text="Show Stops", command=show_stops).pack(pady=10)
     
+    def track_booking(self, booking: Dict):
+        """Add a stored booking to the in-memory bookings, seat map, search index and statistics"""
+        self.bookings[booking['ticket_id']] = booking
+        self.seats.reserve(SeatInventory.journey_of(booking), int(booking['seat']))
+        self.search_index.add(booking)
+        self.stats.record(booking)
+    
+    def cancel_booking(self, booking: Dict) -> bool:
+        """Cancel a booking and book its seat for the next customer on the waitlist, if any
+
+        Returns False, after telling the user, if the cancellation could not be saved.
+        """
+        old_status = booking.get('status')
+        try:
+            promoted = DataManager.cancel_booking(self.bookings, booking, self.ticket_ids.generate())
+        except Exception as e:
+            booking['status'] = old_status
+            messagebox.showerror("Cancellation Failed", f"The cancellation could not be saved: {e}")
+            return False
+        if old_status != 'cancelled':
+            self.seats.release(SeatInventory.journey_of(booking), int(booking['seat']))
+        self.stats.change_status(booking, old_status, 'cancelled')
+        if promoted is not None:
+            self.track_booking(promoted)
+        return True
+    
     def clear_frame(self, frame):
         for widget in frame.winfo_children():
             widget.destroy()
@@ -993,7 +1108,10 @@ Status: {booking['status'].upper()}
 def main():
     root = tk.Tk()
     app = BusBookingSystem(root)
-    root.mainloop()
+    try:
+        root.mainloop()
+    finally:
+        DataManager.close()
 
 if __name__ == "__main__":
     main()
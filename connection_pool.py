@@ -0,0 +1,169 @@
+import threading
+import time
+from collections import deque
+from typing import Dict
+
+import psycopg2
+from psycopg2 import extensions
+from psycopg2.pool import PoolError
+
+class PoolTimeout(PoolError):
+    """Raised when no connection could be checked out within the timeout"""
+
+class ConnectionPool:
+    """Thread-safe psycopg2 connection pool with checkout timeouts and stats
+
+    Opens ``minconn`` connections up front and grows to ``maxconn``; callers
+    beyond that wait up to ``timeout`` seconds for a connection to be
+    returned. Connections that sat idle for longer than ``health_check_after``
+    seconds are pinged before reuse, and broken connections are closed and
+    replaced (counted as recycled) instead of being handed out again.
+    """
+
+    def __init__(self, dsn: str, minconn: int = 1, maxconn: int = 10,
+                 timeout: float = 5.0, health_check_after: float = 30.0):
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError("Invalid pool size")
+        self.dsn = dsn
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.health_check_after = health_check_after
+
+        self._idle = deque()  # (connection, returned_at), most recently returned last
+        self._size = 0
+        self._waiting = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+        self._checkouts = 0
+        self._timeouts = 0
+        self._recycled = 0
+        self._checkout_time = 0.0
+        self._checkout_max = 0.0
+
+        for _ in range(minconn):
+            self._idle.append((self._connect(), time.monotonic()))
+            self._size += 1
+
+    def _connect(self):
+        return psycopg2.connect(self.dsn)
+
+    def _is_healthy(self, conn, idle_for: float) -> bool:
+        if conn.closed:
+            return False
+        if idle_for < self.health_check_after:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def getconn(self):
+        """Check out a connection, waiting up to ``timeout`` seconds for one to free up"""
+        started = time.monotonic()
+        deadline = started + self.timeout
+        while True:
+            with self._cond:
+                while not self._idle and self._size >= self.maxconn and not self._closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeout(f"No connection available within {self.timeout}s")
+                    self._waiting += 1
+                    try:
+                        self._cond.wait(remaining)
+                    finally:
+                        self._waiting -= 1
+                if self._closed:
+                    raise PoolError("connection pool is closed")
+
+                if self._idle:
+                    conn, returned_at = self._idle.pop()
+                else:
+                    # Reserve the slot now and connect outside the lock
+                    conn, returned_at = None, None
+                    self._size += 1
+
+            if conn is None:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+            elif not self._is_healthy(conn, time.monotonic() - returned_at):
+                self._discard(conn)
+                continue
+
+            elapsed = time.monotonic() - started
+            with self._cond:
+                self._checkouts += 1
+                self._checkout_time += elapsed
+                self._checkout_max = max(self._checkout_max, elapsed)
+            return conn
+
+    def putconn(self, conn, close: bool = False):
+        """Return a connection; closed, broken or mid-transaction connections are replaced"""
+        if not close and not conn.closed:
+            status = conn.info.transaction_status
+            if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                close = True
+            elif status != extensions.TRANSACTION_STATUS_IDLE:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    close = True
+
+        if close or conn.closed or self._closed:
+            self._discard(conn)
+            return
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+        with self._cond:
+            self._size -= 1
+            if not self._closed:
+                self._recycled += 1
+            self._cond.notify()
+
+    def stats(self) -> Dict:
+        """Get pool size, usage and checkout latency counters"""
+        with self._cond:
+            return {
+                'min_size': self.minconn,
+                'max_size': self.maxconn,
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                'waiting': self._waiting,
+                'checkouts': self._checkouts,
+                'timeouts': self._timeouts,
+                'recycled': self._recycled,
+                'checkout_avg_ms': round(1000 * self._checkout_time / self._checkouts, 3) if self._checkouts else 0.0,
+                'checkout_max_ms': round(1000 * self._checkout_max, 3)
+            }
+
+    def closeall(self):
+        """Close idle connections and refuse further checkouts"""
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn, _ in idle:
+            try:
+                conn.close()
+            except psycopg2.Error:
+                pass
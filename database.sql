@@ -23,6 +23,32 @@ CREATE TABLE IF NOT EXISTS bookings (
 CREATE INDEX IF NOT EXISTS idx_ticket_id ON bookings(ticket_id);
 CREATE INDEX IF NOT EXISTS idx_status ON bookings(status);
 CREATE INDEX IF NOT EXISTS idx_date ON bookings(date);
+CREATE INDEX IF NOT EXISTS idx_booked_at_id ON bookings(booked_at DESC, id DESC);
+
+-- Admin search indexes: prefix lookups on ticket ID and phone, trigram
+-- matching on name fragments, and route + date lookups
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX IF NOT EXISTS idx_ticket_id_prefix ON bookings(ticket_id varchar_pattern_ops);
+CREATE INDEX IF NOT EXISTS idx_phone_prefix ON bookings(phone varchar_pattern_ops);
+CREATE INDEX IF NOT EXISTS idx_name_trgm ON bookings USING GIN (name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_route_date ON bookings(departure, destination, date);
+
+-- Databases created before the index may hold double-booked seats, which would
+-- make creating it fail: keep the earliest confirmed booking for each seat and
+-- cancel the rest (a no-op once the index exists)
+UPDATE bookings SET status = 'cancelled', updated_at = CURRENT_TIMESTAMP
+WHERE status = 'confirmed' AND EXISTS (
+    SELECT 1 FROM bookings earlier
+    WHERE earlier.departure = bookings.departure AND earlier.destination = bookings.destination
+    AND earlier.date = bookings.date AND earlier.time = bookings.time AND earlier.seat = bookings.seat
+    AND earlier.status = 'confirmed' AND earlier.id < bookings.id
+);
+
+-- At most one confirmed booking per seat per journey; cancelled rows are ignored.
+-- Also serves as the conflict target for single-statement seat reservation.
+CREATE UNIQUE INDEX IF NOT EXISTS idx_confirmed_seat
+    ON bookings(departure, destination, date, time, seat)
+    WHERE status = 'confirmed';
 
 -- Create routes table
 CREATE TABLE IF NOT EXISTS routes (
@@ -30,10 +56,14 @@ CREATE TABLE IF NOT EXISTS routes (
     route_name VARCHAR(200) UNIQUE NOT NULL,
     fare DECIMAL(10, 2) NOT NULL,
     schedule VARCHAR(50),
+    duration_minutes INTEGER,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Tables created before trip durations were added
+ALTER TABLE routes ADD COLUMN IF NOT EXISTS duration_minutes INTEGER;
+
 -- Create bus_stops table
 CREATE TABLE IF NOT EXISTS bus_stops (
     id SERIAL PRIMARY KEY,
@@ -96,6 +126,55 @@ INSERT INTO routes (route_name, fare, schedule) VALUES
     ('Harare to Norton', 2, '06:30 PM')
 ON CONFLICT (route_name) DO NOTHING;
 
+-- Default trip durations, used by the journey planner to check connections;
+-- routes that already have one keep it
+UPDATE routes SET duration_minutes = d.minutes
+FROM (VALUES
+    ('Bulawayo to Gweru', 135),
+    ('Gweru to Bulawayo', 135),
+    ('Bulawayo to Kwekwe', 185),
+    ('Kwekwe to Bulawayo', 185),
+    ('Bulawayo to Kadoma', 245),
+    ('Kadoma to Bulawayo', 245),
+    ('Bulawayo to Chegutu', 280),
+    ('Chegutu to Bulawayo', 280),
+    ('Bulawayo to Norton', 335),
+    ('Norton to Bulawayo', 335),
+    ('Bulawayo to Harare', 375),
+    ('Harare to Bulawayo', 375),
+    ('Gweru to Kwekwe', 50),
+    ('Kwekwe to Gweru', 50),
+    ('Gweru to Kadoma', 110),
+    ('Kadoma to Gweru', 110),
+    ('Gweru to Chegutu', 145),
+    ('Chegutu to Gweru', 145),
+    ('Gweru to Norton', 200),
+    ('Norton to Gweru', 200),
+    ('Gweru to Harare', 240),
+    ('Harare to Gweru', 240),
+    ('Kwekwe to Kadoma', 60),
+    ('Kadoma to Kwekwe', 60),
+    ('Kwekwe to Chegutu', 95),
+    ('Chegutu to Kwekwe', 95),
+    ('Kwekwe to Norton', 150),
+    ('Norton to Kwekwe', 150),
+    ('Kwekwe to Harare', 190),
+    ('Harare to Kwekwe', 190),
+    ('Kadoma to Chegutu', 35),
+    ('Chegutu to Kadoma', 35),
+    ('Kadoma to Norton', 90),
+    ('Norton to Kadoma', 90),
+    ('Kadoma to Harare', 130),
+    ('Harare to Kadoma', 130),
+    ('Chegutu to Norton', 55),
+    ('Norton to Chegutu', 55),
+    ('Chegutu to Harare', 95),
+    ('Harare to Chegutu', 95),
+    ('Norton to Harare', 40),
+    ('Harare to Norton', 40)
+) AS d (route_name, minutes)
+WHERE routes.route_name = d.route_name AND routes.duration_minutes IS NULL;
+
 -- Insert default bus stops
 INSERT INTO bus_stops (city, stops) VALUES
     ('Bulawayo', 'City Hall, Renkini Bus Terminus, and National Railways of Zimbabwe Station.'),
@@ -112,5 +191,167 @@ INSERT INTO system_config (config_key, config_value) VALUES
     ('total_seats', '50'),
     ('company_name', 'Chikukwa Bus Services'),
     ('contact_phone', '+263777189947'),
-    ('contact_email', 'support@chikukwabus.com')
+    ('contact_email', 'support@chikukwabus.com'),
+    ('config_version', '1')
 ON CONFLICT (config_key) DO NOTHING;
+
+-- Bump config_version whenever routes, bus stops or config values change so
+-- API processes can detect a stale cached config with a single cheap lookup
+CREATE OR REPLACE FUNCTION bump_config_version() RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE system_config
+    SET config_value = (config_value::BIGINT + 1)::TEXT, updated_at = CURRENT_TIMESTAMP
+    WHERE config_key = 'config_version';
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_routes_config_version ON routes;
+CREATE TRIGGER trg_routes_config_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON routes
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_config_version();
+
+DROP TRIGGER IF EXISTS trg_bus_stops_config_version ON bus_stops;
+CREATE TRIGGER trg_bus_stops_config_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON bus_stops
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_config_version();
+
+DROP TRIGGER IF EXISTS trg_system_config_version ON system_config;
+CREATE TRIGGER trg_system_config_version
+    AFTER INSERT OR UPDATE ON system_config
+    FOR EACH ROW WHEN (NEW.config_key <> 'config_version')
+    EXECUTE FUNCTION bump_config_version();
+
+-- Rollup of booking counts and fares per route, travel date and status, kept
+-- current by a trigger so dashboards never aggregate the bookings table
+CREATE TABLE IF NOT EXISTS booking_stats (
+    departure VARCHAR(100) NOT NULL,
+    destination VARCHAR(100) NOT NULL,
+    date DATE NOT NULL,
+    status VARCHAR(20) NOT NULL,
+    booking_count INTEGER NOT NULL DEFAULT 0,
+    revenue DECIMAL(12, 2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (departure, destination, date, status)
+);
+
+CREATE OR REPLACE FUNCTION update_booking_stats() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE booking_stats
+        SET booking_count = booking_count - 1, revenue = revenue - OLD.fare
+        WHERE departure = OLD.departure AND destination = OLD.destination
+        AND date = OLD.date AND status = COALESCE(OLD.status, 'unknown');
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO booking_stats (departure, destination, date, status, booking_count, revenue)
+        VALUES (NEW.departure, NEW.destination, NEW.date, COALESCE(NEW.status, 'unknown'), 1, NEW.fare)
+        ON CONFLICT (departure, destination, date, status)
+        DO UPDATE SET booking_count = booking_stats.booking_count + 1,
+                      revenue = booking_stats.revenue + EXCLUDED.revenue;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_booking_stats ON bookings;
+CREATE TRIGGER trg_booking_stats
+    AFTER INSERT OR DELETE OR UPDATE OF status, fare, departure, destination, date ON bookings
+    FOR EACH ROW EXECUTE FUNCTION update_booking_stats();
+
+-- Backfill once for databases that already hold bookings. This runs in the
+-- same transaction as the trigger creation, so no booking is counted twice.
+INSERT INTO booking_stats (departure, destination, date, status, booking_count, revenue)
+SELECT departure, destination, date, COALESCE(status, 'unknown'), COUNT(*), SUM(fare)
+FROM bookings
+WHERE NOT EXISTS (SELECT 1 FROM booking_stats)
+GROUP BY departure, destination, date, COALESCE(status, 'unknown');
+
+-- Stored responses for Idempotency-Key retries of booking requests. A row
+-- with no status_code is a claim held by a request still being processed.
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    idempotency_key VARCHAR(255) PRIMARY KEY,
+    request_hash CHAR(64) NOT NULL,
+    claim_token CHAR(32),
+    status_code INTEGER,
+    response_body TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    expires_at TIMESTAMP NOT NULL
+);
+
+-- Tables created before claim tokens were added
+ALTER TABLE idempotency_keys ADD COLUMN IF NOT EXISTS claim_token CHAR(32);
+
+CREATE INDEX IF NOT EXISTS idx_idempotency_expires_at ON idempotency_keys(expires_at);
+
+-- Seats held for a customer who is still filling in the booking form.
+-- Availability checks ignore holds past expires_at. Sweeping expired rows
+-- (one DELETE on idx_seat_holds_expires_at) reclaims space, and books the
+-- seat for the head of the journey's waitlist if anyone is waiting.
+CREATE TABLE IF NOT EXISTS seat_holds (
+    id SERIAL PRIMARY KEY,
+    hold_id VARCHAR(32) UNIQUE NOT NULL,
+    departure VARCHAR(100) NOT NULL,
+    destination VARCHAR(100) NOT NULL,
+    date DATE NOT NULL,
+    time VARCHAR(20) NOT NULL,
+    seat INTEGER NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    expires_at TIMESTAMP NOT NULL
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_seat_holds_seat ON seat_holds(departure, destination, date, time, seat);
+CREATE INDEX IF NOT EXISTS idx_seat_holds_expires_at ON seat_holds(expires_at);
+
+-- Customers waiting for a seat on a sold-out journey, served in id order.
+-- Cancelling a booking books the freed seat for the first waiting customer
+-- in the same transaction (DatabaseManager.cancel_booking).
+CREATE TABLE IF NOT EXISTS waitlist (
+    id SERIAL PRIMARY KEY,
+    waitlist_id VARCHAR(32) UNIQUE NOT NULL,
+    name VARCHAR(255) NOT NULL,
+    age INTEGER NOT NULL,
+    phone VARCHAR(50) NOT NULL,
+    email VARCHAR(255),
+    departure VARCHAR(100) NOT NULL,
+    destination VARCHAR(100) NOT NULL,
+    date DATE NOT NULL,
+    time VARCHAR(20) NOT NULL,
+    fare DECIMAL(10, 2) NOT NULL,
+    status VARCHAR(20) DEFAULT 'waiting',
+    ticket_id VARCHAR(20),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    promoted_at TIMESTAMP
+);
+
+-- Head of the queue and queue positions for a journey
+CREATE INDEX IF NOT EXISTS idx_waitlist_journey ON waitlist(departure, destination, date, time, id)
+WHERE status = 'waiting';
+
+-- A confirmed booking for a seat under a live hold is skipped (the insert
+-- returns no row, like a seat conflict). Booking with a hold deletes the
+-- hold first in the same transaction. While customers are waiting for the
+-- journey, an expired hold keeps blocking too: the seat belongs to the head
+-- of the waitlist, and is booked for them when the hold is swept
+-- (DatabaseManager.release_expired_seat_holds).
+CREATE OR REPLACE FUNCTION skip_held_seat() RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.status = 'confirmed' AND EXISTS (
+        SELECT 1 FROM seat_holds
+        WHERE departure = NEW.departure AND destination = NEW.destination AND date = NEW.date
+        AND time = NEW.time AND seat = NEW.seat
+        AND (expires_at >= CURRENT_TIMESTAMP OR EXISTS (
+            SELECT 1 FROM waitlist
+            WHERE departure = NEW.departure AND destination = NEW.destination AND date = NEW.date
+            AND time = NEW.time AND status = 'waiting'
+        ))
+    ) THEN
+        RETURN NULL;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_bookings_skip_held_seat ON bookings;
+CREATE TRIGGER trg_bookings_skip_held_seat
+    BEFORE INSERT ON bookings
+    FOR EACH ROW EXECUTE FUNCTION skip_held_seat();
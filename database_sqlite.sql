@@ -0,0 +1,353 @@
+-- SQLite schema for Chikukwa Bus Booking System
+-- Mirrors database.sql (tables, indexes and triggers) for the embedded backend
+-- in sqlite_manager.py. Dates and timestamps are stored as ISO-8601 text.
+
+-- Create bookings table
+CREATE TABLE IF NOT EXISTS bookings (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ticket_id VARCHAR(20) UNIQUE NOT NULL,
+    name VARCHAR(255) NOT NULL,
+    age INTEGER NOT NULL,
+    phone VARCHAR(50) NOT NULL,
+    email VARCHAR(255),
+    departure VARCHAR(100) NOT NULL,
+    destination VARCHAR(100) NOT NULL,
+    date TEXT NOT NULL,
+    time VARCHAR(20) NOT NULL,
+    seat INTEGER NOT NULL,
+    fare REAL NOT NULL,
+    status VARCHAR(20) DEFAULT 'confirmed',
+    booked_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now')),
+    updated_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+);
+
+-- Create index for faster ticket lookups
+CREATE INDEX IF NOT EXISTS idx_ticket_id ON bookings(ticket_id);
+CREATE INDEX IF NOT EXISTS idx_status ON bookings(status);
+CREATE INDEX IF NOT EXISTS idx_date ON bookings(date);
+CREATE INDEX IF NOT EXISTS idx_booked_at_id ON bookings(booked_at DESC, id DESC);
+
+-- Databases created before the index may hold double-booked seats, which would
+-- make creating it fail: keep the earliest confirmed booking for each seat and
+-- cancel the rest (a no-op once the index exists)
+UPDATE bookings SET status = 'cancelled', updated_at = strftime('%Y-%m-%dT%H:%M:%f', 'now')
+WHERE status = 'confirmed' AND EXISTS (
+    SELECT 1 FROM bookings earlier
+    WHERE earlier.departure = bookings.departure AND earlier.destination = bookings.destination
+    AND earlier.date = bookings.date AND earlier.time = bookings.time AND earlier.seat = bookings.seat
+    AND earlier.status = 'confirmed' AND earlier.id < bookings.id
+);
+
+-- At most one confirmed booking per seat per journey; cancelled rows are ignored.
+-- Also serves as the conflict target for single-statement seat reservation.
+CREATE UNIQUE INDEX IF NOT EXISTS idx_confirmed_seat
+    ON bookings(departure, destination, date, time, seat)
+    WHERE status = 'confirmed';
+
+-- Admin search indexes (name fragments use the FTS5 table in sqlite_manager.py)
+CREATE INDEX IF NOT EXISTS idx_phone_prefix ON bookings(phone);
+CREATE INDEX IF NOT EXISTS idx_route_date ON bookings(departure, destination, date);
+
+-- Create routes table
+CREATE TABLE IF NOT EXISTS routes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    route_name VARCHAR(200) UNIQUE NOT NULL,
+    fare REAL NOT NULL,
+    schedule VARCHAR(50),
+    duration_minutes INTEGER,
+    created_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now')),
+    updated_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+);
+
+-- Create bus_stops table
+CREATE TABLE IF NOT EXISTS bus_stops (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    city VARCHAR(100) UNIQUE NOT NULL,
+    stops TEXT NOT NULL,
+    created_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+);
+
+-- Create system_config table
+CREATE TABLE IF NOT EXISTS system_config (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    config_key VARCHAR(100) UNIQUE NOT NULL,
+    config_value TEXT NOT NULL,
+    updated_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+);
+
+-- Rollup of booking counts and fares per route, travel date and status
+CREATE TABLE IF NOT EXISTS booking_stats (
+    departure VARCHAR(100) NOT NULL,
+    destination VARCHAR(100) NOT NULL,
+    date TEXT NOT NULL,
+    status VARCHAR(20) NOT NULL,
+    booking_count INTEGER NOT NULL DEFAULT 0,
+    revenue REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (departure, destination, date, status)
+);
+
+-- Insert default routes
+INSERT OR IGNORE INTO routes (route_name, fare, schedule) VALUES
+    ('Bulawayo to Gweru', 5, '08:00 AM'),
+    ('Gweru to Bulawayo', 5, '02:00 PM'),
+    ('Bulawayo to Kwekwe', 7, '09:00 AM'),
+    ('Kwekwe to Bulawayo', 7, '03:30 PM'),
+    ('Bulawayo to Kadoma', 8, '10:00 AM'),
+    ('Kadoma to Bulawayo', 8, '04:30 PM'),
+    ('Bulawayo to Chegutu', 10, '11:00 AM'),
+    ('Chegutu to Bulawayo', 10, '05:00 PM'),
+    ('Bulawayo to Norton', 13, '12:00 PM'),
+    ('Norton to Bulawayo', 13, '06:00 PM'),
+    ('Bulawayo to Harare', 15, '12:00 PM'),
+    ('Harare to Bulawayo', 15, '06:00 PM'),
+    ('Gweru to Kwekwe', 3, '09:00 AM'),
+    ('Kwekwe to Gweru', 3, '03:00 PM'),
+    ('Gweru to Kadoma', 4, '09:30 AM'),
+    ('Kadoma to Gweru', 4, '02:30 PM'),
+    ('Gweru to Chegutu', 5, '10:15 AM'),
+    ('Chegutu to Gweru', 5, '03:15 PM'),
+    ('Gweru to Norton', 6, '11:00 AM'),
+    ('Norton to Gweru', 6, '04:00 PM'),
+    ('Gweru to Harare', 7, '11:30 AM'),
+    ('Harare to Gweru', 7, '05:00 PM'),
+    ('Kwekwe to Kadoma', 2, '10:00 AM'),
+    ('Kadoma to Kwekwe', 2, '04:00 PM'),
+    ('Kwekwe to Chegutu', 6, '10:45 AM'),
+    ('Chegutu to Kwekwe', 6, '04:15 PM'),
+    ('Kwekwe to Norton', 9, '11:30 AM'),
+    ('Norton to Kwekwe', 9, '05:15 PM'),
+    ('Kwekwe to Harare', 10, '12:15 PM'),
+    ('Harare to Kwekwe', 10, '06:15 PM'),
+    ('Kadoma to Chegutu', 4, '10:30 AM'),
+    ('Chegutu to Kadoma', 4, '04:45 PM'),
+    ('Kadoma to Norton', 5, '11:00 AM'),
+    ('Norton to Kadoma', 5, '05:00 PM'),
+    ('Kadoma to Harare', 6, '11:30 AM'),
+    ('Harare to Kadoma', 6, '05:30 PM'),
+    ('Chegutu to Norton', 1, '11:45 AM'),
+    ('Norton to Chegutu', 1, '05:45 PM'),
+    ('Chegutu to Harare', 3, '12:15 PM'),
+    ('Harare to Chegutu', 3, '06:15 PM'),
+    ('Norton to Harare', 2, '12:30 PM'),
+    ('Harare to Norton', 2, '06:30 PM');
+
+-- Default trip durations, used by the journey planner to check connections;
+-- routes that already have one keep it
+WITH d (route_name, minutes) AS (VALUES
+    ('Bulawayo to Gweru', 135),
+    ('Gweru to Bulawayo', 135),
+    ('Bulawayo to Kwekwe', 185),
+    ('Kwekwe to Bulawayo', 185),
+    ('Bulawayo to Kadoma', 245),
+    ('Kadoma to Bulawayo', 245),
+    ('Bulawayo to Chegutu', 280),
+    ('Chegutu to Bulawayo', 280),
+    ('Bulawayo to Norton', 335),
+    ('Norton to Bulawayo', 335),
+    ('Bulawayo to Harare', 375),
+    ('Harare to Bulawayo', 375),
+    ('Gweru to Kwekwe', 50),
+    ('Kwekwe to Gweru', 50),
+    ('Gweru to Kadoma', 110),
+    ('Kadoma to Gweru', 110),
+    ('Gweru to Chegutu', 145),
+    ('Chegutu to Gweru', 145),
+    ('Gweru to Norton', 200),
+    ('Norton to Gweru', 200),
+    ('Gweru to Harare', 240),
+    ('Harare to Gweru', 240),
+    ('Kwekwe to Kadoma', 60),
+    ('Kadoma to Kwekwe', 60),
+    ('Kwekwe to Chegutu', 95),
+    ('Chegutu to Kwekwe', 95),
+    ('Kwekwe to Norton', 150),
+    ('Norton to Kwekwe', 150),
+    ('Kwekwe to Harare', 190),
+    ('Harare to Kwekwe', 190),
+    ('Kadoma to Chegutu', 35),
+    ('Chegutu to Kadoma', 35),
+    ('Kadoma to Norton', 90),
+    ('Norton to Kadoma', 90),
+    ('Kadoma to Harare', 130),
+    ('Harare to Kadoma', 130),
+    ('Chegutu to Norton', 55),
+    ('Norton to Chegutu', 55),
+    ('Chegutu to Harare', 95),
+    ('Harare to Chegutu', 95),
+    ('Norton to Harare', 40),
+    ('Harare to Norton', 40)
+)
+UPDATE routes SET duration_minutes = (SELECT minutes FROM d WHERE d.route_name = routes.route_name)
+WHERE duration_minutes IS NULL AND route_name IN (SELECT route_name FROM d);
+
+-- Insert default bus stops
+INSERT OR IGNORE INTO bus_stops (city, stops) VALUES
+    ('Bulawayo', 'City Hall, Renkini Bus Terminus, and National Railways of Zimbabwe Station.'),
+    ('Gweru', 'Main Street, City Centre, and Railway Station.'),
+    ('Kwekwe', 'City Centre, Kwekwe Mall, and Railway Station.'),
+    ('Kadoma', 'City Centre, Kadoma Mall, and Railway Station.'),
+    ('Chegutu', 'City Centre, Chegutu Mall, and Railway Station.'),
+    ('Norton', 'Main Street, Town Centre, and near the Post Office.'),
+    ('Harare', 'City Centre, Avondale, and Mbare Musika Bus Terminus.');
+
+-- Insert system configuration
+INSERT OR IGNORE INTO system_config (config_key, config_value) VALUES
+    ('total_seats', '50'),
+    ('company_name', 'Chikukwa Bus Services'),
+    ('contact_phone', '+263777189947'),
+    ('contact_email', 'support@chikukwabus.com'),
+    ('config_version', '1');
+
+-- Bump config_version whenever routes, bus stops or config values change
+CREATE TRIGGER IF NOT EXISTS trg_routes_config_version_insert AFTER INSERT ON routes
+BEGIN
+    UPDATE system_config SET config_value = CAST(config_value AS INTEGER) + 1 WHERE config_key = 'config_version';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_routes_config_version_update AFTER UPDATE ON routes
+BEGIN
+    UPDATE system_config SET config_value = CAST(config_value AS INTEGER) + 1 WHERE config_key = 'config_version';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_routes_config_version_delete AFTER DELETE ON routes
+BEGIN
+    UPDATE system_config SET config_value = CAST(config_value AS INTEGER) + 1 WHERE config_key = 'config_version';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_bus_stops_config_version_insert AFTER INSERT ON bus_stops
+BEGIN
+    UPDATE system_config SET config_value = CAST(config_value AS INTEGER) + 1 WHERE config_key = 'config_version';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_bus_stops_config_version_update AFTER UPDATE ON bus_stops
+BEGIN
+    UPDATE system_config SET config_value = CAST(config_value AS INTEGER) + 1 WHERE config_key = 'config_version';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_bus_stops_config_version_delete AFTER DELETE ON bus_stops
+BEGIN
+    UPDATE system_config SET config_value = CAST(config_value AS INTEGER) + 1 WHERE config_key = 'config_version';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_system_config_version_insert AFTER INSERT ON system_config
+WHEN NEW.config_key <> 'config_version'
+BEGIN
+    UPDATE system_config SET config_value = CAST(config_value AS INTEGER) + 1 WHERE config_key = 'config_version';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_system_config_version_update AFTER UPDATE ON system_config
+WHEN NEW.config_key <> 'config_version'
+BEGIN
+    UPDATE system_config SET config_value = CAST(config_value AS INTEGER) + 1 WHERE config_key = 'config_version';
+END;
+
+-- Keep booking_stats current
+CREATE TRIGGER IF NOT EXISTS trg_booking_stats_insert AFTER INSERT ON bookings
+BEGIN
+    INSERT INTO booking_stats (departure, destination, date, status, booking_count, revenue)
+    VALUES (NEW.departure, NEW.destination, NEW.date, COALESCE(NEW.status, 'unknown'), 1, NEW.fare)
+    ON CONFLICT (departure, destination, date, status)
+    DO UPDATE SET booking_count = booking_count + 1, revenue = revenue + excluded.revenue;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_booking_stats_delete AFTER DELETE ON bookings
+BEGIN
+    UPDATE booking_stats
+    SET booking_count = booking_count - 1, revenue = revenue - OLD.fare
+    WHERE departure = OLD.departure AND destination = OLD.destination
+    AND date = OLD.date AND status = COALESCE(OLD.status, 'unknown');
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_booking_stats_update
+AFTER UPDATE OF status, fare, departure, destination, date ON bookings
+BEGIN
+    UPDATE booking_stats
+    SET booking_count = booking_count - 1, revenue = revenue - OLD.fare
+    WHERE departure = OLD.departure AND destination = OLD.destination
+    AND date = OLD.date AND status = COALESCE(OLD.status, 'unknown');
+    INSERT INTO booking_stats (departure, destination, date, status, booking_count, revenue)
+    VALUES (NEW.departure, NEW.destination, NEW.date, COALESCE(NEW.status, 'unknown'), 1, NEW.fare)
+    ON CONFLICT (departure, destination, date, status)
+    DO UPDATE SET booking_count = booking_count + 1, revenue = revenue + excluded.revenue;
+END;
+
+-- Stored responses for Idempotency-Key retries of booking requests. A row
+-- with no status_code is a claim held by a request still being processed.
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    idempotency_key VARCHAR(255) PRIMARY KEY,
+    request_hash CHAR(64) NOT NULL,
+    claim_token CHAR(32),
+    status_code INTEGER,
+    response_body TEXT,
+    created_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now')),
+    expires_at TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_idempotency_expires_at ON idempotency_keys(expires_at);
+
+-- Seats held for a customer who is still filling in the booking form.
+-- Availability checks ignore holds past expires_at. Sweeping expired rows
+-- (one DELETE on idx_seat_holds_expires_at) reclaims space, and books the
+-- seat for the head of the journey's waitlist if anyone is waiting.
+CREATE TABLE IF NOT EXISTS seat_holds (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    hold_id VARCHAR(32) UNIQUE NOT NULL,
+    departure VARCHAR(100) NOT NULL,
+    destination VARCHAR(100) NOT NULL,
+    date TEXT NOT NULL,
+    time VARCHAR(20) NOT NULL,
+    seat INTEGER NOT NULL,
+    created_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now')),
+    expires_at TEXT NOT NULL
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_seat_holds_seat ON seat_holds(departure, destination, date, time, seat);
+CREATE INDEX IF NOT EXISTS idx_seat_holds_expires_at ON seat_holds(expires_at);
+
+-- Customers waiting for a seat on a sold-out journey, served in id order.
+-- Cancelling a booking books the freed seat for the first waiting customer
+-- in the same transaction (SQLiteDatabaseManager.cancel_booking).
+CREATE TABLE IF NOT EXISTS waitlist (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    waitlist_id VARCHAR(32) UNIQUE NOT NULL,
+    name VARCHAR(255) NOT NULL,
+    age INTEGER NOT NULL,
+    phone VARCHAR(50) NOT NULL,
+    email VARCHAR(255),
+    departure VARCHAR(100) NOT NULL,
+    destination VARCHAR(100) NOT NULL,
+    date TEXT NOT NULL,
+    time VARCHAR(20) NOT NULL,
+    fare REAL NOT NULL,
+    status VARCHAR(20) DEFAULT 'waiting',
+    ticket_id VARCHAR(20),
+    created_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now')),
+    promoted_at TEXT
+);
+
+-- Head of the queue and queue positions for a journey
+CREATE INDEX IF NOT EXISTS idx_waitlist_journey ON waitlist(departure, destination, date, time, id)
+WHERE status = 'waiting';
+
+-- A confirmed booking for a seat under a live hold is skipped (the insert
+-- returns no row, like a seat conflict). Booking with a hold deletes the
+-- hold first in the same transaction. While customers are waiting for the
+-- journey, an expired hold keeps blocking too: the seat belongs to the head
+-- of the waitlist, and is booked for them when the hold is swept
+-- (SQLiteDatabaseManager.release_expired_seat_holds). Recreated on every
+-- start so existing files pick up changes to the condition.
+DROP TRIGGER IF EXISTS trg_bookings_skip_held_seat;
+CREATE TRIGGER trg_bookings_skip_held_seat BEFORE INSERT ON bookings
+WHEN NEW.status = 'confirmed' AND EXISTS (
+    SELECT 1 FROM seat_holds
+    WHERE departure = NEW.departure AND destination = NEW.destination AND date = NEW.date
+    AND time = NEW.time AND seat = NEW.seat
+    AND (expires_at >= strftime('%Y-%m-%dT%H:%M:%f', 'now') OR EXISTS (
+        SELECT 1 FROM waitlist
+        WHERE departure = NEW.departure AND destination = NEW.destination AND date = NEW.date
+        AND time = NEW.time AND status = 'waiting'
+    ))
+)
+BEGIN
+    SELECT RAISE(IGNORE);
+END;
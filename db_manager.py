@@ -1,33 +1,96 @@
 import os
+import threading
+import time
 import psycopg2
-from psycopg2.extras import RealDictCursor
-from psycopg2.pool import SimpleConnectionPool
-from typing import Dict, List, Optional
+from psycopg2.extras import RealDictCursor, execute_values
+from typing import Callable, Dict, Iterator, List, Optional
 from contextlib import contextmanager
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import metrics
+import pg_sql
+from connection_pool import ConnectionPool
 
 class DatabaseManager:
     """Database manager with connection pooling for PostgreSQL"""
     
     _pool = None
+    _pool_lock = threading.Lock()
+    
+    # A bookings row rendered as the API's JSON booking object
+    BOOKING_JSON = """json_build_object(
+        'ticket_id', ticket_id, 'name', name, 'age', age, 'phone', phone, 'email', email,
+        'departure', departure, 'destination', destination, 'date', to_char(date, 'YYYY-MM-DD'),
+        'time', time, 'seat', seat, 'fare', fare::float8, 'status', status,
+        'booked_at', to_char(booked_at, 'YYYY-MM-DD"T"HH24:MI:SS.US')
+    )"""
+    
+    @staticmethod
+    def is_configured() -> bool:
+        """Check if a database URL is set, without connecting"""
+        return bool(os.environ.get('POSTGRES_URL') or os.environ.get('DATABASE_URL'))
+    
+    @staticmethod
+    def is_serverless() -> bool:
+        """Check if we run as a serverless function (Vercel sets VERCEL=1)"""
+        return os.environ.get('DB_SERVERLESS', '1' if os.environ.get('VERCEL') else '0') == '1'
+    
+    @staticmethod
+    def uses_transaction_pooler() -> bool:
+        """Check if connections go through a transaction-mode pooler such as PgBouncer"""
+        database_url = os.environ.get('POSTGRES_URL') or os.environ.get('DATABASE_URL') or ''
+        return os.environ.get('DB_TRANSACTION_POOLER') == '1' or 'pgbouncer=true' in database_url
+    
+    @staticmethod
+    def database_url() -> str:
+        """Get the connection string with sslmode set and pooler-only parameters removed"""
+        database_url = os.environ.get('POSTGRES_URL') or os.environ.get('DATABASE_URL')
+        if not database_url:
+            raise ValueError("Database URL not found in environment variables")
+        
+        # Parse connection string, add sslmode if needed and drop the
+        # pgbouncer flag some providers add to pooled URLs (libpq rejects it)
+        parts = urlsplit(database_url)
+        params = [(key, value) for key, value in parse_qsl(parts.query) if key != 'pgbouncer']
+        if not any(key == 'sslmode' for key, _ in params):
+            params.append(('sslmode', 'require'))
+        return urlunsplit(parts._replace(query=urlencode(params)))
     
     @classmethod
     def initialize_pool(cls):
-        """Initialize database connection pool"""
-        if cls._pool is None:
-            database_url = os.environ.get('POSTGRES_URL') or os.environ.get('DATABASE_URL')
-            if not database_url:
-                raise ValueError("Database URL not found in environment variables")
-            
-            # Parse connection string and add sslmode if needed
-            if 'sslmode' not in database_url:
-                database_url += '?sslmode=require'
-            
-            cls._pool = SimpleConnectionPool(
-                minconn=1,
-                maxconn=10,
-                dsn=database_url
+        """Initialize database connection pool
+
+        Serverless instances start with no open connections and keep at most
+        one (reused across warm invocations), so cold starts do not pay for a
+        TLS handshake before the first query and the database sees one
+        connection per live instance.
+        """
+        with cls._pool_lock:
+            if cls._pool is not None:
+                return
+            serverless = cls.is_serverless()
+            cls._pool = ConnectionPool(
+                dsn=cls.database_url(),
+                minconn=int(os.environ.get('DB_POOL_MIN', '0' if serverless else '1')),
+                maxconn=cls.max_connections(),
+                timeout=float(os.environ.get('DB_POOL_TIMEOUT', '5')),
+                health_check_after=float(os.environ.get('DB_POOL_HEALTH_CHECK', '30'))
             )
     
+    @classmethod
+    def max_connections(cls) -> int:
+        """Get the pool's connection limit (DB_POOL_MAX, default 1 serverless, else 10) without connecting"""
+        if cls._pool is not None:
+            return cls._pool.maxconn
+        return int(os.environ.get('DB_POOL_MAX', '1' if cls.is_serverless() else '10'))
+    
+    @classmethod
+    def pool_stats(cls) -> Dict:
+        """Get connection pool usage and checkout latency stats"""
+        if cls._pool is None:
+            return {}
+        return cls._pool.stats()
+    
     @classmethod
     @contextmanager
     def get_connection(cls):
@@ -35,45 +98,57 @@ class DatabaseManager:
         if cls._pool is None:
             cls.initialize_pool()
         
+        started = time.perf_counter()
         conn = cls._pool.getconn()
+        metrics.DB_POOL_WAIT.observe(time.perf_counter() - started)
         try:
             yield conn
             conn.commit()
         except Exception as e:
-            conn.rollback()
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                # Broken connection; putconn sees it and replaces it
+                pass
             raise e
         finally:
             cls._pool.putconn(conn)
     
     @classmethod
-    def execute_query(cls, query: str, params: tuple = None, fetch: bool = True):
-        """Execute a query and return results"""
+    def execute_query(cls, operation: str, query: str, params: tuple = None, fetch: bool = True):
+        """Execute a query and return results, recorded in the query metrics under ``operation``"""
         with cls.get_connection() as conn:
             with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-                cursor.execute(query, params)
-                if fetch:
-                    return cursor.fetchall()
-                return cursor.rowcount
+                with metrics.track_query(operation, query) as record:
+                    cursor.execute(query, params)
+                    if fetch:
+                        results = cursor.fetchall()
+                        record['rows'] = len(results)
+                        return results
+                    record['rows'] = cursor.rowcount
+                    return cursor.rowcount
     
     @classmethod
-    def execute_one(cls, query: str, params: tuple = None):
-        """Execute a query and return a single result"""
+    def execute_one(cls, operation: str, query: str, params: tuple = None):
+        """Execute a query and return a single result, recorded in the query metrics under ``operation``"""
         with cls.get_connection() as conn:
             with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-                cursor.execute(query, params)
-                return cursor.fetchone()
+                with metrics.track_query(operation, query) as record:
+                    cursor.execute(query, params)
+                    result = cursor.fetchone()
+                    record['rows'] = 1 if result else 0
+                    return result
     
     # Booking operations
-    @classmethod
-    def create_booking(cls, booking_data: Dict) -> Dict:
-        """Create a new booking"""
-        query = """
-            INSERT INTO bookings 
-            (ticket_id, name, age, phone, email, departure, destination, date, time, seat, fare, status)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            RETURNING *
-        """
-        params = (
+    @staticmethod
+    def is_ticket_id_conflict(error: Exception) -> bool:
+        """Whether an insert failed because its ticket ID is already taken"""
+        return (isinstance(error, psycopg2.IntegrityError)
+                and error.diag.constraint_name == pg_sql.TICKET_ID_CONSTRAINT)
+    
+    @staticmethod
+    def _booking_params(booking_data: Dict, status: str) -> tuple:
+        return (
             booking_data['ticket_id'],
             booking_data['name'],
             booking_data['age'],
@@ -85,59 +160,341 @@ class DatabaseManager:
             booking_data['time'],
             booking_data['seat'],
             booking_data['fare'],
-            booking_data.get('status', 'confirmed')
+            status
         )
-        return dict(cls.execute_one(query, params))
+    
+    @classmethod
+    def create_booking(cls, booking_data: Dict) -> Dict:
+        """Create a new booking"""
+        query = pg_sql.CREATE_BOOKING
+        params = cls._booking_params(booking_data, booking_data.get('status', 'confirmed'))
+        return dict(cls.execute_one('create_booking', query, params))
+    
+    @classmethod
+    def reserve_seat(cls, booking_data: Dict) -> Optional[Dict]:
+        """Atomically book a seat in one statement.
+        
+        Returns the confirmed booking, or None if the seat is already taken
+        for this journey (enforced by the idx_confirmed_seat partial index).
+        """
+        query = pg_sql.RESERVE_SEAT
+        result = cls.execute_one('reserve_seat', query, cls._booking_params(booking_data, 'confirmed'))
+        return dict(result) if result else None
+    
+    @classmethod
+    def reserve_seats(cls, bookings: List[Dict]) -> Optional[List[Dict]]:
+        """Atomically book several seats with one multi-row insert.
+        
+        All-or-nothing: returns every confirmed booking, or None (and inserts
+        nothing) if any of the seats is already taken.
+        """
+        query = pg_sql.RESERVE_SEATS.format(values='%s')
+        rows = [cls._booking_params(booking, 'confirmed') for booking in bookings]
+        with cls.get_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                with metrics.track_query('reserve_seats', query) as record:
+                    results = execute_values(cursor, query, rows, page_size=len(rows), fetch=True)
+                    record['rows'] = len(results)
+                if len(results) < len(rows):
+                    conn.rollback()
+                    return None
+                return [dict(row) for row in results]
+    
+    @classmethod
+    def reserve_seat_json(cls, booking_data: Dict, hold_id: Optional[str] = None) -> Optional[str]:
+        """Like reserve_seat, but return the booking as JSON text rendered by Postgres
+
+        With ``hold_id``, the caller's hold on the seat is released in the same
+        transaction, so the insert is not skipped by trg_bookings_skip_held_seat;
+        if the seat cannot be booked the hold stays in place.
+        """
+        query = f"""
+            WITH inserted AS (
+                {pg_sql.RESERVE_SEAT}
+            )
+            SELECT {cls.BOOKING_JSON}::text AS booking FROM inserted
+        """
+        params = cls._booking_params(booking_data, 'confirmed')
+        if hold_id is None:
+            result = cls.execute_one('reserve_seat_json', query, params)
+            return result['booking'] if result else None
+        
+        release = pg_sql.RELEASE_OWN_SEAT_HOLD
+        with cls.get_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                with metrics.track_query('reserve_seat_json', query) as record:
+                    cursor.execute(release, (hold_id,) + params[5:10])
+                    cursor.execute(query, params)
+                    result = cursor.fetchone()
+                    record['rows'] = 1 if result else 0
+                if result is None:
+                    conn.rollback()
+                    return None
+                return result['booking']
     
     @classmethod
     def get_booking(cls, ticket_id: str) -> Optional[Dict]:
         """Get a booking by ticket ID"""
-        query = "SELECT * FROM bookings WHERE ticket_id = %s"
-        result = cls.execute_one(query, (ticket_id,))
+        query = pg_sql.GET_BOOKING
+        result = cls.execute_one('get_booking', query, (ticket_id,))
         return dict(result) if result else None
     
     @classmethod
     def get_all_bookings(cls) -> List[Dict]:
         """Get all bookings"""
-        query = "SELECT * FROM bookings ORDER BY booked_at DESC"
-        return [dict(row) for row in cls.execute_query(query)]
+        query = pg_sql.GET_ALL_BOOKINGS
+        return [dict(row) for row in cls.execute_query('get_all_bookings', query)]
+    
+    @classmethod
+    def get_booking_json(cls, ticket_id: str) -> Optional[str]:
+        """Get a booking by ticket ID as JSON text rendered by Postgres"""
+        query = f"SELECT {cls.BOOKING_JSON}::text AS booking FROM bookings WHERE ticket_id = %s"
+        result = cls.execute_one('get_booking_json', query, (ticket_id,))
+        return result['booking'] if result else None
+    
+    @classmethod
+    def get_all_bookings_json(cls, keyed: bool = False) -> str:
+        """Get all bookings, newest first, as one JSON text: an array, or an object keyed by ticket ID"""
+        if keyed:
+            aggregate = f"COALESCE(json_object_agg(ticket_id, {cls.BOOKING_JSON} ORDER BY booked_at DESC, id DESC), '{{}}')"
+        else:
+            aggregate = f"COALESCE(json_agg({cls.BOOKING_JSON} ORDER BY booked_at DESC, id DESC), '[]')"
+        query = f"SELECT {aggregate}::text AS bookings FROM bookings"
+        return cls.execute_one('get_all_bookings_json', query)['bookings']
+    
+    @classmethod
+    def get_bookings_page(cls, limit: int, after: Optional[tuple] = None) -> List[Dict]:
+        """Get one page of bookings, newest first, keyset-paginated on (booked_at, id)"""
+        if after is None:
+            query = pg_sql.GET_BOOKINGS_FIRST_PAGE
+            params = (limit,)
+        else:
+            query = pg_sql.GET_BOOKINGS_PAGE_AFTER
+            params = (after[0], after[1], limit)
+        return [dict(row) for row in cls.execute_query('get_bookings_page', query, params)]
+    
+    @classmethod
+    def iter_all_bookings(cls, batch_size: int = 1000) -> Iterator[Dict]:
+        """Stream all bookings, newest first, through a server-side cursor
+
+        The cursor lives inside one transaction (no WITH HOLD), so it also
+        works through a transaction-mode pooler.
+        """
+        with cls.get_connection() as conn:
+            with conn.cursor(name='bookings_stream', cursor_factory=RealDictCursor) as cursor:
+                cursor.itersize = batch_size
+                cursor.execute(pg_sql.STREAM_ALL_BOOKINGS)
+                for row in cursor:
+                    yield row
+    
+    @classmethod
+    def iter_all_bookings_json(cls, batch_size: int = 1000) -> Iterator[str]:
+        """Stream all bookings, newest first, as one JSON text per booking"""
+        with cls.get_connection() as conn:
+            with conn.cursor(name='bookings_json_stream') as cursor:
+                cursor.itersize = batch_size
+                cursor.execute(f"SELECT {cls.BOOKING_JSON}::text FROM bookings ORDER BY booked_at DESC, id DESC")
+                for row in cursor:
+                    yield row[0]
+    
+    @classmethod
+    def search_bookings(cls, ticket_id: Optional[str] = None, phone: Optional[str] = None,
+                        name: Optional[str] = None, departure: Optional[str] = None,
+                        destination: Optional[str] = None, date_from: Optional[str] = None,
+                        date_to: Optional[str] = None, limit: int = 100) -> List[Dict]:
+        """Search bookings by ticket ID prefix, phone prefix, name fragment, route and date range"""
+        filters = {
+            'ticket_id': pg_sql.like_escape(ticket_id) + '%' if ticket_id else None,
+            'phone': pg_sql.like_escape(phone) + '%' if phone else None,
+            'name': '%' + pg_sql.like_escape(name) + '%' if name else None,
+            'departure': departure,
+            'destination': destination,
+            'date_from': date_from,
+            'date_to': date_to,
+        }
+        conditions = [pg_sql.SEARCH_CONDITIONS[field] for field, value in filters.items() if value]
+        params = [value for value in filters.values() if value]
+        if not conditions:
+            return []
+        
+        query = pg_sql.SEARCH_BOOKINGS.format(conditions=' AND '.join(conditions))
+        params.append(limit)
+        return [dict(row) for row in cls.execute_query('search_bookings', query, tuple(params))]
     
     @classmethod
-    def cancel_booking(cls, ticket_id: str) -> bool:
-        """Cancel a booking"""
-        query = "UPDATE bookings SET status = 'cancelled', updated_at = CURRENT_TIMESTAMP WHERE ticket_id = %s"
-        return cls.execute_query(query, (ticket_id,), fetch=False) > 0
+    def cancel_booking(cls, ticket_id: str, promoted_ticket_id: Optional[str] = None) -> bool:
+        """Cancel a booking
+
+        With ``promoted_ticket_id``, the freed seat is booked under that ticket
+        ID for the first customer on the journey's waitlist, in the same
+        transaction, so no other request can take the seat in between.
+        """
+        if promoted_ticket_id is None:
+            return cls.execute_query('cancel_booking', pg_sql.CANCEL_BOOKING, (ticket_id,), fetch=False) > 0
+        return cls._free_seats('cancel_booking', pg_sql.CANCEL_BOOKING_FREEING, (ticket_id,),
+                               lambda: promoted_ticket_id) > 0
+    
+    @classmethod
+    def _free_seats(cls, operation: str, query: str, params: tuple, new_ticket_id: Callable[[], str]) -> int:
+        """Run a statement that frees seats and hand each one to its journey's waitlist, in one transaction
+
+        The statement must return departure, destination, date, time, seat and
+        waitlisted for every seat it frees; returns how many it freed.
+        """
+        with cls.get_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                with metrics.track_query(operation, query) as record:
+                    cursor.execute(query, params)
+                    freed = cursor.fetchall()
+                    record['rows'] = len(freed)
+                    for seat in freed:
+                        if not seat['waitlisted']:
+                            continue
+                        cursor.execute(pg_sql.PROMOTE_WAITLIST, (seat['departure'], seat['destination'], seat['date'],
+                                                                 seat['time'], new_ticket_id(), seat['seat']))
+                return len(freed)
     
     @classmethod
     def check_seat_availability(cls, departure: str, destination: str, date: str, time: str, seat: int) -> bool:
-        """Check if a seat is available for a specific journey"""
+        """Check if a seat is neither booked nor held for a specific journey"""
+        query = pg_sql.CHECK_SEAT_AVAILABILITY
+        result = cls.execute_one('check_seat_availability', query, (departure, destination, date, time, seat) * 2)
+        return result['count'] == 0
+    
+    @classmethod
+    def get_occupied_seats(cls, departure: str, destination: str, date: str, time: str) -> List[int]:
+        """Get the taken seat numbers for a journey (served by the idx_confirmed_seat index)"""
+        query = pg_sql.GET_OCCUPIED_SEATS
+        rows = cls.execute_query('get_occupied_seats', query, (departure, destination, date, time))
+        return [row['seat'] for row in rows]
+    
+    # Seat holds
+    @classmethod
+    def place_seat_hold(cls, hold_id: str, departure: str, destination: str, date: str, time: str,
+                        seat: int, ttl: int) -> bool:
+        """Hold a seat for ``ttl`` seconds; False if it is booked or already held (see pg_sql.HOLD_BLOCKS)"""
+        query = f"""
+            INSERT INTO seat_holds (hold_id, departure, destination, date, time, seat, expires_at)
+            SELECT %s, %s, %s, %s::date, %s, %s, CURRENT_TIMESTAMP + %s * INTERVAL '1 second'
+            WHERE NOT EXISTS (
+                SELECT 1 FROM bookings
+                WHERE departure = %s AND destination = %s AND date = %s::date AND time = %s
+                AND seat = %s AND status = 'confirmed'
+            )
+            ON CONFLICT (departure, destination, date, time, seat) DO UPDATE
+            SET hold_id = EXCLUDED.hold_id, created_at = CURRENT_TIMESTAMP, expires_at = EXCLUDED.expires_at
+            WHERE seat_holds.expires_at < CURRENT_TIMESTAMP
+            AND NOT {pg_sql.waiting_for('seat_holds')}
+            RETURNING hold_id
+        """
+        journey = (departure, destination, date, time, seat)
+        return cls.execute_one('place_seat_hold', query, (hold_id,) + journey + (ttl,) + journey) is not None
+    
+    @classmethod
+    def release_seat_hold(cls, hold_id: str, promoted_ticket_id: Optional[str] = None) -> bool:
+        """Release a hold before it expires
+
+        With ``promoted_ticket_id``, the seat is booked under that ticket ID
+        for the first customer on the journey's waitlist, as in cancel_booking.
+        """
+        query = "DELETE FROM seat_holds WHERE hold_id = %s AND expires_at >= CURRENT_TIMESTAMP"
+        if promoted_ticket_id is None:
+            return cls.execute_query('release_seat_hold', query, (hold_id,), fetch=False) > 0
+        query += f" RETURNING departure, destination, date, time, seat, {pg_sql.waiting_for('seat_holds')} AS waitlisted"
+        return cls._free_seats('release_seat_hold', query, (hold_id,), lambda: promoted_ticket_id) > 0
+    
+    @classmethod
+    def release_expired_seat_holds(cls, new_ticket_id: Callable[[], str]) -> int:
+        """Delete every expired hold in one statement (a range scan of idx_seat_holds_expires_at)
+
+        Seats on journeys with a waitlist are booked for the first waiting
+        customer, under ticket IDs from ``new_ticket_id``; until then
+        trg_bookings_skip_held_seat keeps them from being booked directly.
+        Returns how many holds were deleted.
+        """
+        return cls._free_seats('release_expired_seat_holds', pg_sql.RELEASE_EXPIRED_SEAT_HOLDS, (), new_ticket_id)
+    
+    @classmethod
+    def get_held_seats(cls, departure: str, destination: str, date: str, time: str) -> List[int]:
+        """Get the seat numbers under a hold that blocks booking for a journey (see pg_sql.HOLD_BLOCKS)"""
+        query = pg_sql.GET_HELD_SEATS
+        return [row['seat'] for row in cls.execute_query('get_held_seats', query, (departure, destination, date, time))]
+    
+    # Waitlist
+    @classmethod
+    def join_waitlist(cls, entry: Dict, total_seats: int) -> Optional[int]:
+        """Add a customer to a journey's waitlist; returns their position, or None if seats are free
+
+        The journey only counts as sold out when every seat is booked or under
+        a live hold.
+        """
+        query = f"""
+            WITH entry AS (
+                INSERT INTO waitlist (waitlist_id, name, age, phone, email, departure, destination, date, time, fare)
+                SELECT %s, %s, %s, %s, %s, %s, %s, %s::date, %s, %s
+                WHERE (SELECT COUNT(*) FROM bookings
+                       WHERE departure = %s AND destination = %s AND date = %s::date AND time = %s
+                       AND status = 'confirmed')
+                    + (SELECT COUNT(*) FROM seat_holds
+                       WHERE departure = %s AND destination = %s AND date = %s::date AND time = %s
+                       AND {pg_sql.HOLD_BLOCKS}) >= %s
+                RETURNING id, departure, destination, date, time
+            )
+            -- The new row is not visible to this statement, so count those ahead of it
+            SELECT (SELECT COUNT(*) FROM waitlist w
+                    WHERE w.departure = entry.departure AND w.destination = entry.destination
+                    AND w.date = entry.date AND w.time = entry.time
+                    AND w.status = 'waiting' AND w.id < entry.id) + 1 AS position
+            FROM entry
+        """
+        journey = (entry['departure'], entry['destination'], entry['date'], entry['time'])
+        params = (entry['waitlist_id'], entry['name'], entry['age'], entry['phone'], entry.get('email', '')) \
+            + journey + (entry['fare'],) + journey * 2 + (total_seats,)
+        result = cls.execute_one('join_waitlist', query, params)
+        return result['position'] if result else None
+    
+    @classmethod
+    def get_waitlist_entry(cls, waitlist_id: str) -> Optional[Dict]:
+        """Get a waitlist entry's journey, status, queue position (while waiting) and promoted ticket ID"""
         query = """
-            SELECT COUNT(*) as count FROM bookings 
-            WHERE departure = %s AND destination = %s AND date = %s AND time = %s 
-            AND seat = %s AND status = 'confirmed'
+            SELECT w.waitlist_id, w.departure, w.destination, w.date::text AS date, w.time, w.status, w.ticket_id,
+                CASE WHEN w.status = 'waiting' THEN (
+                    SELECT COUNT(*) FROM waitlist a
+                    WHERE a.departure = w.departure AND a.destination = w.destination
+                    AND a.date = w.date AND a.time = w.time
+                    AND a.status = 'waiting' AND a.id <= w.id
+                ) END AS position
+            FROM waitlist w
+            WHERE w.waitlist_id = %s
         """
-        result = cls.execute_one(query, (departure, destination, date, time, seat))
-        return result['count'] == 0
+        result = cls.execute_one('get_waitlist_entry', query, (waitlist_id,))
+        return dict(result) if result else None
+    
+    @classmethod
+    def leave_waitlist(cls, waitlist_id: str) -> bool:
+        """Take a customer who is still waiting off the waitlist"""
+        query = "UPDATE waitlist SET status = 'cancelled' WHERE waitlist_id = %s AND status = 'waiting'"
+        return cls.execute_query('leave_waitlist', query, (waitlist_id,), fetch=False) > 0
     
     # Route operations
     @classmethod
     def get_all_routes(cls) -> List[Dict]:
         """Get all routes"""
-        query = "SELECT * FROM routes ORDER BY route_name"
-        return [dict(row) for row in cls.execute_query(query)]
+        query = pg_sql.GET_ALL_ROUTES
+        return [dict(row) for row in cls.execute_query('get_all_routes', query)]
     
     @classmethod
     def get_route(cls, route_name: str) -> Optional[Dict]:
         """Get a route by name"""
         query = "SELECT * FROM routes WHERE route_name = %s"
-        result = cls.execute_one(query, (route_name,))
+        result = cls.execute_one('get_route', query, (route_name,))
         return dict(result) if result else None
     
     @classmethod
     def update_route_fare(cls, route_name: str, fare: float) -> bool:
         """Update route fare"""
-        query = "UPDATE routes SET fare = %s, updated_at = CURRENT_TIMESTAMP WHERE route_name = %s"
-        return cls.execute_query(query, (fare, route_name), fetch=False) > 0
+        query = pg_sql.UPDATE_ROUTE_FARE
+        return cls.execute_query('update_route_fare', query, (fare, route_name), fetch=False) > 0
     
     @classmethod
     def get_all_cities(cls) -> List[str]:
@@ -150,35 +507,35 @@ class DatabaseManager:
             ) cities
             ORDER BY city
         """
-        return [row['city'] for row in cls.execute_query(query)]
+        return [row['city'] for row in cls.execute_query('get_all_cities', query)]
     
     # Bus stops operations
     @classmethod
     def get_bus_stops(cls, city: str) -> Optional[Dict]:
         """Get bus stops for a city"""
         query = "SELECT * FROM bus_stops WHERE city = %s"
-        result = cls.execute_one(query, (city,))
+        result = cls.execute_one('get_bus_stops', query, (city,))
         return dict(result) if result else None
     
     @classmethod
     def get_all_bus_stops(cls) -> List[Dict]:
         """Get all bus stops"""
-        query = "SELECT * FROM bus_stops ORDER BY city"
-        return [dict(row) for row in cls.execute_query(query)]
+        query = pg_sql.GET_ALL_BUS_STOPS
+        return [dict(row) for row in cls.execute_query('get_all_bus_stops', query)]
     
     # Config operations
     @classmethod
     def get_config(cls, key: str) -> Optional[str]:
         """Get a configuration value"""
-        query = "SELECT config_value FROM system_config WHERE config_key = %s"
-        result = cls.execute_one(query, (key,))
+        query = pg_sql.GET_CONFIG
+        result = cls.execute_one('get_config', query, (key,))
         return result['config_value'] if result else None
     
     @classmethod
     def get_all_config(cls) -> Dict:
         """Get all configuration"""
-        query = "SELECT config_key, config_value FROM system_config"
-        results = cls.execute_query(query)
+        query = pg_sql.GET_ALL_CONFIG
+        results = cls.execute_query('get_all_config', query)
         return {row['config_key']: row['config_value'] for row in results}
     
     @classmethod
@@ -190,33 +547,80 @@ class DatabaseManager:
             ON CONFLICT (config_key) 
             DO UPDATE SET config_value = EXCLUDED.config_value, updated_at = CURRENT_TIMESTAMP
         """
-        return cls.execute_query(query, (key, value), fetch=False) >= 0
+        return cls.execute_query('set_config', query, (key, value), fetch=False) >= 0
+
+    @classmethod
+    def get_config_version(cls) -> int:
+        """Get the config version counter, bumped by triggers whenever routes, stops or config change"""
+        value = cls.get_config('config_version')
+        return int(value) if value else 0
+
+    # Idempotency keys
+    @classmethod
+    def claim_idempotency_key(cls, key: str, request_hash: str, claim_token: str, ttl: int,
+                              lock_timeout: int) -> Optional[Dict]:
+        """Claim a key for a request about to run.
+
+        Returns None if the key is now held by the caller under
+        ``claim_token``, or the existing row (request_hash, status_code,
+        response_body) otherwise; a NULL status_code means another request
+        still holds it. Expired keys and claims abandoned for longer than
+        ``lock_timeout`` seconds are taken over.
+        """
+        query = """
+            INSERT INTO idempotency_keys (idempotency_key, request_hash, claim_token, expires_at)
+            VALUES (%s, %s, %s, CURRENT_TIMESTAMP + %s * INTERVAL '1 second')
+            ON CONFLICT (idempotency_key) DO UPDATE
+            SET request_hash = EXCLUDED.request_hash, claim_token = EXCLUDED.claim_token,
+                status_code = NULL, response_body = NULL,
+                created_at = CURRENT_TIMESTAMP, expires_at = EXCLUDED.expires_at
+            WHERE idempotency_keys.expires_at < CURRENT_TIMESTAMP
+            OR (idempotency_keys.status_code IS NULL
+                AND idempotency_keys.created_at < CURRENT_TIMESTAMP - %s * INTERVAL '1 second')
+            RETURNING idempotency_key
+        """
+        if cls.execute_one('claim_idempotency_key', query, (key, request_hash, claim_token, ttl, lock_timeout)):
+            return None
+        query = "SELECT request_hash, status_code, response_body FROM idempotency_keys WHERE idempotency_key = %s"
+        result = cls.execute_one('claim_idempotency_key', query, (key,))
+        # Released between the two statements: report it as still in progress
+        return dict(result) if result else {'request_hash': request_hash, 'status_code': None, 'response_body': None}
     
-    # Statistics
     @classmethod
-    def get_booking_stats(cls) -> Dict:
-        """Get booking statistics"""
+    def complete_idempotency_key(cls, key: str, request_hash: str, claim_token: str, status_code: int,
+                                 response_body: str) -> bool:
+        """Store the response for a key, unless its claim was taken over by another request"""
+        query = """
+            UPDATE idempotency_keys SET status_code = %s, response_body = %s
+            WHERE idempotency_key = %s AND request_hash = %s AND claim_token = %s AND status_code IS NULL
+        """
+        params = (status_code, response_body, key, request_hash, claim_token)
+        return cls.execute_query('complete_idempotency_key', query, params, fetch=False) > 0
+    
+    @classmethod
+    def release_idempotency_key(cls, key: str, request_hash: str, claim_token: str) -> bool:
+        """Drop a claim without storing a response, so the request can be retried"""
         query = """
-            SELECT 
-                COUNT(*) as total_bookings,
-                COUNT(*) FILTER (WHERE status = 'confirmed') as confirmed,
-                COUNT(*) FILTER (WHERE status = 'cancelled') as cancelled,
-                COALESCE(SUM(fare) FILTER (WHERE status = 'confirmed'), 0) as total_revenue
-            FROM bookings
+            DELETE FROM idempotency_keys
+            WHERE idempotency_key = %s AND request_hash = %s AND claim_token = %s AND status_code IS NULL
         """
-        return dict(cls.execute_one(query))
+        return cls.execute_query('release_idempotency_key', query, (key, request_hash, claim_token), fetch=False) > 0
+    
+    @classmethod
+    def purge_idempotency_keys(cls) -> int:
+        """Delete expired idempotency keys"""
+        query = "DELETE FROM idempotency_keys WHERE expires_at < CURRENT_TIMESTAMP"
+        return cls.execute_query('purge_idempotency_keys', query, fetch=False)
+    
+    # Statistics (read from the trigger-maintained booking_stats rollup)
+    @classmethod
+    def get_booking_stats(cls) -> Dict:
+        """Get booking statistics"""
+        query = pg_sql.GET_BOOKING_STATS
+        return dict(cls.execute_one('get_booking_stats', query))
     
     @classmethod
     def get_top_routes(cls, limit: int = 5) -> List[Dict]:
         """Get top routes by booking count"""
-        query = """
-            SELECT 
-                departure || ' to ' || destination as route,
-                COUNT(*) as count
-            FROM bookings
-            WHERE status = 'confirmed'
-            GROUP BY departure, destination
-            ORDER BY count DESC
-            LIMIT %s
-        """
-        return [dict(row) for row in cls.execute_query(query, (limit,))]
+        query = pg_sql.GET_TOP_ROUTES
+        return [dict(row) for row in cls.execute_query('get_top_routes', query, (limit,))]
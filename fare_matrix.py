@@ -0,0 +1,50 @@
+from typing import Dict, List, Optional
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+class FareMatrix:
+    """City-indexed fare matrix for pricing many quotes at once
+
+    ``fares[i, j]`` is the direct fare from city i to city j (NaN where there
+    is no direct route). With NumPy installed a batch of quotes is priced
+    with one fancy-indexing gather and one multiply; without it the same
+    lookups run in plain Python.
+    """
+
+    def __init__(self, bus_routes: Dict[str, float]):
+        self.bus_routes = bus_routes
+        self.cities = sorted({city for route in bus_routes for city in route.split(' to ')})
+        self.index = {city: i for i, city in enumerate(self.cities)}
+        n = len(self.cities)
+        if np is not None:
+            self.fares = np.full((n, n), np.nan)
+        else:
+            self.fares = [[None] * n for _ in range(n)]
+        for route, fare in bus_routes.items():
+            a, b = (self.index[city] for city in route.split(' to '))
+            self.fares[a][b] = float(fare)
+
+    def quote(self, departures: List[str], destinations: List[str], passengers: List[int]) -> List[Optional[float]]:
+        """Price (departure, destination, passengers) triples; None where there is no direct route"""
+        if not self.cities:
+            return [None] * len(departures)
+        origin = [self.index.get(city, -1) for city in departures]
+        target = [self.index.get(city, -1) for city in destinations]
+
+        if np is None:
+            totals = []
+            for a, b, count in zip(origin, target, passengers):
+                fare = self.fares[a][b] if a >= 0 and b >= 0 else None
+                totals.append(fare * count if fare is not None else None)
+            return totals
+
+        origin = np.array(origin, dtype=np.intp)
+        target = np.array(target, dtype=np.intp)
+        known = (origin >= 0) & (target >= 0)
+        # Unknown cities index row/column 0 and are masked out afterwards
+        totals = self.fares[np.where(known, origin, 0), np.where(known, target, 0)] * np.array(passengers, dtype=float)
+        totals[~known] = np.nan
+        return [None if np.isnan(total) else float(total) for total in totals.tolist()]
@@ -0,0 +1,63 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+class IdempotencyStore:
+    """TTL-bounded Idempotency-Key store for the in-memory mode
+
+    The in-memory counterpart of the ``idempotency_keys`` table. Every key
+    lives for the same TTL, so insertion order is expiry order and expired
+    keys are dropped from the front of an ordered dict. ``max_keys`` caps
+    memory under a flood of distinct keys by evicting the oldest first.
+    """
+
+    def __init__(self, max_keys: int = 10000):
+        self.max_keys = max_keys
+        # key -> [request_hash, status_code, response_body, claimed_at, expires_at, claim_token]
+        self._entries: 'OrderedDict[str, list]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _purge(self, now: float):
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if entry[4] > now and len(self._entries) <= self.max_keys:
+                break
+            del self._entries[key]
+
+    def claim(self, key: str, request_hash: str, claim_token: str, ttl: float,
+              lock_timeout: float) -> Optional[Dict]:
+        """Claim a key for a request about to run; None if claimed under ``claim_token``, else the existing entry"""
+        now = time.monotonic()
+        with self._lock:
+            self._purge(now)
+            entry = self._entries.get(key)
+            if entry is not None and not (entry[1] is None and now - entry[3] > lock_timeout):
+                return {'request_hash': entry[0], 'status_code': entry[1], 'response_body': entry[2]}
+            self._entries[key] = [request_hash, None, None, now, now + ttl, claim_token]
+            self._entries.move_to_end(key)
+            self._purge(now)
+            return None
+
+    def complete(self, key: str, request_hash: str, claim_token: str, status_code: int, response_body: str) -> bool:
+        """Store the response for a key, unless its claim was taken over by another request"""
+        with self._lock:
+            if not self._holds(key, request_hash, claim_token):
+                return False
+            entry = self._entries[key]
+            entry[1] = status_code
+            entry[2] = response_body
+            return True
+
+    def release(self, key: str, request_hash: str, claim_token: str) -> bool:
+        """Drop a claim without storing a response, so the request can be retried"""
+        with self._lock:
+            if not self._holds(key, request_hash, claim_token):
+                return False
+            del self._entries[key]
+            return True
+
+    def _holds(self, key: str, request_hash: str, claim_token: str) -> bool:
+        # Whether the key is still claimed, and not yet completed, by this request
+        entry = self._entries.get(key)
+        return entry is not None and entry[1] is None and entry[0] == request_hash and entry[5] == claim_token
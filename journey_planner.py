@@ -0,0 +1,115 @@
+import datetime
+from typing import Dict, List, Optional, Tuple
+
+INF = float('inf')
+MINUTES_PER_DAY = 24 * 60
+
+class JourneyPlanner:
+    """All-pairs itineraries over the route graph
+
+    Cities are nodes and each ``"A to B"`` entry in ``bus_routes`` is a
+    directed edge weighted by its fare. On build, Floyd-Warshall runs once
+    per objective and every reachable (departure, destination) pair gets
+    its itinerary materialised, so ``plan`` is a dict lookup. Objectives:
+    ``cheapest`` (lowest total fare, then fewest legs) and ``fewest_legs``
+    (fewest changes, then lowest fare); fewest legs stands in for fastest.
+    Each route runs once a day, so a leg that departs before the previous
+    leg arrives (its departure plus ``route_durations`` minutes) plus
+    ``min_connection_minutes`` moves to a later day (``day_offset``). A leg
+    after a route with no known duration always moves to the next day.
+    """
+
+    OBJECTIVES = ('cheapest', 'fewest_legs')
+
+    def __init__(self, bus_routes: Dict[str, float], bus_schedules: Dict[str, str],
+                 route_durations: Optional[Dict[str, int]] = None, min_connection_minutes: int = 30):
+        self.bus_routes = bus_routes
+        self.bus_schedules = bus_schedules
+        self.route_durations = route_durations
+        self.min_connection_minutes = min_connection_minutes
+        self.cities = sorted({city for route in bus_routes for city in route.split(' to ')})
+        self._itineraries = {objective: self._build(objective) for objective in self.OBJECTIVES}
+
+    def _build(self, objective: str) -> Dict[Tuple[str, str], Dict]:
+        n = len(self.cities)
+        index = {city: i for i, city in enumerate(self.cities)}
+        # Costs compare as (primary, secondary) tuples
+        cost = [[(INF, INF)] * n for _ in range(n)]
+        next_hop = [[None] * n for _ in range(n)]
+        for route, fare in self.bus_routes.items():
+            a, b = (index[city] for city in route.split(' to '))
+            edge = (float(fare), 1) if objective == 'cheapest' else (1, float(fare))
+            if edge < cost[a][b]:
+                cost[a][b] = edge
+                next_hop[a][b] = b
+
+        for k in range(n):
+            cost_k = cost[k]
+            for i in range(n):
+                via = cost[i][k]
+                if via[0] == INF or i == k:
+                    continue
+                cost_i = cost[i]
+                for j in range(n):
+                    if j == i or cost_k[j][0] == INF:
+                        continue
+                    candidate = (via[0] + cost_k[j][0], via[1] + cost_k[j][1])
+                    if candidate < cost_i[j]:
+                        cost_i[j] = candidate
+                        next_hop[i][j] = next_hop[i][k]
+
+        itineraries = {}
+        for i in range(n):
+            for j in range(n):
+                if i != j and next_hop[i][j] is not None:
+                    itineraries[(self.cities[i], self.cities[j])] = self._itinerary(i, j, next_hop)
+        return itineraries
+
+    def _itinerary(self, i: int, j: int, next_hop: List[List[Optional[int]]]) -> Dict:
+        legs = []
+        day_offset = 0
+        # Earliest minute, counted from midnight of the first day, the next leg can leave at
+        ready = None
+        while i != j:
+            hop = next_hop[i][j]
+            route = f"{self.cities[i]} to {self.cities[hop]}"
+            time = self.bus_schedules.get(route, 'N/A')
+            departs = self._parse_time(time)
+            if departs is None:
+                # Unknown departure time: take the first whole day after the previous arrival
+                if ready is not None:
+                    day_offset = max(day_offset, -(-ready // MINUTES_PER_DAY))
+                ready = (day_offset + 1) * MINUTES_PER_DAY
+            else:
+                minutes = departs.hour * 60 + departs.minute
+                if ready is not None:
+                    day_offset = max(day_offset, -(-(ready - minutes) // MINUTES_PER_DAY))
+                duration = (self.route_durations or {}).get(route)
+                if duration is None:
+                    ready = (day_offset + 1) * MINUTES_PER_DAY
+                else:
+                    ready = day_offset * MINUTES_PER_DAY + minutes + int(duration) + self.min_connection_minutes
+            legs.append({
+                'departure': self.cities[i],
+                'destination': self.cities[hop],
+                'fare': float(self.bus_routes[route]),
+                'time': time,
+                'day_offset': day_offset
+            })
+            i = hop
+        return {
+            'legs': legs,
+            'total_fare': sum(leg['fare'] for leg in legs),
+            'transfers': len(legs) - 1
+        }
+
+    @staticmethod
+    def _parse_time(time: str) -> Optional[datetime.time]:
+        try:
+            return datetime.datetime.strptime(time, "%I:%M %p").time()
+        except ValueError:
+            return None
+
+    def plan(self, departure: str, destination: str, objective: str = 'cheapest') -> Optional[Dict]:
+        """Get the precomputed itinerary between two cities, or None if unreachable"""
+        return self._itineraries[objective].get((departure, destination))
@@ -0,0 +1,168 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, List, Sequence, Tuple
+
+# Queries slower than this are printed to the log (0 turns the log off)
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', '500'))
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ROW_BUCKETS = (0, 1, 5, 10, 50, 100, 500, 1000, 5000, 10000)
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + '}'
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+class Counter:
+    """Monotonic counter with optional labels"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1):
+        """Add ``amount`` to the series for these label values"""
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+class Histogram:
+    """Fixed-bucket histogram with optional labels
+
+    Each series keeps one count per bucket plus a running sum, so an
+    observation is a bisect and a few additions under a lock. Buckets are
+    made cumulative only when rendered.
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple, List] = {}  # labels -> [bucket counts (+Inf last), sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        """Record one observation for these label values"""
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        names = self.labelnames + ('le',)
+        with self._lock:
+            for labels, (counts, total) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float('inf'),), counts):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_format_labels(names, labels + (_format_value(bound),))} {cumulative}")
+                series_labels = _format_labels(self.labelnames, labels)
+                lines.append(f"{self.name}_sum{series_labels} {_format_value(total)}")
+                lines.append(f"{self.name}_count{series_labels} {cumulative}")
+        return lines
+
+HTTP_REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds', 'Time spent handling HTTP requests', ('method', 'endpoint'))
+HTTP_REQUESTS = Counter(
+    'http_requests_total', 'HTTP requests handled', ('method', 'endpoint', 'status'))
+HTTP_REQUEST_ERRORS = Counter(
+    'http_request_errors_total', 'HTTP requests that ended in a 5xx response', ('method', 'endpoint'))
+DB_QUERY_DURATION = Histogram(
+    'db_query_duration_seconds', 'Time spent executing database queries', ('operation',))
+DB_QUERY_ROWS = Histogram(
+    'db_query_rows', 'Rows returned or affected per database query', ('operation',), ROW_BUCKETS)
+DB_QUERY_ERRORS = Counter(
+    'db_query_errors_total', 'Database queries that raised an error', ('operation',))
+DB_POOL_WAIT = Histogram(
+    'db_pool_wait_seconds', 'Time spent waiting to check a connection out of the pool')
+
+REGISTRY = (HTTP_REQUEST_DURATION, HTTP_REQUESTS, HTTP_REQUEST_ERRORS,
+            DB_QUERY_DURATION, DB_QUERY_ROWS, DB_QUERY_ERRORS, DB_POOL_WAIT)
+
+# ConnectionPool.stats() keys exposed at scrape time: key -> (metric name, type, help)
+POOL_STATS = {
+    'size': ('db_pool_connections', 'gauge', 'Open connections in the pool'),
+    'idle': ('db_pool_idle_connections', 'gauge', 'Idle connections in the pool'),
+    'in_use': ('db_pool_in_use_connections', 'gauge', 'Connections checked out of the pool'),
+    'waiting': ('db_pool_waiting_requests', 'gauge', 'Requests waiting for a pooled connection'),
+    'max_size': ('db_pool_max_connections', 'gauge', 'Maximum pool size'),
+    'checkouts': ('db_pool_checkouts_total', 'counter', 'Connections checked out of the pool'),
+    'timeouts': ('db_pool_timeouts_total', 'counter', 'Checkouts that timed out waiting for a connection'),
+    'recycled': ('db_pool_recycled_total', 'counter', 'Broken connections closed and replaced'),
+}
+
+# ConcurrencyLimiter.stats() keys for admission control
+ADMISSION_STATS = {
+    'limit': ('http_admission_limit', 'gauge', 'Maximum API requests in flight'),
+    'active': ('http_admission_active_requests', 'gauge', 'API requests in flight'),
+    'waiting': ('http_admission_queued_requests', 'gauge', 'API requests queued for admission'),
+    'admitted': ('http_admission_admitted_total', 'counter', 'API requests admitted'),
+    'rejected': ('http_admission_rejected_total', 'counter', 'API requests shed with 503'),
+}
+
+@contextmanager
+def track_query(operation: str, query: str):
+    """Time a database query and count its rows and errors
+
+    Yields a dict; set ``rows`` on it to record the row count. Queries
+    slower than ``SLOW_QUERY_MS`` are printed with their SQL (not their
+    parameters, which hold customer details).
+    """
+    record = {'rows': None}
+    started = time.perf_counter()
+    try:
+        yield record
+    except Exception:
+        DB_QUERY_ERRORS.inc(operation)
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        DB_QUERY_DURATION.observe(elapsed, operation)
+        if record['rows'] is not None and record['rows'] >= 0:
+            DB_QUERY_ROWS.observe(record['rows'], operation)
+        if SLOW_QUERY_MS and elapsed * 1000 >= SLOW_QUERY_MS:
+            print(f"Slow query ({elapsed * 1000:.1f} ms) in {operation}: {' '.join(query.split())}")
+
+def observe_request(method: str, endpoint: str, status: int, seconds: float):
+    """Record one handled HTTP request"""
+    HTTP_REQUEST_DURATION.observe(seconds, method, endpoint)
+    HTTP_REQUESTS.inc(method, endpoint, str(status))
+    if status >= 500:
+        HTTP_REQUEST_ERRORS.inc(method, endpoint)
+
+def render(pool_stats: Dict = None, admission_stats: Dict = None) -> str:
+    """Render every metric, plus connection pool and admission stats if given, in Prometheus text format"""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    for stats, names in ((pool_stats, POOL_STATS), (admission_stats, ADMISSION_STATS)):
+        for key, (name, kind, documentation) in names.items():
+            if stats and key in stats:
+                lines.extend([f"# HELP {name} {documentation}", f"# TYPE {name} {kind}",
+                              f"{name} {_format_value(stats[key])}"])
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,188 @@
+"""PostgreSQL statements shared by DatabaseManager and AsyncDatabaseManager
+
+Statements use psycopg2's ``%s`` placeholders; AsyncDatabaseManager rewrites
+them to asyncpg's ``$1, $2, ...`` with ``numbered``. Placeholders are
+positional, so a statement that uses a value twice takes it twice.
+"""
+import functools
+import itertools
+import re
+
+BOOKING_COLUMNS = "(ticket_id, name, age, phone, email, departure, destination, date, time, seat, fare, status)"
+BOOKING_VALUES = "(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"
+
+# Name of the unique constraint on bookings.ticket_id
+TICKET_ID_CONSTRAINT = 'bookings_ticket_id_key'
+
+# Confirmed seats are unique per journey (the idx_confirmed_seat partial index)
+ON_SEAT_CONFLICT = """
+    ON CONFLICT (departure, destination, date, time, seat) WHERE status = 'confirmed'
+    DO NOTHING
+"""
+
+@functools.lru_cache(maxsize=None)
+def numbered(query: str) -> str:
+    """Rewrite ``%s`` placeholders as ``$1, $2, ...`` for asyncpg"""
+    counter = itertools.count(1)
+    return re.sub(r'%s', lambda match: f'${next(counter)}', query).replace('%%', '%')
+
+def waiting_for(table: str) -> str:
+    """Whether anyone is waiting for the journey of the current row of ``table``"""
+    return f"""EXISTS (
+        SELECT 1 FROM waitlist w
+        WHERE w.departure = {table}.departure AND w.destination = {table}.destination
+        AND w.date = {table}.date AND w.time = {table}.time AND w.status = 'waiting'
+    )"""
+
+# A hold blocks its seat while live, and once expired too while anyone is
+# waiting for the journey, until the sweep books it for them
+HOLD_BLOCKS = f"(seat_holds.expires_at >= CURRENT_TIMESTAMP OR {waiting_for('seat_holds')})"
+
+# Bookings
+CREATE_BOOKING = f"INSERT INTO bookings {BOOKING_COLUMNS} VALUES {BOOKING_VALUES} RETURNING *"
+
+RESERVE_SEAT = f"INSERT INTO bookings {BOOKING_COLUMNS} VALUES {BOOKING_VALUES} {ON_SEAT_CONFLICT} RETURNING *"
+
+# {values} is one BOOKING_VALUES group per booking
+RESERVE_SEATS = f"INSERT INTO bookings {BOOKING_COLUMNS} VALUES {{values}} {ON_SEAT_CONFLICT} RETURNING *"
+
+# Drops the caller's own hold before it books the seat, so the insert is not
+# skipped by trg_bookings_skip_held_seat. An expired hold is only dropped if
+# nobody is waiting for the seat. Params: hold_id, departure, destination, date, time, seat
+RELEASE_OWN_SEAT_HOLD = f"""
+    DELETE FROM seat_holds
+    WHERE hold_id = %s AND departure = %s AND destination = %s AND date = %s AND time = %s AND seat = %s
+    AND (expires_at >= CURRENT_TIMESTAMP OR NOT {waiting_for('seat_holds')})
+"""
+
+GET_BOOKING = "SELECT * FROM bookings WHERE ticket_id = %s"
+
+GET_ALL_BOOKINGS = "SELECT * FROM bookings ORDER BY booked_at DESC"
+
+STREAM_ALL_BOOKINGS = "SELECT * FROM bookings ORDER BY booked_at DESC, id DESC"
+
+GET_BOOKINGS_FIRST_PAGE = "SELECT * FROM bookings ORDER BY booked_at DESC, id DESC LIMIT %s"
+
+GET_BOOKINGS_PAGE_AFTER = """
+    SELECT * FROM bookings
+    WHERE (booked_at, id) < (%s, %s)
+    ORDER BY booked_at DESC, id DESC
+    LIMIT %s
+"""
+
+# search_bookings: each filter adds its condition with one parameter
+SEARCH_CONDITIONS = {
+    'ticket_id': "ticket_id LIKE %s",
+    'phone': "phone LIKE %s",
+    'name': "name ILIKE %s",
+    'departure': "departure = %s",
+    'destination': "destination = %s",
+    'date_from': "date >= %s",
+    'date_to': "date <= %s",
+}
+
+SEARCH_BOOKINGS = """
+    SELECT * FROM bookings
+    WHERE {conditions}
+    ORDER BY booked_at DESC, id DESC
+    LIMIT %s
+"""
+
+def like_escape(text: str) -> str:
+    """Escape LIKE wildcards in user input"""
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+CANCEL_BOOKING = "UPDATE bookings SET status = 'cancelled', updated_at = CURRENT_TIMESTAMP WHERE ticket_id = %s"
+
+# Cancels a confirmed booking and returns the freed seat for PROMOTE_WAITLIST
+CANCEL_BOOKING_FREEING = CANCEL_BOOKING + f"""
+    AND status = 'confirmed'
+    RETURNING departure, destination, date, time, seat, {waiting_for('bookings')} AS waitlisted
+"""
+
+# Books a freed seat for the first customer waiting for the journey.
+# Params: departure, destination, date, time, new ticket ID, seat. The
+# booking is inserted before the entry is marked promoted, so a seat
+# conflict leaves the customer waiting rather than promoted to nothing;
+# SKIP LOCKED lets concurrent frees promote different customers.
+PROMOTE_WAITLIST = f"""
+    WITH next AS (
+        SELECT * FROM waitlist
+        WHERE departure = %s AND destination = %s AND date = %s AND time = %s AND status = 'waiting'
+        ORDER BY id
+        LIMIT 1
+        FOR UPDATE SKIP LOCKED
+    ), booked AS (
+        INSERT INTO bookings {BOOKING_COLUMNS}
+        SELECT %s, name, age, phone, email, departure, destination, date, time, %s, fare, 'confirmed'
+        FROM next
+        {ON_SEAT_CONFLICT}
+        RETURNING ticket_id
+    )
+    UPDATE waitlist SET status = 'promoted', ticket_id = booked.ticket_id, promoted_at = CURRENT_TIMESTAMP
+    FROM next, booked
+    WHERE waitlist.id = next.id
+"""
+
+# Seats. Params: departure, destination, date, time, seat, then the same again
+CHECK_SEAT_AVAILABILITY = f"""
+    SELECT
+        (SELECT COUNT(*) FROM bookings
+         WHERE departure = %s AND destination = %s AND date = %s AND time = %s
+         AND seat = %s AND status = 'confirmed')
+        + (SELECT COUNT(*) FROM seat_holds
+           WHERE departure = %s AND destination = %s AND date = %s AND time = %s
+           AND seat = %s AND {HOLD_BLOCKS}) as count
+"""
+
+# Served by the idx_confirmed_seat index
+GET_OCCUPIED_SEATS = """
+    SELECT seat FROM bookings
+    WHERE departure = %s AND destination = %s AND date = %s AND time = %s
+    AND status = 'confirmed'
+"""
+
+GET_HELD_SEATS = f"""
+    SELECT seat FROM seat_holds
+    WHERE departure = %s AND destination = %s AND date = %s AND time = %s
+    AND {HOLD_BLOCKS}
+"""
+
+# One range scan of idx_seat_holds_expires_at; returns the freed seats for PROMOTE_WAITLIST
+RELEASE_EXPIRED_SEAT_HOLDS = f"""
+    DELETE FROM seat_holds WHERE expires_at < CURRENT_TIMESTAMP
+    RETURNING departure, destination, date, time, seat, {waiting_for('seat_holds')} AS waitlisted
+"""
+
+# Reference data
+GET_ALL_ROUTES = "SELECT * FROM routes ORDER BY route_name"
+
+UPDATE_ROUTE_FARE = "UPDATE routes SET fare = %s, updated_at = CURRENT_TIMESTAMP WHERE route_name = %s"
+
+GET_ALL_BUS_STOPS = "SELECT * FROM bus_stops ORDER BY city"
+
+GET_CONFIG = "SELECT config_value FROM system_config WHERE config_key = %s"
+
+GET_ALL_CONFIG = "SELECT config_key, config_value FROM system_config"
+
+# Statistics, read from the trigger-maintained booking_stats rollup
+GET_BOOKING_STATS = """
+    SELECT
+        COALESCE(SUM(booking_count), 0) as total_bookings,
+        COALESCE(SUM(booking_count) FILTER (WHERE status = 'confirmed'), 0) as confirmed,
+        COALESCE(SUM(booking_count) FILTER (WHERE status = 'cancelled'), 0) as cancelled,
+        COALESCE(SUM(revenue) FILTER (WHERE status = 'confirmed'), 0) as total_revenue
+    FROM booking_stats
+"""
+
+GET_TOP_ROUTES = """
+    SELECT
+        departure || ' to ' || destination as route,
+        SUM(booking_count) as count
+    FROM booking_stats
+    WHERE status = 'confirmed'
+    GROUP BY departure, destination
+    HAVING SUM(booking_count) > 0
+    ORDER BY count DESC
+    LIMIT %s
+"""
@@ -0,0 +1,105 @@
+import cProfile
+import datetime
+import hmac
+import io
+import marshal
+import pstats
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+# Modules whose functions get their own section in the report
+DATABASE_MODULES = r'db_manager|sqlite_manager|connection_pool'
+
+class RequestProfiler:
+    """cProfile wrapper for profiling single requests on demand
+
+    Only callers holding ``token`` can start a profile, and the limits keep
+    it safe to leave enabled in production: at most one request per process
+    is profiled at a time, profiles start at most once every
+    ``min_interval`` seconds, and only the latest ``keep`` profiles are
+    stored (in memory). Requests that ask for a profile but hit a limit run
+    normally, unprofiled.
+    """
+
+    def __init__(self, token: Optional[str], min_interval: float = 10.0, keep: int = 20, top: int = 40):
+        self.token = token
+        self.min_interval = min_interval
+        self.keep = keep
+        self.top = top
+        self._active = threading.Lock()
+        self._last_started = None
+        self._profiles: 'OrderedDict[str, Dict]' = OrderedDict()
+        self._profiles_lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.token)
+
+    def authorized(self, supplied: Optional[str]) -> bool:
+        """Check a supplied token in constant time"""
+        return self.enabled and bool(supplied) and hmac.compare_digest(supplied.encode(), self.token.encode())
+
+    def begin(self) -> Tuple[Optional[cProfile.Profile], Optional[str]]:
+        """Start profiling the calling thread; returns (profile, None) or (None, reason skipped)"""
+        if not self._active.acquire(blocking=False):
+            return None, 'busy'
+        now = time.monotonic()
+        if self._last_started is not None and now - self._last_started < self.min_interval:
+            self._active.release()
+            return None, 'rate-limited'
+        self._last_started = now
+        profile = cProfile.Profile()
+        profile.enable()
+        return profile, None
+
+    def abort(self, profile: cProfile.Profile):
+        """Stop a profile without keeping it (the request failed before it finished)"""
+        profile.disable()
+        self._active.release()
+
+    def end(self, profile: cProfile.Profile, method: str, path: str, status: int) -> Dict:
+        """Stop a profile, store it and return its record"""
+        profile.disable()
+        self._active.release()
+
+        stream = io.StringIO()
+        stats = pstats.Stats(profile, stream=stream)
+        raw = marshal.dumps(stats.stats)
+        stats.strip_dirs().sort_stats('cumulative')
+        stream.write(f"{method} {path} -> {status}\n\n")
+        stats.print_stats(self.top)
+        stream.write("Database calls:\n")
+        stats.print_stats(DATABASE_MODULES, self.top)
+        stream.write("Call tree (callees of the slowest functions):\n")
+        stats.print_callees(self.top)
+
+        record = {
+            'id': uuid.uuid4().hex[:12],
+            'method': method,
+            'path': path,
+            'status': status,
+            'duration_ms': round(stats.total_tt * 1000, 3),
+            'captured_at': datetime.datetime.now().isoformat(),
+            'report': stream.getvalue(),
+            'pstats': raw
+        }
+        with self._profiles_lock:
+            self._profiles[record['id']] = record
+            while len(self._profiles) > self.keep:
+                self._profiles.popitem(last=False)
+        return record
+
+    def get(self, profile_id: str) -> Optional[Dict]:
+        """Get a stored profile record by ID"""
+        with self._profiles_lock:
+            return self._profiles.get(profile_id)
+
+    def list(self) -> List[Dict]:
+        """Summaries of the stored profiles, newest first"""
+        with self._profiles_lock:
+            records = list(self._profiles.values())
+        return [{key: record[key] for key in ('id', 'method', 'path', 'status', 'duration_ms', 'captured_at')}
+                for record in reversed(records)]
@@ -0,0 +1,99 @@
+import heapq
+import secrets
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from seat_inventory import Journey, SeatInventory
+
+class SeatHolds:
+    """Time-limited seat holds for the in-memory booking stores
+
+    A hold reserves its seat in the SeatInventory, so every availability
+    check, seat map and auto-assignment already treats it as taken. Expiry
+    times sit in a min-heap: ``expire`` pops only the holds that are due,
+    so a sweep costs O(expired * log n) and runs cheaply before every
+    inventory access instead of scanning all holds on a timer. Released and
+    consumed holds leave stale heap entries that are skipped when popped.
+
+    A seat freed by an expired or released hold is first offered to
+    ``hand_over(journey, seat)``; if that returns True the seat was given to
+    someone else (the journey's waitlist) and stays reserved, otherwise it
+    is released in the inventory. Either way no other request can take the
+    seat in between.
+    """
+
+    def __init__(self, inventory: SeatInventory, hand_over: Optional[Callable[[Journey, int], bool]] = None):
+        self.inventory = inventory
+        self.hand_over = hand_over
+        self._holds: Dict[str, Tuple[Journey, int, float]] = {}  # hold_id -> (journey, seat, expires_at)
+        self._held: Dict[Journey, int] = {}  # journey -> bitmap of held seats
+        self._expiry: List[Tuple[float, str]] = []
+        self._lock = threading.Lock()
+
+    def _drop(self, hold_id: str) -> Tuple[Journey, int, float]:
+        journey, seat, expires_at = self._holds.pop(hold_id)
+        bits = self._held.get(journey, 0) & ~(1 << (seat - 1))
+        if bits:
+            self._held[journey] = bits
+        else:
+            self._held.pop(journey, None)
+        return journey, seat, expires_at
+
+    def _free(self, journey: Journey, seat: int):
+        # Called without the lock held, since hand_over may book the seat
+        if self.hand_over is None or not self.hand_over(journey, seat):
+            self.inventory.release(journey, seat)
+
+    def expire(self) -> int:
+        """Release every hold whose time is up; returns how many were released"""
+        now = time.monotonic()
+        expired = []
+        with self._lock:
+            while self._expiry and self._expiry[0][0] <= now:
+                expires_at, hold_id = heapq.heappop(self._expiry)
+                hold = self._holds.get(hold_id)
+                if hold is None or hold[2] != expires_at:
+                    continue
+                journey, seat, _ = self._drop(hold_id)
+                expired.append((journey, seat))
+        for journey, seat in expired:
+            self._free(journey, seat)
+        return len(expired)
+
+    def place(self, journey: Journey, seat: int, ttl: float) -> Optional[str]:
+        """Hold a seat for ``ttl`` seconds; returns the hold ID, or None if the seat is taken or held"""
+        self.expire()
+        with self._lock:
+            if not self.inventory.reserve(journey, seat):
+                return None
+            hold_id = secrets.token_hex(16)
+            expires_at = time.monotonic() + ttl
+            self._holds[hold_id] = (journey, seat, expires_at)
+            self._held[journey] = self._held.get(journey, 0) | (1 << (seat - 1))
+            heapq.heappush(self._expiry, (expires_at, hold_id))
+            return hold_id
+
+    def release(self, hold_id: str) -> bool:
+        """Release a hold before it expires"""
+        self.expire()
+        with self._lock:
+            if hold_id not in self._holds:
+                return False
+            journey, seat, _ = self._drop(hold_id)
+        self._free(journey, seat)
+        return True
+
+    def consume(self, hold_id: str, journey: Journey, seat: int) -> bool:
+        """Turn a live hold on this seat into a booking; the seat stays reserved in the inventory"""
+        self.expire()
+        with self._lock:
+            hold = self._holds.get(hold_id)
+            if hold is None or hold[0] != journey or hold[1] != seat:
+                return False
+            self._drop(hold_id)
+            return True
+
+    def held_bitmap(self, journey: Journey) -> int:
+        """Get the bitmap of held seats on a journey (bit ``seat - 1``)"""
+        return self._held.get(journey, 0)
@@ -0,0 +1,71 @@
+import threading
+from typing import Dict, List, Optional, Tuple
+
+Journey = Tuple[str, str, str, str]
+
+class SeatInventory:
+    """Per-journey seat occupancy bitmaps for the in-memory booking stores
+
+    Each journey (departure, destination, date, time) maps to an int bitmap
+    where bit ``seat - 1`` is set while the seat holds a confirmed booking.
+    Build it once from the existing bookings, then keep it current with
+    reserve/release so availability checks never scan booking history.
+    """
+
+    def __init__(self, total_seats: int):
+        self.total_seats = total_seats
+        self._journeys: Dict[Journey, int] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def journey_of(booking: Dict) -> Journey:
+        """Get the journey key for a booking dict"""
+        return (booking['departure'], booking['destination'], booking['date'], booking['time'])
+
+    @classmethod
+    def from_bookings(cls, bookings: Dict, total_seats: int) -> 'SeatInventory':
+        """Build an inventory from a ticket_id -> booking dict"""
+        inventory = cls(total_seats)
+        for booking in bookings.values():
+            if booking.get('status') != 'cancelled':
+                journey = cls.journey_of(booking)
+                inventory._journeys[journey] = inventory._journeys.get(journey, 0) | (1 << (int(booking['seat']) - 1))
+        return inventory
+
+    def is_available(self, journey: Journey, seat: int) -> bool:
+        """Check if a seat is free on a journey"""
+        return not (self._journeys.get(journey, 0) >> (seat - 1)) & 1
+
+    def reserve(self, journey: Journey, seat: int) -> bool:
+        """Mark a seat as taken; returns False if it was already taken"""
+        bit = 1 << (seat - 1)
+        with self._lock:
+            bits = self._journeys.get(journey, 0)
+            if bits & bit:
+                return False
+            self._journeys[journey] = bits | bit
+            return True
+
+    def release(self, journey: Journey, seat: int):
+        """Mark a seat as free again"""
+        with self._lock:
+            bits = self._journeys.get(journey, 0) & ~(1 << (seat - 1))
+            if bits:
+                self._journeys[journey] = bits
+            else:
+                self._journeys.pop(journey, None)
+
+    def first_free(self, journey: Journey) -> Optional[int]:
+        """Get the lowest free seat number on a journey, or None if it is full"""
+        bits = self._journeys.get(journey, 0)
+        seat = (~bits & (bits + 1)).bit_length()
+        return seat if seat <= self.total_seats else None
+
+    def occupied_bitmap(self, journey: Journey) -> int:
+        """Get the raw occupancy bitmap for a journey"""
+        return self._journeys.get(journey, 0)
+
+    def occupied_seats(self, journey: Journey) -> List[int]:
+        """Get the sorted list of taken seat numbers on a journey"""
+        bits = self._journeys.get(journey, 0)
+        return [i + 1 for i in range(bits.bit_length()) if (bits >> i) & 1]
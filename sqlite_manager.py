@@ -0,0 +1,775 @@
+import os
+import sqlite3
+import threading
+from typing import Callable, Dict, Iterator, List, Optional
+from contextlib import contextmanager
+
+import metrics
+
+SCHEMA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'database_sqlite.sql')
+
+class SQLiteDatabaseManager:
+    """Embedded SQLite backend with the same interface as DatabaseManager"""
+
+    _db_path = None
+    _local = threading.local()
+    _has_fts = False
+    _init_lock = threading.Lock()
+
+    # A bookings row rendered as the API's JSON booking object
+    BOOKING_JSON = """json_object(
+        'ticket_id', ticket_id, 'name', name, 'age', age, 'phone', phone, 'email', email,
+        'departure', departure, 'destination', destination, 'date', date,
+        'time', time, 'seat', seat, 'fare', CAST(fare AS REAL), 'status', status,
+        'booked_at', booked_at
+    )"""
+
+    @classmethod
+    def initialize_pool(cls, db_path: Optional[str] = None):
+        """Open the database file and create the schema if needed"""
+        with cls._init_lock:
+            if cls._db_path is not None:
+                return
+            db_path = db_path or os.environ.get('SQLITE_PATH')
+            if not db_path:
+                raise ValueError("SQLite path not found in environment variables")
+
+            conn = cls._connect(db_path)
+            cls._upgrade_schema(conn)
+            with open(SCHEMA_FILE, 'r') as f:
+                conn.executescript(f.read())
+            cls._has_fts = cls._create_name_index(conn)
+            cls._db_path = db_path
+            cls._local.conn = conn
+
+    @classmethod
+    def max_connections(cls) -> int:
+        """Connection limit for admission control; each thread opens its own connection, so there is none to match"""
+        return 10
+
+    @classmethod
+    def pool_stats(cls) -> Dict:
+        """Connection pool stats; SQLite uses one connection per thread, so there is no pool"""
+        return {}
+
+    @staticmethod
+    def _connect(db_path: str) -> sqlite3.Connection:
+        conn = sqlite3.connect(db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute("PRAGMA foreign_keys = ON")
+        return conn
+
+    @staticmethod
+    def _upgrade_schema(conn: sqlite3.Connection):
+        """Add columns introduced after a database file was created"""
+        for table, column, definition in (('idempotency_keys', 'claim_token', 'CHAR(32)'),
+                                          ('routes', 'duration_minutes', 'INTEGER')):
+            columns = {row['name'] for row in conn.execute(f"PRAGMA table_info({table})")}
+            if columns and column not in columns:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+    @staticmethod
+    def _create_name_index(conn: sqlite3.Connection) -> bool:
+        """Create the FTS5 trigram index used for name fragment search, if supported"""
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'bookings_name_fts'"
+        ).fetchone()
+        if exists:
+            return True
+        try:
+            with conn:
+                conn.execute("""
+                    CREATE VIRTUAL TABLE bookings_name_fts
+                    USING fts5(name, content='bookings', content_rowid='id', tokenize='trigram')
+                """)
+                conn.execute("""
+                    CREATE TRIGGER IF NOT EXISTS trg_bookings_name_fts_insert AFTER INSERT ON bookings
+                    BEGIN
+                        INSERT INTO bookings_name_fts (rowid, name) VALUES (NEW.id, NEW.name);
+                    END
+                """)
+                conn.execute("""
+                    CREATE TRIGGER IF NOT EXISTS trg_bookings_name_fts_delete AFTER DELETE ON bookings
+                    BEGIN
+                        INSERT INTO bookings_name_fts (bookings_name_fts, rowid, name) VALUES ('delete', OLD.id, OLD.name);
+                    END
+                """)
+                conn.execute("""
+                    CREATE TRIGGER IF NOT EXISTS trg_bookings_name_fts_update AFTER UPDATE OF name ON bookings
+                    BEGIN
+                        INSERT INTO bookings_name_fts (bookings_name_fts, rowid, name) VALUES ('delete', OLD.id, OLD.name);
+                        INSERT INTO bookings_name_fts (rowid, name) VALUES (NEW.id, NEW.name);
+                    END
+                """)
+                conn.execute("INSERT INTO bookings_name_fts (bookings_name_fts) VALUES ('rebuild')")
+            return True
+        except sqlite3.OperationalError as e:
+            # Older SQLite builds lack FTS5 or the trigram tokenizer; fall back to LIKE
+            print(f"Database error: {e}")
+            return False
+
+    @classmethod
+    @contextmanager
+    def get_connection(cls):
+        """Get this thread's database connection"""
+        if cls._db_path is None:
+            cls.initialize_pool()
+
+        conn = getattr(cls._local, 'conn', None)
+        if conn is None:
+            conn = cls._connect(cls._db_path)
+            cls._local.conn = conn
+        try:
+            yield conn
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            raise e
+
+    @classmethod
+    def execute_query(cls, operation: str, query: str, params: tuple = None, fetch: bool = True):
+        """Execute a query and return results, recorded in the query metrics under ``operation``"""
+        with cls.get_connection() as conn:
+            with metrics.track_query(operation, query) as record:
+                cursor = conn.execute(query, params or ())
+                if fetch:
+                    results = [dict(row) for row in cursor.fetchall()]
+                    record['rows'] = len(results)
+                    return results
+                record['rows'] = cursor.rowcount
+                return cursor.rowcount
+
+    @classmethod
+    def execute_one(cls, operation: str, query: str, params: tuple = None):
+        """Execute a query and return a single result, recorded in the query metrics under ``operation``"""
+        with cls.get_connection() as conn:
+            with metrics.track_query(operation, query) as record:
+                row = conn.execute(query, params or ()).fetchone()
+                record['rows'] = 1 if row else 0
+                return dict(row) if row else None
+
+    # Booking operations
+    @staticmethod
+    def is_ticket_id_conflict(error: Exception) -> bool:
+        """Whether an insert failed because its ticket ID is already taken"""
+        return isinstance(error, sqlite3.IntegrityError) and 'bookings.ticket_id' in str(error)
+
+    @staticmethod
+    def _booking_params(booking_data: Dict, status: str) -> tuple:
+        return (
+            booking_data['ticket_id'],
+            booking_data['name'],
+            booking_data['age'],
+            booking_data['phone'],
+            booking_data.get('email', ''),
+            booking_data['departure'],
+            booking_data['destination'],
+            booking_data['date'],
+            booking_data['time'],
+            booking_data['seat'],
+            booking_data['fare'],
+            status
+        )
+
+    @classmethod
+    def create_booking(cls, booking_data: Dict) -> Dict:
+        """Create a new booking"""
+        query = """
+            INSERT INTO bookings
+            (ticket_id, name, age, phone, email, departure, destination, date, time, seat, fare, status)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            RETURNING *
+        """
+        params = cls._booking_params(booking_data, booking_data.get('status', 'confirmed'))
+        return cls.execute_one('create_booking', query, params)
+
+    @classmethod
+    def reserve_seat(cls, booking_data: Dict) -> Optional[Dict]:
+        """Atomically book a seat in one statement.
+
+        Returns the confirmed booking, or None if the seat is already taken
+        for this journey (enforced by the idx_confirmed_seat partial index).
+        """
+        query = """
+            INSERT INTO bookings
+            (ticket_id, name, age, phone, email, departure, destination, date, time, seat, fare, status)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (departure, destination, date, time, seat) WHERE status = 'confirmed'
+            DO NOTHING
+            RETURNING *
+        """
+        return cls.execute_one('reserve_seat', query, cls._booking_params(booking_data, 'confirmed'))
+
+    @classmethod
+    def reserve_seats(cls, bookings: List[Dict]) -> Optional[List[Dict]]:
+        """Atomically book several seats with one multi-row insert.
+
+        All-or-nothing: returns every confirmed booking, or None (and inserts
+        nothing) if any of the seats is already taken.
+        """
+        placeholders = ', '.join(['(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'] * len(bookings))
+        query = f"""
+            INSERT INTO bookings
+            (ticket_id, name, age, phone, email, departure, destination, date, time, seat, fare, status)
+            VALUES {placeholders}
+            ON CONFLICT (departure, destination, date, time, seat) WHERE status = 'confirmed'
+            DO NOTHING
+            RETURNING *
+        """
+        params = tuple(value for booking in bookings for value in cls._booking_params(booking, 'confirmed'))
+        with cls.get_connection() as conn:
+            with metrics.track_query('reserve_seats', query) as record:
+                results = conn.execute(query, params).fetchall()
+                record['rows'] = len(results)
+            if len(results) < len(bookings):
+                conn.rollback()
+                return None
+            return [dict(row) for row in results]
+
+    @classmethod
+    def reserve_seat_json(cls, booking_data: Dict, hold_id: Optional[str] = None) -> Optional[str]:
+        """Like reserve_seat, but return the booking as JSON text rendered by SQLite
+
+        With ``hold_id``, the caller's hold on the seat is released in the same
+        transaction, so the insert is not skipped by trg_bookings_skip_held_seat;
+        if the seat cannot be booked the hold stays in place.
+        """
+        query = f"""
+            INSERT INTO bookings
+            (ticket_id, name, age, phone, email, departure, destination, date, time, seat, fare, status)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (departure, destination, date, time, seat) WHERE status = 'confirmed'
+            DO NOTHING
+            RETURNING {cls.BOOKING_JSON} AS booking
+        """
+        params = cls._booking_params(booking_data, 'confirmed')
+        if hold_id is None:
+            result = cls.execute_one('reserve_seat_json', query, params)
+            return result['booking'] if result else None
+
+        release = f"""
+            DELETE FROM seat_holds
+            WHERE hold_id = ? AND departure = ? AND destination = ? AND date = ? AND time = ? AND seat = ?
+            AND (expires_at >= strftime('%Y-%m-%dT%H:%M:%f', 'now') OR NOT {cls._waiting_for('seat_holds')})
+        """
+        with cls.get_connection() as conn:
+            with metrics.track_query('reserve_seat_json', query) as record:
+                conn.execute(release, (hold_id,) + params[5:10])
+                result = conn.execute(query, params).fetchone()
+                record['rows'] = 1 if result else 0
+            if result is None:
+                conn.rollback()
+                return None
+            return result['booking']
+
+    @classmethod
+    def get_booking(cls, ticket_id: str) -> Optional[Dict]:
+        """Get a booking by ticket ID"""
+        query = "SELECT * FROM bookings WHERE ticket_id = ?"
+        return cls.execute_one('get_booking', query, (ticket_id,))
+
+    @classmethod
+    def get_all_bookings(cls) -> List[Dict]:
+        """Get all bookings"""
+        query = "SELECT * FROM bookings ORDER BY booked_at DESC"
+        return cls.execute_query('get_all_bookings', query)
+
+    @classmethod
+    def get_booking_json(cls, ticket_id: str) -> Optional[str]:
+        """Get a booking by ticket ID as JSON text rendered by SQLite"""
+        query = f"SELECT {cls.BOOKING_JSON} AS booking FROM bookings WHERE ticket_id = ?"
+        result = cls.execute_one('get_booking_json', query, (ticket_id,))
+        return result['booking'] if result else None
+
+    @classmethod
+    def get_all_bookings_json(cls, keyed: bool = False) -> str:
+        """Get all bookings, newest first, as one JSON text: an array, or an object keyed by ticket ID"""
+        aggregate = f"json_group_object(ticket_id, json({cls.BOOKING_JSON}))" if keyed else f"json_group_array(json({cls.BOOKING_JSON}))"
+        query = f"""
+            SELECT {aggregate} AS bookings
+            FROM (SELECT * FROM bookings ORDER BY booked_at DESC, id DESC)
+        """
+        return cls.execute_one('get_all_bookings_json', query)['bookings']
+
+    @classmethod
+    def get_bookings_page(cls, limit: int, after: Optional[tuple] = None) -> List[Dict]:
+        """Get one page of bookings, newest first, keyset-paginated on (booked_at, id)"""
+        if after is None:
+            query = "SELECT * FROM bookings ORDER BY booked_at DESC, id DESC LIMIT ?"
+            params = (limit,)
+        else:
+            query = """
+                SELECT * FROM bookings
+                WHERE (booked_at, id) < (?, ?)
+                ORDER BY booked_at DESC, id DESC
+                LIMIT ?
+            """
+            params = (after[0], after[1], limit)
+        return cls.execute_query('get_bookings_page', query, params)
+
+    @classmethod
+    def iter_all_bookings(cls, batch_size: int = 1000) -> Iterator[Dict]:
+        """Stream all bookings, newest first, in batches"""
+        with cls.get_connection() as conn:
+            cursor = conn.execute("SELECT * FROM bookings ORDER BY booked_at DESC, id DESC")
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield dict(row)
+
+    @classmethod
+    def iter_all_bookings_json(cls, batch_size: int = 1000) -> Iterator[str]:
+        """Stream all bookings, newest first, as one JSON text per booking"""
+        with cls.get_connection() as conn:
+            cursor = conn.execute(f"SELECT {cls.BOOKING_JSON} FROM bookings ORDER BY booked_at DESC, id DESC")
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield row[0]
+
+    @staticmethod
+    def _like_escape(text: str) -> str:
+        return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+    @classmethod
+    def search_bookings(cls, ticket_id: Optional[str] = None, phone: Optional[str] = None,
+                        name: Optional[str] = None, departure: Optional[str] = None,
+                        destination: Optional[str] = None, date_from: Optional[str] = None,
+                        date_to: Optional[str] = None, limit: int = 100) -> List[Dict]:
+        """Search bookings by ticket ID prefix, phone prefix, name fragment, route and date range"""
+        conditions = []
+        params = []
+        # Prefixes are range scans so the plain indexes apply (SQLite LIKE is case-insensitive)
+        if ticket_id:
+            conditions.append("ticket_id >= ? AND ticket_id < ?")
+            params.extend([ticket_id, ticket_id + '\U0010ffff'])
+        if phone:
+            conditions.append("phone >= ? AND phone < ?")
+            params.extend([phone, phone + '\U0010ffff'])
+        if name:
+            if cls._has_fts and len(name) >= 3:
+                conditions.append("id IN (SELECT rowid FROM bookings_name_fts WHERE bookings_name_fts MATCH ?)")
+                params.append('"' + name.replace('"', '""') + '"')
+            else:
+                conditions.append("name LIKE ? ESCAPE '\\'")
+                params.append('%' + cls._like_escape(name) + '%')
+        if departure:
+            conditions.append("departure = ?")
+            params.append(departure)
+        if destination:
+            conditions.append("destination = ?")
+            params.append(destination)
+        if date_from:
+            conditions.append("date >= ?")
+            params.append(date_from)
+        if date_to:
+            conditions.append("date <= ?")
+            params.append(date_to)
+        if not conditions:
+            return []
+
+        query = f"""
+            SELECT * FROM bookings
+            WHERE {' AND '.join(conditions)}
+            ORDER BY booked_at DESC, id DESC
+            LIMIT ?
+        """
+        params.append(limit)
+        return cls.execute_query('search_bookings', query, tuple(params))
+
+    @classmethod
+    def cancel_booking(cls, ticket_id: str, promoted_ticket_id: Optional[str] = None) -> bool:
+        """Cancel a booking
+
+        With ``promoted_ticket_id``, the freed seat is booked under that ticket
+        ID for the first customer on the journey's waitlist, in the same
+        transaction, so no other request can take the seat in between.
+        """
+        query = """
+            UPDATE bookings SET status = 'cancelled', updated_at = strftime('%Y-%m-%dT%H:%M:%f', 'now')
+            WHERE ticket_id = ?
+        """
+        if promoted_ticket_id is None:
+            return cls.execute_query('cancel_booking', query, (ticket_id,), fetch=False) > 0
+
+        query += (" AND status = 'confirmed' RETURNING departure, destination, date, time, seat, "
+                  f"{cls._waiting_for('bookings')} AS waitlisted")
+        return cls._free_seats('cancel_booking', query, (ticket_id,), lambda: promoted_ticket_id) > 0
+
+    @staticmethod
+    def _waiting_for(table: str) -> str:
+        # Whether anyone is waiting for the journey of the current row of table
+        return f"""EXISTS (
+            SELECT 1 FROM waitlist w
+            WHERE w.departure = {table}.departure AND w.destination = {table}.destination
+            AND w.date = {table}.date AND w.time = {table}.time AND w.status = 'waiting'
+        )"""
+
+    @classmethod
+    def _hold_blocks(cls) -> str:
+        # A hold blocks its seat while live, and once expired too while anyone
+        # is waiting for the journey, until the sweep books it for them
+        return f"(seat_holds.expires_at >= strftime('%Y-%m-%dT%H:%M:%f', 'now') OR {cls._waiting_for('seat_holds')})"
+
+    @classmethod
+    def _free_seats(cls, operation: str, query: str, params: tuple, new_ticket_id: Callable[[], str]) -> int:
+        """Run a statement that frees seats and hand each one to its journey's waitlist, in one transaction
+
+        The statement must return departure, destination, date, time, seat and
+        waitlisted for every seat it frees; returns how many it freed.
+        """
+        next_waiting = """
+            SELECT id FROM waitlist
+            WHERE departure = ? AND destination = ? AND date = ? AND time = ? AND status = 'waiting'
+            ORDER BY id
+            LIMIT 1
+        """
+        # The booking is inserted before the entry is marked promoted, so a
+        # seat conflict leaves the customer waiting rather than promoted to nothing
+        book = """
+            INSERT INTO bookings
+            (ticket_id, name, age, phone, email, departure, destination, date, time, seat, fare, status)
+            SELECT ?, name, age, phone, email, departure, destination, date, time, ?, fare, 'confirmed'
+            FROM waitlist WHERE id = ?
+            ON CONFLICT (departure, destination, date, time, seat) WHERE status = 'confirmed'
+            DO NOTHING
+            RETURNING ticket_id
+        """
+        promote = """
+            UPDATE waitlist SET status = 'promoted', ticket_id = ?,
+                promoted_at = strftime('%Y-%m-%dT%H:%M:%f', 'now')
+            WHERE id = ?
+        """
+        # The freeing statement takes the database write lock, which is held
+        # until commit, so the head of a queue cannot change underneath us
+        with cls.get_connection() as conn:
+            with metrics.track_query(operation, query) as record:
+                freed = conn.execute(query, params).fetchall()
+                record['rows'] = len(freed)
+                for seat in freed:
+                    if not seat['waitlisted']:
+                        continue
+                    waiting = conn.execute(next_waiting, tuple(seat)[:4]).fetchone()
+                    if waiting is None:
+                        continue
+                    ticket_id = new_ticket_id()
+                    if conn.execute(book, (ticket_id, seat['seat'], waiting['id'])).fetchone():
+                        conn.execute(promote, (ticket_id, waiting['id']))
+            return len(freed)
+
+    @classmethod
+    def check_seat_availability(cls, departure: str, destination: str, date: str, time: str, seat: int) -> bool:
+        """Check if a seat is neither booked nor held for a specific journey"""
+        query = f"""
+            SELECT
+                (SELECT COUNT(*) FROM bookings
+                 WHERE departure = ? AND destination = ? AND date = ? AND time = ?
+                 AND seat = ? AND status = 'confirmed')
+                + (SELECT COUNT(*) FROM seat_holds
+                   WHERE departure = ? AND destination = ? AND date = ? AND time = ?
+                   AND seat = ? AND {cls._hold_blocks()}) as count
+        """
+        result = cls.execute_one('check_seat_availability', query, (departure, destination, date, time, seat) * 2)
+        return result['count'] == 0
+
+    @classmethod
+    def get_occupied_seats(cls, departure: str, destination: str, date: str, time: str) -> List[int]:
+        """Get the taken seat numbers for a journey (served by the idx_confirmed_seat index)"""
+        query = """
+            SELECT seat FROM bookings
+            WHERE departure = ? AND destination = ? AND date = ? AND time = ?
+            AND status = 'confirmed'
+        """
+        rows = cls.execute_query('get_occupied_seats', query, (departure, destination, date, time))
+        return [row['seat'] for row in rows]
+
+    # Seat holds
+    @classmethod
+    def place_seat_hold(cls, hold_id: str, departure: str, destination: str, date: str, time: str,
+                        seat: int, ttl: int) -> bool:
+        """Hold a seat for ``ttl`` seconds; False if it is booked or already held (see _hold_blocks)"""
+        query = f"""
+            INSERT INTO seat_holds (hold_id, departure, destination, date, time, seat, expires_at)
+            SELECT ?, ?, ?, ?, ?, ?, strftime('%Y-%m-%dT%H:%M:%f', 'now', '+' || ? || ' seconds')
+            WHERE NOT EXISTS (
+                SELECT 1 FROM bookings
+                WHERE departure = ? AND destination = ? AND date = ? AND time = ?
+                AND seat = ? AND status = 'confirmed'
+            )
+            ON CONFLICT (departure, destination, date, time, seat) DO UPDATE
+            SET hold_id = excluded.hold_id, created_at = strftime('%Y-%m-%dT%H:%M:%f', 'now'),
+                expires_at = excluded.expires_at
+            WHERE seat_holds.expires_at < strftime('%Y-%m-%dT%H:%M:%f', 'now')
+            AND NOT {cls._waiting_for('seat_holds')}
+            RETURNING hold_id
+        """
+        journey = (departure, destination, date, time, seat)
+        return cls.execute_one('place_seat_hold', query, (hold_id,) + journey + (ttl,) + journey) is not None
+
+    @classmethod
+    def release_seat_hold(cls, hold_id: str, promoted_ticket_id: Optional[str] = None) -> bool:
+        """Release a hold before it expires
+
+        With ``promoted_ticket_id``, the seat is booked under that ticket ID
+        for the first customer on the journey's waitlist, as in cancel_booking.
+        """
+        query = "DELETE FROM seat_holds WHERE hold_id = ? AND expires_at >= strftime('%Y-%m-%dT%H:%M:%f', 'now')"
+        if promoted_ticket_id is None:
+            return cls.execute_query('release_seat_hold', query, (hold_id,), fetch=False) > 0
+        query += f" RETURNING departure, destination, date, time, seat, {cls._waiting_for('seat_holds')} AS waitlisted"
+        return cls._free_seats('release_seat_hold', query, (hold_id,), lambda: promoted_ticket_id) > 0
+
+    @classmethod
+    def release_expired_seat_holds(cls, new_ticket_id: Callable[[], str]) -> int:
+        """Delete every expired hold in one statement (a range scan of idx_seat_holds_expires_at)
+
+        Seats on journeys with a waitlist are booked for the first waiting
+        customer, under ticket IDs from ``new_ticket_id``; until then
+        trg_bookings_skip_held_seat keeps them from being booked directly.
+        Returns how many holds were deleted.
+        """
+        query = f"""
+            DELETE FROM seat_holds WHERE expires_at < strftime('%Y-%m-%dT%H:%M:%f', 'now')
+            RETURNING departure, destination, date, time, seat, {cls._waiting_for('seat_holds')} AS waitlisted
+        """
+        return cls._free_seats('release_expired_seat_holds', query, (), new_ticket_id)
+
+    @classmethod
+    def get_held_seats(cls, departure: str, destination: str, date: str, time: str) -> List[int]:
+        """Get the seat numbers under a hold that blocks booking for a journey (see _hold_blocks)"""
+        query = f"""
+            SELECT seat FROM seat_holds
+            WHERE departure = ? AND destination = ? AND date = ? AND time = ?
+            AND {cls._hold_blocks()}
+        """
+        return [row['seat'] for row in cls.execute_query('get_held_seats', query, (departure, destination, date, time))]
+
+    # Waitlist
+    @classmethod
+    def join_waitlist(cls, entry: Dict, total_seats: int) -> Optional[int]:
+        """Add a customer to a journey's waitlist; returns their position, or None if seats are free
+
+        The journey only counts as sold out when every seat is booked or under
+        a live hold.
+        """
+        query = f"""
+            INSERT INTO waitlist (waitlist_id, name, age, phone, email, departure, destination, date, time, fare)
+            SELECT ?, ?, ?, ?, ?, ?, ?, ?, ?, ?
+            WHERE (SELECT COUNT(*) FROM bookings
+                   WHERE departure = ? AND destination = ? AND date = ? AND time = ?
+                   AND status = 'confirmed')
+                + (SELECT COUNT(*) FROM seat_holds
+                   WHERE departure = ? AND destination = ? AND date = ? AND time = ?
+                   AND {cls._hold_blocks()}) >= ?
+            RETURNING id
+        """
+        position = """
+            SELECT COUNT(*) AS position FROM waitlist
+            WHERE departure = ? AND destination = ? AND date = ? AND time = ?
+            AND status = 'waiting' AND id <= ?
+        """
+        journey = (entry['departure'], entry['destination'], entry['date'], entry['time'])
+        params = (entry['waitlist_id'], entry['name'], entry['age'], entry['phone'], entry.get('email', '')) \
+            + journey + (entry['fare'],) + journey * 2 + (total_seats,)
+        with cls.get_connection() as conn:
+            with metrics.track_query('join_waitlist', query) as record:
+                inserted = conn.execute(query, params).fetchone()
+                record['rows'] = 1 if inserted else 0
+                if inserted is None:
+                    return None
+                return conn.execute(position, journey + (inserted['id'],)).fetchone()['position']
+
+    @classmethod
+    def get_waitlist_entry(cls, waitlist_id: str) -> Optional[Dict]:
+        """Get a waitlist entry's journey, status, queue position (while waiting) and promoted ticket ID"""
+        query = """
+            SELECT w.waitlist_id, w.departure, w.destination, w.date, w.time, w.status, w.ticket_id,
+                CASE WHEN w.status = 'waiting' THEN (
+                    SELECT COUNT(*) FROM waitlist a
+                    WHERE a.departure = w.departure AND a.destination = w.destination
+                    AND a.date = w.date AND a.time = w.time
+                    AND a.status = 'waiting' AND a.id <= w.id
+                ) END AS position
+            FROM waitlist w
+            WHERE w.waitlist_id = ?
+        """
+        return cls.execute_one('get_waitlist_entry', query, (waitlist_id,))
+
+    @classmethod
+    def leave_waitlist(cls, waitlist_id: str) -> bool:
+        """Take a customer who is still waiting off the waitlist"""
+        query = "UPDATE waitlist SET status = 'cancelled' WHERE waitlist_id = ? AND status = 'waiting'"
+        return cls.execute_query('leave_waitlist', query, (waitlist_id,), fetch=False) > 0
+
+    # Route operations
+    @classmethod
+    def get_all_routes(cls) -> List[Dict]:
+        """Get all routes"""
+        query = "SELECT * FROM routes ORDER BY route_name"
+        return cls.execute_query('get_all_routes', query)
+
+    @classmethod
+    def get_route(cls, route_name: str) -> Optional[Dict]:
+        """Get a route by name"""
+        query = "SELECT * FROM routes WHERE route_name = ?"
+        return cls.execute_one('get_route', query, (route_name,))
+
+    @classmethod
+    def update_route_fare(cls, route_name: str, fare: float) -> bool:
+        """Update route fare"""
+        query = """
+            UPDATE routes SET fare = ?, updated_at = strftime('%Y-%m-%dT%H:%M:%f', 'now')
+            WHERE route_name = ?
+        """
+        return cls.execute_query('update_route_fare', query, (fare, route_name), fetch=False) > 0
+
+    @classmethod
+    def get_all_cities(cls) -> List[str]:
+        """Get all unique cities from routes"""
+        query = """
+            SELECT DISTINCT city FROM (
+                SELECT substr(route_name, 1, instr(route_name, ' to ') - 1) as city FROM routes
+                UNION
+                SELECT substr(route_name, instr(route_name, ' to ') + 4) as city FROM routes
+            ) cities
+            ORDER BY city
+        """
+        return [row['city'] for row in cls.execute_query('get_all_cities', query)]
+
+    # Bus stops operations
+    @classmethod
+    def get_bus_stops(cls, city: str) -> Optional[Dict]:
+        """Get bus stops for a city"""
+        query = "SELECT * FROM bus_stops WHERE city = ?"
+        return cls.execute_one('get_bus_stops', query, (city,))
+
+    @classmethod
+    def get_all_bus_stops(cls) -> List[Dict]:
+        """Get all bus stops"""
+        query = "SELECT * FROM bus_stops ORDER BY city"
+        return cls.execute_query('get_all_bus_stops', query)
+
+    # Config operations
+    @classmethod
+    def get_config(cls, key: str) -> Optional[str]:
+        """Get a configuration value"""
+        query = "SELECT config_value FROM system_config WHERE config_key = ?"
+        result = cls.execute_one('get_config', query, (key,))
+        return result['config_value'] if result else None
+
+    @classmethod
+    def get_all_config(cls) -> Dict:
+        """Get all configuration"""
+        query = "SELECT config_key, config_value FROM system_config"
+        results = cls.execute_query('get_all_config', query)
+        return {row['config_key']: row['config_value'] for row in results}
+
+    @classmethod
+    def set_config(cls, key: str, value: str) -> bool:
+        """Set a configuration value"""
+        query = """
+            INSERT INTO system_config (config_key, config_value)
+            VALUES (?, ?)
+            ON CONFLICT (config_key)
+            DO UPDATE SET config_value = excluded.config_value, updated_at = strftime('%Y-%m-%dT%H:%M:%f', 'now')
+        """
+        return cls.execute_query('set_config', query, (key, value), fetch=False) >= 0
+
+    @classmethod
+    def get_config_version(cls) -> int:
+        """Get the config version counter, bumped by triggers whenever routes, stops or config change"""
+        value = cls.get_config('config_version')
+        return int(value) if value else 0
+
+    # Idempotency keys
+    @classmethod
+    def claim_idempotency_key(cls, key: str, request_hash: str, claim_token: str, ttl: int,
+                              lock_timeout: int) -> Optional[Dict]:
+        """Claim a key for a request about to run.
+
+        Returns None if the key is now held by the caller under
+        ``claim_token``, or the existing row (request_hash, status_code,
+        response_body) otherwise; a NULL status_code means another request
+        still holds it. Expired keys and claims abandoned for longer than
+        ``lock_timeout`` seconds are taken over.
+        """
+        query = """
+            INSERT INTO idempotency_keys (idempotency_key, request_hash, claim_token, expires_at)
+            VALUES (?, ?, ?, strftime('%Y-%m-%dT%H:%M:%f', 'now', '+' || ? || ' seconds'))
+            ON CONFLICT (idempotency_key) DO UPDATE
+            SET request_hash = excluded.request_hash, claim_token = excluded.claim_token,
+                status_code = NULL, response_body = NULL,
+                created_at = strftime('%Y-%m-%dT%H:%M:%f', 'now'), expires_at = excluded.expires_at
+            WHERE idempotency_keys.expires_at < strftime('%Y-%m-%dT%H:%M:%f', 'now')
+            OR (idempotency_keys.status_code IS NULL
+                AND idempotency_keys.created_at < strftime('%Y-%m-%dT%H:%M:%f', 'now', '-' || ? || ' seconds'))
+            RETURNING idempotency_key
+        """
+        if cls.execute_one('claim_idempotency_key', query, (key, request_hash, claim_token, ttl, lock_timeout)):
+            return None
+        query = "SELECT request_hash, status_code, response_body FROM idempotency_keys WHERE idempotency_key = ?"
+        result = cls.execute_one('claim_idempotency_key', query, (key,))
+        # Released between the two statements: report it as still in progress
+        return result or {'request_hash': request_hash, 'status_code': None, 'response_body': None}
+
+    @classmethod
+    def complete_idempotency_key(cls, key: str, request_hash: str, claim_token: str, status_code: int,
+                                 response_body: str) -> bool:
+        """Store the response for a key, unless its claim was taken over by another request"""
+        query = """
+            UPDATE idempotency_keys SET status_code = ?, response_body = ?
+            WHERE idempotency_key = ? AND request_hash = ? AND claim_token = ? AND status_code IS NULL
+        """
+        params = (status_code, response_body, key, request_hash, claim_token)
+        return cls.execute_query('complete_idempotency_key', query, params, fetch=False) > 0
+
+    @classmethod
+    def release_idempotency_key(cls, key: str, request_hash: str, claim_token: str) -> bool:
+        """Drop a claim without storing a response, so the request can be retried"""
+        query = """
+            DELETE FROM idempotency_keys
+            WHERE idempotency_key = ? AND request_hash = ? AND claim_token = ? AND status_code IS NULL
+        """
+        return cls.execute_query('release_idempotency_key', query, (key, request_hash, claim_token), fetch=False) > 0
+
+    @classmethod
+    def purge_idempotency_keys(cls) -> int:
+        """Delete expired idempotency keys"""
+        query = "DELETE FROM idempotency_keys WHERE expires_at < strftime('%Y-%m-%dT%H:%M:%f', 'now')"
+        return cls.execute_query('purge_idempotency_keys', query, fetch=False)
+
+    # Statistics (read from the trigger-maintained booking_stats rollup)
+    @classmethod
+    def get_booking_stats(cls) -> Dict:
+        """Get booking statistics"""
+        query = """
+            SELECT
+                COALESCE(SUM(booking_count), 0) as total_bookings,
+                COALESCE(SUM(booking_count) FILTER (WHERE status = 'confirmed'), 0) as confirmed,
+                COALESCE(SUM(booking_count) FILTER (WHERE status = 'cancelled'), 0) as cancelled,
+                COALESCE(SUM(revenue) FILTER (WHERE status = 'confirmed'), 0) as total_revenue
+            FROM booking_stats
+        """
+        return cls.execute_one('get_booking_stats', query)
+
+    @classmethod
+    def get_top_routes(cls, limit: int = 5) -> List[Dict]:
+        """Get top routes by booking count"""
+        query = """
+            SELECT
+                departure || ' to ' || destination as route,
+                SUM(booking_count) as count
+            FROM booking_stats
+            WHERE status = 'confirmed'
+            GROUP BY departure, destination
+            HAVING SUM(booking_count) > 0
+            ORDER BY count DESC
+            LIMIT ?
+        """
+        return cls.execute_query('get_top_routes', query, (limit,))
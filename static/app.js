@@ -19,6 +19,9 @@ function setupEventListeners() {
     });
 
     document.getElementById('bookingForm').addEventListener('submit', handleBooking);
+    ['departure', 'destination', 'date', 'time'].forEach(id => {
+        document.getElementById(id).addEventListener('change', refreshSeatMap);
+    });
     document.getElementById('adminLoginForm').addEventListener('submit', handleAdminLogin);
 }
 
@@ -73,11 +76,41 @@ function populateCitySelects() {
     });
 }
 
-function populateSeatSelect() {
+function populateSeatSelect(occupied = 0n) {
     const select = document.getElementById('seat');
-    select.innerHTML = '<option value="">Select Seat</option>';
+    let options = '<option value="">Select Seat</option>';
     for (let i = 1; i <= currentConfig.total_seats; i++) {
-        select.innerHTML += `<option value="${i}">${i}</option>`;
+        if ((occupied >> BigInt(i - 1)) & 1n) {
+            continue;
+        }
+        options += `<option value="${i}">${i}</option>`;
+    }
+    select.innerHTML = options;
+}
+
+async function refreshSeatMap() {
+    const departure = document.getElementById('departure').value;
+    const destination = document.getElementById('destination').value;
+    const date = document.getElementById('date').value;
+    const time = document.getElementById('time').value;
+    
+    if (!departure || !destination || !date || !time) {
+        populateSeatSelect();
+        return;
+    }
+    
+    try {
+        const journey = [departure, destination, date, time].map(encodeURIComponent).join('/');
+        const response = await fetch(`${API_BASE}/journeys/${journey}/seats`);
+        
+        if (response.ok) {
+            const data = await response.json();
+            populateSeatSelect(BigInt(`0x${data.occupied_bitmap}`));
+        } else {
+            populateSeatSelect();
+        }
+    } catch (error) {
+        populateSeatSelect();
     }
 }
 
@@ -146,10 +179,14 @@ async function handleBooking(e) {
             const booking = await response.json();
             showBookingReceipt(booking);
             e.target.reset();
+            populateSeatSelect();
             document.getElementById('fareDisplay').textContent = 'Fare: $0';
         } else {
             const error = await response.json();
             showError(error.error || 'Booking failed');
+            if (response.status === 409) {
+                refreshSeatMap();
+            }
         }
     } catch (error) {
         showError('Failed to process booking');
@@ -409,62 +446,122 @@ async function loadAdminStats() {
     }
 }
 
-async function loadAllBookings() {
+const ADMIN_PAGE_SIZE = 100;
+let bookingsCursor = null;
+
+async function loadAllBookings(append = false) {
     try {
-        const response = await fetch(`${API_BASE}/admin/bookings`);
-        const bookings = await response.json();
+        let url = `${API_BASE}/admin/bookings?limit=${ADMIN_PAGE_SIZE}`;
+        if (append && bookingsCursor) {
+            url += `&cursor=${encodeURIComponent(bookingsCursor)}`;
+        }
+        const response = await fetch(url);
+        const page = await response.json();
+        bookingsCursor = page.next_cursor;
         
-        let html = `
-            <table>
-                <thead>
-                    <tr>
-                        <th>Ticket ID</th>
-                        <th>Name</th>
-                        <th>Phone</th>
-                        <th>Route</th>
-                        <th>Date</th>
-                        <th>Seat</th>
-                        <th>Fare</th>
-                        <th>Status</th>
-                        <th>Actions</th>
-                    </tr>
-                </thead>
-                <tbody>
-        `;
+        const rows = page.bookings.map(renderBookingRow).join('');
         
-        if (bookings.length === 0) {
-            html += '<tr><td colspan="9" style="text-align:center">No bookings found</td></tr>';
+        if (append) {
+            document.getElementById('bookingsTableBody').insertAdjacentHTML('beforeend', rows);
         } else {
-            bookings.forEach(booking => {
-                const statusClass = booking.status === 'confirmed' ? 'status-confirmed' : 'status-cancelled';
-                html += `
-                    <tr>
-                        <td>${booking.ticket_id}</td>
-                        <td>${booking.name}</td>
-                        <td>${booking.phone}</td>
-                        <td>${booking.departure} → ${booking.destination}</td>
-                        <td>${booking.date}</td>
-                        <td>${booking.seat}</td>
-                        <td>$${booking.fare}</td>
-                        <td><span class="${statusClass}">${booking.status}</span></td>
-                        <td>
-                            <button class="action-btn action-btn-primary" onclick='viewBookingDetails(${JSON.stringify(booking)})'>View</button>
-                            ${booking.status === 'confirmed' ? 
-                                `<button class="action-btn action-btn-danger" onclick="adminCancelBooking('${booking.ticket_id}')">Cancel</button>` : 
-                                ''}
-                        </td>
-                    </tr>
-                `;
-            });
+            let html = `
+                <table>
+                    <thead>
+                        <tr>
+                            <th>Ticket ID</th>
+                            <th>Name</th>
+                            <th>Phone</th>
+                            <th>Route</th>
+                            <th>Date</th>
+                            <th>Seat</th>
+                            <th>Fare</th>
+                            <th>Status</th>
+                            <th>Actions</th>
+                        </tr>
+                    </thead>
+                    <tbody id="bookingsTableBody">
+            `;
+            
+            if (page.bookings.length === 0) {
+                html += '<tr><td colspan="9" style="text-align:center">No bookings found</td></tr>';
+            } else {
+                html += rows;
+            }
+            
+            html += `</tbody></table>
+                <button id="loadMoreBookings" class="action-btn action-btn-primary" onclick="loadAllBookings(true)">Load More</button>`;
+            document.getElementById('bookingsTable').innerHTML = html;
         }
         
-        html += `</tbody></table>`;
-        document.getElementById('bookingsTable').innerHTML = html;
+        document.getElementById('loadMoreBookings').style.display = bookingsCursor ? 'inline-block' : 'none';
     } catch (error) {
         showError('Failed to load bookings');
     }
 }
 
+async function searchBookings() {
+    const field = document.getElementById('bookingSearchField').value;
+    const term = document.getElementById('bookingSearchTerm').value.trim();
+    
+    if (!term) {
+        showError('Please enter a search term');
+        return;
+    }
+    
+    const params = new URLSearchParams();
+    if (field === 'date') {
+        params.set('date_from', term);
+        params.set('date_to', term);
+    } else {
+        params.set(field, term);
+    }
+    
+    try {
+        const response = await fetch(`${API_BASE}/admin/bookings/search?${params}`);
+        const results = await response.json();
+        
+        if (!response.ok) {
+            showError(results.error || 'Search failed');
+            return;
+        }
+        
+        const body = document.getElementById('bookingsTableBody');
+        body.innerHTML = results.length === 0 ?
+            '<tr><td colspan="9" style="text-align:center">No bookings found</td></tr>' :
+            results.map(renderBookingRow).join('');
+        document.getElementById('loadMoreBookings').style.display = 'none';
+    } catch (error) {
+        showError('Search failed');
+    }
+}
+
+function clearBookingSearch() {
+    document.getElementById('bookingSearchTerm').value = '';
+    loadAllBookings();
+}
+
+function renderBookingRow(booking) {
+    const statusClass = booking.status === 'confirmed' ? 'status-confirmed' : 'status-cancelled';
+    return `
+        <tr>
+            <td>${booking.ticket_id}</td>
+            <td>${booking.name}</td>
+            <td>${booking.phone}</td>
+            <td>${booking.departure} → ${booking.destination}</td>
+            <td>${booking.date}</td>
+            <td>${booking.seat}</td>
+            <td>$${booking.fare}</td>
+            <td><span class="${statusClass}">${booking.status}</span></td>
+            <td>
+                <button class="action-btn action-btn-primary" onclick='viewBookingDetails(${JSON.stringify(booking)})'>View</button>
+                ${booking.status === 'confirmed' ? 
+                    `<button class="action-btn action-btn-danger" onclick="adminCancelBooking('${booking.ticket_id}')">Cancel</button>` : 
+                    ''}
+            </td>
+        </tr>
+    `;
+}
+
 function viewBookingDetails(booking) {
     const statusClass = booking.status === 'confirmed' ? 'status-confirmed' : 'status-cancelled';
     const html = `
@@ -0,0 +1,40 @@
+import importlib
+import os
+import sys
+import threading
+
+import pytest
+
+# The modules under test live at the repository root and in api/
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'api'))
+
+from sqlite_manager import SQLiteDatabaseManager
+
+@pytest.fixture
+def sqlite_db(tmp_path, monkeypatch):
+    """A fresh SQLite database behind SQLiteDatabaseManager; yields its path"""
+    monkeypatch.setattr(SQLiteDatabaseManager, '_db_path', None)
+    monkeypatch.setattr(SQLiteDatabaseManager, '_local', threading.local())
+    path = str(tmp_path / 'bookings.db')
+    SQLiteDatabaseManager.initialize_pool(path)
+    yield path
+    SQLiteDatabaseManager._local.conn.close()
+
+@pytest.fixture
+def load_api(monkeypatch):
+    """Import a fresh api/index.py under the given environment, rate limits off; returns the module
+
+    Without SQLITE_PATH the app uses its in-memory stores.
+    """
+    def load(**env):
+        for name in ('POSTGRES_URL', 'DATABASE_URL', 'SQLITE_PATH'):
+            monkeypatch.delenv(name, raising=False)
+        monkeypatch.setenv('RATE_LIMIT_BOOKINGS', '0')
+        monkeypatch.setenv('RATE_LIMIT_LOOKUPS', '0')
+        for name, value in env.items():
+            monkeypatch.setenv(name, value)
+        monkeypatch.delitem(sys.modules, 'index', raising=False)
+        return importlib.import_module('index')
+    return load
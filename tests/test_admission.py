@@ -0,0 +1,79 @@
+import threading
+import types
+
+import pytest
+
+import admission
+from admission import ConcurrencyLimiter, TokenBucketLimiter
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A manual clock for admission.py; advance it by assigning clock.now"""
+    clock = types.SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(admission, 'time', types.SimpleNamespace(monotonic=lambda: clock.now))
+    return clock
+
+def test_bucket_allows_a_burst_then_refills_at_the_rate(clock):
+    limiter = TokenBucketLimiter(rate=2, burst=3)
+    assert [limiter.acquire('client') for _ in range(3)] == [0, 0, 0]
+    assert limiter.acquire('client') == pytest.approx(0.5)
+    clock.now += 0.5
+    assert limiter.acquire('client') == 0
+    clock.now += 60
+    assert [limiter.acquire('client') for _ in range(4)][-1] > 0
+
+def test_buckets_are_per_key(clock):
+    limiter = TokenBucketLimiter(rate=1, burst=1)
+    assert limiter.acquire('first') == 0
+    assert limiter.acquire('first') > 0
+    assert limiter.acquire('second') == 0
+
+def test_least_recently_used_keys_are_dropped_with_a_full_bucket(clock):
+    limiter = TokenBucketLimiter(rate=1, burst=1, max_keys=2)
+    for key in ('a', 'b', 'c'):
+        limiter.acquire(key)
+    assert limiter.acquire('c') > 0
+    assert limiter.acquire('a') == 0
+
+def test_invalid_limits_are_rejected():
+    with pytest.raises(ValueError):
+        TokenBucketLimiter(rate=0, burst=1)
+    with pytest.raises(ValueError):
+        ConcurrencyLimiter(limit=0)
+
+def test_concurrency_limiter_sheds_beyond_the_queue():
+    limiter = ConcurrencyLimiter(limit=1, queue_timeout=5, max_queue=0)
+    assert limiter.acquire()
+    assert not limiter.acquire()
+    limiter.release()
+    assert limiter.acquire()
+    assert limiter.stats() == {'limit': 1, 'active': 1, 'waiting': 0, 'admitted': 2, 'rejected': 1}
+
+def test_queued_request_times_out():
+    limiter = ConcurrencyLimiter(limit=1, queue_timeout=0.05, max_queue=1)
+    limiter.acquire()
+    assert not limiter.acquire()
+    assert limiter.retry_after() == 1
+
+def test_queued_request_gets_the_released_slot():
+    limiter = ConcurrencyLimiter(limit=1, queue_timeout=5, max_queue=1)
+    limiter.acquire()
+    admitted = []
+    waiter = threading.Thread(target=lambda: admitted.append(limiter.acquire()))
+    waiter.start()
+    while limiter.stats()['waiting'] == 0:
+        pass
+    limiter.release()
+    waiter.join()
+    assert admitted == [True]
+    assert limiter.stats()['active'] == 1
+
+def test_booking_rate_limit_answers_429(load_api):
+    client = load_api(RATE_LIMIT_BOOKINGS='2').app.test_client()
+    body = {'name': 'Tendai', 'age': 30, 'phone': '0771000000', 'departure': 'Bulawayo',
+            'destination': 'Harare', 'date': '2099-01-01', 'time': '08:00 AM'}
+    assert client.post('/api/bookings', json=dict(body, seat=1)).status_code == 201
+    limited = client.post('/api/bookings', json=dict(body, seat=2))
+    assert limited.status_code == 429
+    assert int(limited.headers['Retry-After']) >= 1
+    assert client.get('/api/config').status_code == 200
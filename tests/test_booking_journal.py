@@ -0,0 +1,67 @@
+import json
+
+from booking_journal import BookingJournal
+
+def open_journal(tmp_path, compact_every=1000):
+    return BookingJournal(str(tmp_path / 'bookings.json'), str(tmp_path / 'bookings.journal'), compact_every)
+
+def booking(ticket_id, status='confirmed'):
+    return {'ticket_id': ticket_id, 'seat': 1, 'status': status}
+
+def test_appends_are_replayed_on_the_next_load(tmp_path):
+    journal = open_journal(tmp_path)
+    assert journal.load() == {}
+    journal.append(booking('A'))
+    journal.append(booking('B'))
+    journal.append(booking('A', 'cancelled'))
+    journal.close()
+
+    reopened = open_journal(tmp_path)
+    assert reopened.load() == {'A': booking('A', 'cancelled'), 'B': booking('B')}
+    reopened.close()
+
+def test_load_folds_the_journal_into_the_snapshot(tmp_path):
+    journal = open_journal(tmp_path)
+    journal.load()
+    journal.append(booking('A'))
+    journal.close()
+
+    open_journal(tmp_path).load()
+    with open(tmp_path / 'bookings.json') as f:
+        assert json.load(f) == {'A': booking('A')}
+    assert (tmp_path / 'bookings.journal').read_text() == ''
+
+def test_partial_last_line_is_dropped(tmp_path):
+    with open(tmp_path / 'bookings.journal', 'w') as f:
+        f.write(json.dumps(booking('A')) + '\n' + '{"ticket_id": "B", "se')
+
+    journal = open_journal(tmp_path)
+    assert journal.load() == {'A': booking('A')}
+    journal.append(booking('C'))
+    journal.close()
+    assert open_journal(tmp_path).load() == {'A': booking('A'), 'C': booking('C')}
+
+def test_interrupted_compaction_is_replayed_before_the_journal(tmp_path):
+    with open(tmp_path / 'bookings.json', 'w') as f:
+        json.dump({'A': booking('A')}, f)
+    with open(tmp_path / 'bookings.journal.compacting', 'w') as f:
+        f.write(json.dumps(booking('B')) + '\n' + json.dumps(booking('A', 'cancelled')) + '\n')
+    with open(tmp_path / 'bookings.journal', 'w') as f:
+        f.write(json.dumps(booking('B', 'cancelled')) + '\n')
+
+    journal = open_journal(tmp_path)
+    assert journal.load() == {'A': booking('A', 'cancelled'), 'B': booking('B', 'cancelled')}
+    journal.close()
+    assert not (tmp_path / 'bookings.journal.compacting').exists()
+
+def test_compaction_after_compact_every_records(tmp_path):
+    journal = open_journal(tmp_path, compact_every=3)
+    bookings = journal.load()
+    for ticket_id in 'ABCD':
+        bookings[ticket_id] = booking(ticket_id)
+        journal.append(bookings[ticket_id])
+    journal.close()
+
+    with open(tmp_path / 'bookings.json') as f:
+        assert set(json.load(f)) == {'A', 'B', 'C'}
+    assert open_journal(tmp_path).load() == {ticket_id: booking(ticket_id) for ticket_id in 'ABCD'}
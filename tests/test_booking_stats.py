@@ -0,0 +1,55 @@
+import datetime
+
+from booking_stats import BookingStats
+from sqlite_manager import SQLiteDatabaseManager
+from ticket_ids import TicketIdGenerator
+
+_ticket_ids = TicketIdGenerator()
+
+def booking(route, fare, status='confirmed'):
+    departure, destination = route.split(' to ')
+    return {'ticket_id': _ticket_ids.generate(), 'name': 'Tendai', 'age': 30, 'phone': '0771000000',
+            'departure': departure, 'destination': destination, 'date': '2030-01-01', 'time': '08:00 AM',
+            'seat': 1, 'fare': fare, 'status': status}
+
+def test_from_bookings_counts_by_status():
+    bookings = [booking('Bulawayo to Harare', 15), booking('Bulawayo to Gweru', 5),
+                booking('Bulawayo to Harare', 15, 'cancelled')]
+    stats = BookingStats.from_bookings({b['ticket_id']: b for b in bookings})
+    assert stats.summary() == {'total_bookings': 3, 'confirmed': 2, 'cancelled': 1, 'total_revenue': 20}
+    assert stats.top_routes() == [('Bulawayo to Harare', 1), ('Bulawayo to Gweru', 1)]
+
+def test_change_status_moves_the_booking_and_its_revenue():
+    stats = BookingStats()
+    first, second = booking('Bulawayo to Harare', 15), booking('Bulawayo to Harare', 15)
+    stats.record(first)
+    stats.record(second)
+    stats.change_status(first, 'confirmed', 'cancelled')
+    assert stats.summary() == {'total_bookings': 2, 'confirmed': 1, 'cancelled': 1, 'total_revenue': 15}
+    stats.change_status(second, 'confirmed', 'cancelled')
+    assert stats.top_routes() == []
+
+def test_empty_stats():
+    assert BookingStats().summary() == {'total_bookings': 0, 'confirmed': 0, 'cancelled': 0, 'total_revenue': 0}
+
+def test_sqlite_rollup_follows_bookings_and_cancellations(sqlite_db):
+    first, second = booking('Bulawayo to Harare', 15), dict(booking('Bulawayo to Gweru', 5), seat=2)
+    SQLiteDatabaseManager.reserve_seat(first)
+    SQLiteDatabaseManager.reserve_seat(second)
+    SQLiteDatabaseManager.cancel_booking(second['ticket_id'])
+    stats = SQLiteDatabaseManager.get_booking_stats()
+    assert (stats['total_bookings'], stats['confirmed'], stats['cancelled']) == (2, 1, 1)
+    assert float(stats['total_revenue']) == 15
+    assert [(row['route'], row['count']) for row in SQLiteDatabaseManager.get_top_routes(5)] == [('Bulawayo to Harare', 1)]
+
+def test_admin_stats_endpoint_tracks_cancellations(load_api):
+    client = load_api().app.test_client()
+    date = (datetime.date.today() + datetime.timedelta(days=5)).isoformat()
+    tickets = [client.post('/api/bookings', json={'name': 'Tendai', 'age': 30, 'phone': '0771000000',
+                                                  'departure': 'Bulawayo', 'destination': 'Harare',
+                                                  'date': date, 'time': '08:00 AM', 'seat': seat}).get_json()['ticket_id']
+               for seat in (1, 2)]
+    client.delete(f'/api/bookings/{tickets[0]}')
+    stats = client.get('/api/admin/stats').get_json()
+    assert (stats['total_bookings'], stats['confirmed'], stats['cancelled']) == (2, 1, 1)
+    assert stats['top_routes'] == [{'route': 'Bulawayo to Harare', 'count': 1}]
@@ -0,0 +1,50 @@
+import base64
+import datetime
+import json
+
+import pytest
+
+from api_shared import decode_cursor, encode_cursor
+
+def raw_cursor(value):
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode()
+
+def test_cursor_round_trip():
+    booked_at = datetime.datetime(2030, 1, 1, 8, 30, 15, 123456)
+    assert decode_cursor(encode_cursor(booked_at, 42), int) == (booked_at.isoformat(), 42)
+    assert decode_cursor(encode_cursor('2030-01-01T08:30:15', 'ABC'), str) == ('2030-01-01T08:30:15', 'ABC')
+
+@pytest.mark.parametrize('value', [
+    [1, 2],
+    ['not a date', 1],
+    ['2030-01-01T00:00:00', 'ABC'],
+    ['2030-01-01T00:00:00', True],
+    ['2030-01-01T00:00:00'],
+    ['2030-01-01T00:00:00', 1, 2],
+    {'booked_at': '2030-01-01T00:00:00', 'id': 1},
+    'cursor',
+])
+def test_malformed_cursors_are_rejected(value):
+    with pytest.raises(ValueError):
+        decode_cursor(raw_cursor(value), int)
+
+def test_garbage_is_rejected():
+    with pytest.raises(ValueError):
+        decode_cursor('not base64 json', int)
+
+def test_admin_pagination_walks_every_booking_and_rejects_bad_cursors(load_api):
+    client = load_api().app.test_client()
+    date = (datetime.date.today() + datetime.timedelta(days=5)).isoformat()
+    for seat in (1, 2, 3):
+        client.post('/api/bookings', json={'name': 'Tendai', 'age': 30, 'phone': '0771000000',
+                                           'departure': 'Bulawayo', 'destination': 'Gweru',
+                                           'date': date, 'time': '08:00 AM', 'seat': seat})
+
+    first = client.get('/api/admin/bookings?limit=2').get_json()
+    rest = client.get(f"/api/admin/bookings?limit=2&cursor={first['next_cursor']}").get_json()
+    seats = [booking['seat'] for booking in first['bookings'] + rest['bookings']]
+    assert sorted(seats) == [1, 2, 3]
+    assert rest['next_cursor'] is None
+
+    for value in ([1, 2], ['2030-01-01T00:00:00', 1], {'a': 1}):
+        assert client.get(f'/api/admin/bookings?limit=2&cursor={raw_cursor(value)}').status_code == 400
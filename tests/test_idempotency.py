@@ -0,0 +1,69 @@
+import time
+
+import pytest
+
+from idempotency_store import IdempotencyStore
+
+BOOKING = {'name': 'Tendai', 'age': 30, 'phone': '0771000000', 'departure': 'Bulawayo',
+           'destination': 'Harare', 'date': '2099-01-01', 'time': '08:00 AM', 'seat': 1}
+
+def test_claim_complete_and_replay():
+    store = IdempotencyStore()
+    assert store.claim('key', 'hash', 'token', ttl=60, lock_timeout=60) is None
+    assert store.claim('key', 'hash', 'other', ttl=60, lock_timeout=60) == \
+        {'request_hash': 'hash', 'status_code': None, 'response_body': None}
+    assert store.complete('key', 'hash', 'token', 201, '{"ok": true}')
+    assert store.claim('key', 'hash', 'other', ttl=60, lock_timeout=60) == \
+        {'request_hash': 'hash', 'status_code': 201, 'response_body': '{"ok": true}'}
+
+def test_release_lets_the_request_run_again():
+    store = IdempotencyStore()
+    store.claim('key', 'hash', 'token', ttl=60, lock_timeout=60)
+    assert store.release('key', 'hash', 'token')
+    assert store.claim('key', 'hash', 'again', ttl=60, lock_timeout=60) is None
+
+def test_stale_claim_is_taken_over_and_the_old_owner_is_locked_out():
+    store = IdempotencyStore()
+    store.claim('key', 'hash', 'first', ttl=60, lock_timeout=0)
+    time.sleep(0.01)
+    assert store.claim('key', 'hash', 'second', ttl=60, lock_timeout=0) is None
+    assert not store.complete('key', 'hash', 'first', 201, '{}')
+    assert not store.release('key', 'hash', 'first')
+    assert store.complete('key', 'hash', 'second', 201, '{}')
+
+def test_keys_expire_and_the_oldest_are_evicted():
+    store = IdempotencyStore(max_keys=2)
+    store.claim('short', 'hash', 'token', ttl=0.01, lock_timeout=60)
+    time.sleep(0.02)
+    assert store.claim('short', 'hash', 'again', ttl=60, lock_timeout=60) is None
+    store.claim('second', 'hash', 'token', ttl=60, lock_timeout=60)
+    store.claim('third', 'hash', 'token', ttl=60, lock_timeout=60)
+    assert store.claim('short', 'hash', 'token', ttl=60, lock_timeout=60) is None
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def client(request, load_api):
+    if request.param == 'sqlite':
+        return load_api(SQLITE_PATH=request.getfixturevalue('sqlite_db'), TRUSTED_PROXY_HOPS='1').app.test_client()
+    return load_api(TRUSTED_PROXY_HOPS='1').app.test_client()
+
+def test_repeated_booking_is_replayed(client):
+    headers = {'Idempotency-Key': 'booking-1'}
+    first = client.post('/api/bookings', json=BOOKING, headers=headers)
+    repeat = client.post('/api/bookings', json=BOOKING, headers=headers)
+    assert first.status_code == repeat.status_code == 201
+    assert repeat.headers['Idempotent-Replayed'] == 'true'
+    assert repeat.get_json() == first.get_json()
+    assert len(client.get('/api/admin/bookings').get_json()) == 1
+
+def test_key_reused_for_a_different_request_is_refused(client):
+    headers = {'Idempotency-Key': 'booking-1'}
+    client.post('/api/bookings', json=BOOKING, headers=headers)
+    assert client.post('/api/bookings', json=dict(BOOKING, seat=2), headers=headers).status_code == 422
+
+def test_keys_are_scoped_to_the_client(client):
+    first = client.post('/api/bookings', json=BOOKING,
+                        headers={'Idempotency-Key': 'shared', 'X-Forwarded-For': '198.51.100.1'})
+    other = client.post('/api/bookings', json=dict(BOOKING, seat=2),
+                        headers={'Idempotency-Key': 'shared', 'X-Forwarded-For': '198.51.100.2'})
+    assert first.status_code == other.status_code == 201
+    assert 'Idempotent-Replayed' not in other.headers
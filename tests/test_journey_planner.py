@@ -0,0 +1,59 @@
+from api_shared import default_config
+from journey_planner import JourneyPlanner
+
+ROUTES = {"A to B": 1, "B to C": 1, "A to C": 5}
+
+def plan(schedules, durations, min_connection=30, objective='cheapest'):
+    planner = JourneyPlanner(ROUTES, schedules, durations, min_connection)
+    return [(leg['departure'], leg['day_offset']) for leg in planner.plan('A', 'C', objective)['legs']]
+
+def test_connection_that_fits_stays_on_the_same_day():
+    schedules = {"A to B": "08:00 AM", "B to C": "10:00 AM"}
+    assert plan(schedules, {"A to B": 60, "B to C": 60}) == [('A', 0), ('B', 0)]
+
+def test_connection_shorter_than_the_trip_moves_to_the_next_day():
+    # Departs after the first leg does, but before it arrives
+    schedules = {"A to B": "11:00 AM", "B to C": "11:45 AM"}
+    assert plan(schedules, {"A to B": 280, "B to C": 55}) == [('A', 0), ('B', 1)]
+
+def test_minimum_connection_time_is_respected():
+    schedules = {"A to B": "08:00 AM", "B to C": "09:15 AM"}
+    durations = {"A to B": 60, "B to C": 60}
+    assert plan(schedules, durations, min_connection=15) == [('A', 0), ('B', 0)]
+    assert plan(schedules, durations, min_connection=16) == [('A', 0), ('B', 1)]
+
+def test_earlier_departure_moves_to_the_next_day():
+    schedules = {"A to B": "02:00 PM", "B to C": "09:00 AM"}
+    assert plan(schedules, {"A to B": 60, "B to C": 60}) == [('A', 0), ('B', 1)]
+
+def test_overnight_trip_can_push_a_connection_two_days():
+    schedules = {"A to B": "10:00 PM", "B to C": "09:00 PM"}
+    assert plan(schedules, {"A to B": 24 * 60, "B to C": 60}) == [('A', 0), ('B', 2)]
+
+def test_unknown_duration_moves_the_next_leg_to_the_next_day():
+    schedules = {"A to B": "08:00 AM", "B to C": "11:00 PM"}
+    assert plan(schedules, {}) == [('A', 0), ('B', 1)]
+
+def test_default_config_has_no_impossible_connections():
+    config = default_config()
+    planner = JourneyPlanner(config['bus_routes'], config['bus_schedules'], config['route_durations'], 30)
+    legs = planner.plan('Bulawayo', 'Norton', 'cheapest')['legs']
+    assert [(leg['departure'], leg['time'], leg['day_offset']) for leg in legs] == [
+        ('Bulawayo', '11:00 AM', 0), ('Chegutu', '11:45 AM', 1)
+    ]
+    for objective in JourneyPlanner.OBJECTIVES:
+        for departure in planner.cities:
+            for destination in planner.cities:
+                itinerary = planner.plan(departure, destination, objective)
+                if itinerary is None:
+                    continue
+                for previous, leg in zip(itinerary['legs'], itinerary['legs'][1:]):
+                    route = f"{previous['departure']} to {previous['destination']}"
+                    leaves = _minutes(previous['time']) + 24 * 60 * previous['day_offset']
+                    ready = leaves + config['route_durations'][route] + 30
+                    assert _minutes(leg['time']) + 24 * 60 * leg['day_offset'] >= ready
+
+def _minutes(time):
+    hours, rest = time.split(':')
+    minutes, period = rest.split()
+    return (int(hours) % 12 + (12 if period == 'PM' else 0)) * 60 + int(minutes)
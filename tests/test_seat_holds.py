@@ -0,0 +1,101 @@
+import types
+
+import pytest
+
+import seat_holds
+from seat_holds import SeatHolds
+from seat_inventory import SeatInventory
+from sqlite_manager import SQLiteDatabaseManager
+
+JOURNEY = ('Bulawayo', 'Harare', '2099-01-01', '08:00 AM')
+BOOKING = {'name': 'Tendai', 'age': 30, 'phone': '0771000000', 'departure': 'Bulawayo',
+           'destination': 'Harare', 'date': '2099-01-01', 'time': '08:00 AM'}
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A manual clock for seat_holds.py; advance it by assigning clock.now"""
+    clock = types.SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(seat_holds, 'time', types.SimpleNamespace(monotonic=lambda: clock.now))
+    return clock
+
+def test_hold_takes_the_seat_until_it_expires(clock):
+    inventory = SeatInventory(50)
+    holds = SeatHolds(inventory)
+    assert holds.place(JOURNEY, 1, ttl=60) is not None
+    assert holds.place(JOURNEY, 1, ttl=60) is None
+    assert not inventory.is_available(JOURNEY, 1)
+    assert holds.held_bitmap(JOURNEY) == 0b1
+
+    clock.now += 59
+    assert holds.expire() == 0
+    clock.now += 1
+    assert holds.expire() == 1
+    assert inventory.is_available(JOURNEY, 1)
+    assert holds.held_bitmap(JOURNEY) == 0
+
+def test_consumed_hold_keeps_its_seat_booked(clock):
+    inventory = SeatInventory(50)
+    holds = SeatHolds(inventory)
+    hold_id = holds.place(JOURNEY, 1, ttl=60)
+    assert not holds.consume(hold_id, JOURNEY, 2)
+    assert holds.consume(hold_id, JOURNEY, 1)
+    assert not holds.consume(hold_id, JOURNEY, 1)
+    clock.now += 120
+    assert holds.expire() == 0
+    assert not inventory.is_available(JOURNEY, 1)
+
+def test_expired_hold_cannot_be_consumed(clock):
+    holds = SeatHolds(SeatInventory(50))
+    hold_id = holds.place(JOURNEY, 1, ttl=60)
+    clock.now += 60
+    assert not holds.consume(hold_id, JOURNEY, 1)
+
+def test_freed_seat_is_offered_to_hand_over_first(clock):
+    inventory = SeatInventory(50)
+    handed = []
+    holds = SeatHolds(inventory, hand_over=lambda journey, seat: handed.append((journey, seat)) or seat == 1)
+    first, second = holds.place(JOURNEY, 1, ttl=60), holds.place(JOURNEY, 2, ttl=60)
+    assert holds.release(first)
+    assert not holds.release(first)
+    clock.now += 60
+    holds.expire()
+    assert handed == [(JOURNEY, 1), (JOURNEY, 2)]
+    assert inventory.occupied_seats(JOURNEY) == [1]
+    assert holds.held_bitmap(JOURNEY) == 0
+    assert not holds.release(second)
+
+def expire_holds():
+    SQLiteDatabaseManager.execute_query(
+        'test', "UPDATE seat_holds SET expires_at = strftime('%Y-%m-%dT%H:%M:%f', 'now', '-1 seconds')", fetch=False)
+
+def test_sqlite_expired_hold_only_blocks_while_someone_waits(sqlite_db):
+    assert SQLiteDatabaseManager.place_seat_hold('hold', *JOURNEY, 1, 600)
+    assert not SQLiteDatabaseManager.check_seat_availability(*JOURNEY, 1)
+    expire_holds()
+    assert SQLiteDatabaseManager.check_seat_availability(*JOURNEY, 1)
+
+    assert SQLiteDatabaseManager.join_waitlist(dict(BOOKING, waitlist_id='waiting', fare=15), 1) is None
+    assert SQLiteDatabaseManager.place_seat_hold('again', *JOURNEY, 1, 600)
+    assert SQLiteDatabaseManager.join_waitlist(dict(BOOKING, waitlist_id='waiting', fare=15), 1) == 1
+    expire_holds()
+    assert SQLiteDatabaseManager.get_held_seats(*JOURNEY) == [1]
+    assert SQLiteDatabaseManager.release_expired_seat_holds(lambda: 'PROMOTED') == 1
+    assert SQLiteDatabaseManager.get_held_seats(*JOURNEY) == []
+    assert SQLiteDatabaseManager.get_booking('PROMOTED')['seat'] == 1
+
+def test_booking_a_held_seat_needs_its_hold_id(sqlite_db, load_api):
+    client = load_api(SQLITE_PATH=sqlite_db).app.test_client()
+    hold = client.post('/api/holds', json=dict(BOOKING, seat=1)).get_json()
+    assert client.post('/api/bookings', json=dict(BOOKING, seat=1)).status_code == 409
+    assert client.post('/api/bookings', json=dict(BOOKING, seat=1, hold_id='someone-else')).status_code == 409
+    assert client.post('/api/bookings', json=dict(BOOKING, seat=1, hold_id=hold['hold_id'])).status_code == 201
+
+def test_seat_map_sweeps_expired_holds_for_the_waitlist(sqlite_db, load_api):
+    client = load_api(SQLITE_PATH=sqlite_db).app.test_client()
+    SQLiteDatabaseManager.place_seat_hold('hold', *JOURNEY, 1, 600)
+    SQLiteDatabaseManager.join_waitlist(dict(BOOKING, waitlist_id='waiting', fare=15), 1)
+    expire_holds()
+
+    seats = client.get('/api/journeys/Bulawayo/Harare/2099-01-01/08:00 AM/seats').get_json()
+    assert (seats['occupied_bitmap'], seats['held_bitmap']) == ('1', '0')
+    assert SQLiteDatabaseManager.get_waitlist_entry('waiting')['status'] == 'promoted'
@@ -0,0 +1,44 @@
+from seat_inventory import SeatInventory
+
+JOURNEY = ('Bulawayo', 'Harare', '2030-01-01', '08:00 AM')
+
+def test_reserve_and_release_flip_the_seat_bit():
+    inventory = SeatInventory(50)
+    assert inventory.reserve(JOURNEY, 3)
+    assert not inventory.reserve(JOURNEY, 3)
+    assert not inventory.is_available(JOURNEY, 3)
+    assert inventory.occupied_bitmap(JOURNEY) == 0b100
+    inventory.release(JOURNEY, 3)
+    assert inventory.is_available(JOURNEY, 3)
+    assert inventory.occupied_bitmap(JOURNEY) == 0
+
+def test_journeys_are_independent():
+    inventory = SeatInventory(50)
+    inventory.reserve(JOURNEY, 1)
+    assert inventory.is_available(JOURNEY[:3] + ('02:00 PM',), 1)
+
+def test_from_bookings_skips_cancelled_bookings():
+    bookings = {
+        'A': {'departure': 'Bulawayo', 'destination': 'Harare', 'date': '2030-01-01', 'time': '08:00 AM',
+              'seat': 1, 'status': 'confirmed'},
+        'B': {'departure': 'Bulawayo', 'destination': 'Harare', 'date': '2030-01-01', 'time': '08:00 AM',
+              'seat': '4', 'status': 'confirmed'},
+        'C': {'departure': 'Bulawayo', 'destination': 'Harare', 'date': '2030-01-01', 'time': '08:00 AM',
+              'seat': 2, 'status': 'cancelled'},
+    }
+    assert SeatInventory.from_bookings(bookings, 50).occupied_seats(JOURNEY) == [1, 4]
+
+def test_first_free_finds_the_lowest_gap_and_none_when_full():
+    inventory = SeatInventory(3)
+    assert inventory.first_free(JOURNEY) == 1
+    inventory.reserve(JOURNEY, 1)
+    inventory.reserve(JOURNEY, 3)
+    assert inventory.first_free(JOURNEY) == 2
+    inventory.reserve(JOURNEY, 2)
+    assert inventory.first_free(JOURNEY) is None
+
+def test_high_seat_numbers_fit_in_the_bitmap():
+    inventory = SeatInventory(100)
+    assert inventory.reserve(JOURNEY, 100)
+    assert inventory.occupied_seats(JOURNEY) == [100]
+    assert inventory.first_free(JOURNEY) == 1
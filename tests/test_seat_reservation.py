@@ -0,0 +1,81 @@
+import sqlite3
+import threading
+
+from sqlite_manager import SQLiteDatabaseManager
+from ticket_ids import TicketIdGenerator
+
+_ticket_ids = TicketIdGenerator()
+
+def booking(seat, **changes):
+    booking = {
+        'ticket_id': _ticket_ids.generate(), 'name': 'Tendai', 'age': 30, 'phone': '0771000000', 'email': '',
+        'departure': 'Bulawayo', 'destination': 'Harare', 'date': '2030-01-01', 'time': '08:00 AM',
+        'seat': seat, 'fare': 15, 'status': 'confirmed'
+    }
+    booking.update(changes)
+    return booking
+
+def test_second_booking_for_a_seat_is_refused(sqlite_db):
+    first = booking(1)
+    assert SQLiteDatabaseManager.reserve_seat(first)['ticket_id'] == first['ticket_id']
+    assert SQLiteDatabaseManager.reserve_seat(booking(1)) is None
+    assert SQLiteDatabaseManager.reserve_seat(booking(1, time='02:00 PM')) is not None
+
+def test_cancelled_seat_can_be_booked_again(sqlite_db):
+    first = booking(1)
+    SQLiteDatabaseManager.reserve_seat(first)
+    assert SQLiteDatabaseManager.cancel_booking(first['ticket_id'])
+    assert SQLiteDatabaseManager.reserve_seat(booking(1)) is not None
+
+def test_group_booking_is_all_or_nothing(sqlite_db):
+    SQLiteDatabaseManager.reserve_seat(booking(2))
+    assert SQLiteDatabaseManager.reserve_seats([booking(1), booking(2), booking(3)]) is None
+    assert SQLiteDatabaseManager.get_occupied_seats('Bulawayo', 'Harare', '2030-01-01', '08:00 AM') == [2]
+    assert len(SQLiteDatabaseManager.reserve_seats([booking(1), booking(3)])) == 2
+
+def test_concurrent_bookings_for_one_seat_confirm_exactly_one(sqlite_db):
+    results = []
+    barrier = threading.Barrier(8)
+
+    def reserve():
+        barrier.wait()
+        results.append(SQLiteDatabaseManager.reserve_seat(booking(5)))
+        SQLiteDatabaseManager._local.conn.close()
+
+    threads = [threading.Thread(target=reserve) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sum(result is not None for result in results) == 1
+
+def test_schema_cancels_double_booked_seats_before_adding_the_index(tmp_path, monkeypatch):
+    path = str(tmp_path / 'old.db')
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE bookings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, ticket_id TEXT UNIQUE NOT NULL, name TEXT NOT NULL,
+            age INTEGER NOT NULL, phone TEXT NOT NULL, email TEXT, departure TEXT NOT NULL,
+            destination TEXT NOT NULL, date TEXT NOT NULL, time TEXT NOT NULL, seat INTEGER NOT NULL,
+            fare REAL NOT NULL, status TEXT DEFAULT 'confirmed', booked_at TEXT, updated_at TEXT
+        )
+    """)
+    for ticket_id, seat in (('OLDEST', 1), ('DOUBLE', 1), ('TRIPLE', 1), ('OTHER', 2)):
+        row = booking(seat, ticket_id=ticket_id)
+        conn.execute("""
+            INSERT INTO bookings (ticket_id, name, age, phone, departure, destination, date, time, seat, fare)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (row['ticket_id'], row['name'], row['age'], row['phone'], row['departure'], row['destination'],
+              row['date'], row['time'], row['seat'], row['fare']))
+    conn.commit()
+    conn.close()
+
+    monkeypatch.setattr(SQLiteDatabaseManager, '_db_path', None)
+    monkeypatch.setattr(SQLiteDatabaseManager, '_local', threading.local())
+    SQLiteDatabaseManager.initialize_pool(path)
+    try:
+        statuses = {row['ticket_id']: row['status'] for row in SQLiteDatabaseManager.get_all_bookings()}
+        assert statuses == {'OLDEST': 'confirmed', 'DOUBLE': 'cancelled', 'TRIPLE': 'cancelled', 'OTHER': 'confirmed'}
+        assert SQLiteDatabaseManager.reserve_seat(booking(1)) is None
+    finally:
+        SQLiteDatabaseManager._local.conn.close()
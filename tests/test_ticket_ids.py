@@ -0,0 +1,57 @@
+import pytest
+
+from ticket_ids import ALPHABET, TICKET_ID_LENGTH, TicketIdGenerator
+
+def test_generated_ids_are_unique_and_valid():
+    generator = TicketIdGenerator(worker_id=7)
+    ids = [generator.generate() for _ in range(5000)]
+    assert len(set(ids)) == len(ids)
+    assert all(len(ticket_id) == TICKET_ID_LENGTH and TicketIdGenerator.is_valid(ticket_id) for ticket_id in ids)
+
+def test_generators_with_different_workers_never_collide():
+    first, second = TicketIdGenerator(worker_id=1), TicketIdGenerator(worker_id=2)
+    assert not {first.generate() for _ in range(2000)} & {second.generate() for _ in range(2000)}
+
+def test_check_character_catches_every_single_character_typo():
+    ticket_id = TicketIdGenerator(worker_id=3).generate()
+    for i, char in enumerate(ticket_id):
+        for replacement in ALPHABET.replace(char, ''):
+            assert not TicketIdGenerator.is_valid(ticket_id[:i] + replacement + ticket_id[i + 1:])
+
+def test_check_character_catches_swapped_neighbours():
+    ticket_id = '2J5JBVG5298JJ'
+    assert TicketIdGenerator.is_valid(ticket_id)
+    for i in range(len(ticket_id) - 1):
+        if ticket_id[i] != ticket_id[i + 1]:
+            assert not TicketIdGenerator.is_valid(ticket_id[:i] + ticket_id[i + 1] + ticket_id[i] + ticket_id[i + 2:])
+
+def test_normalize_accepts_how_people_type_ids():
+    ticket_id = TicketIdGenerator(worker_id=5).generate()
+    typed = ' ' + '-'.join([ticket_id[:4], ticket_id[4:8], ticket_id[8:]]).lower() + ' '
+    assert TicketIdGenerator.normalize(typed) == ticket_id
+    assert TicketIdGenerator.normalize('o1l-i') == '0111'
+
+def test_legacy_hex_ids_are_still_valid():
+    assert TicketIdGenerator.is_valid('1A2B3C4D')
+    assert not TicketIdGenerator.is_valid('1A2B3C4')
+
+def test_worker_id_from_the_environment(monkeypatch):
+    monkeypatch.setenv('TICKET_WORKER_ID', '1023')
+    assert TicketIdGenerator().worker_id == 1023
+    monkeypatch.setenv('TICKET_WORKER_ID', '1024')
+    with pytest.raises(ValueError):
+        TicketIdGenerator()
+
+def test_booking_retries_a_ticket_id_that_is_already_taken(sqlite_db, load_api, monkeypatch):
+    index = load_api(SQLITE_PATH=sqlite_db)
+    client = index.app.test_client()
+    body = {'name': 'Tendai', 'age': 30, 'phone': '0771000000', 'departure': 'Bulawayo',
+            'destination': 'Harare', 'date': '2099-01-01', 'time': '08:00 AM'}
+    taken = client.post('/api/bookings', json=dict(body, seat=1)).get_json()['ticket_id']
+
+    generate = index._ticket_ids.generate
+    clashes = iter([taken])
+    monkeypatch.setattr(index._ticket_ids, 'generate', lambda: next(clashes, None) or generate())
+    response = client.post('/api/bookings', json=dict(body, seat=2))
+    assert response.status_code == 201
+    assert response.get_json()['ticket_id'] != taken
@@ -0,0 +1,66 @@
+from sqlite_manager import SQLiteDatabaseManager
+from waitlist import Waitlist
+
+JOURNEY = ('Bulawayo', 'Harare', '2099-01-01', '08:00 AM')
+DETAILS = {'name': 'Tendai', 'age': 30, 'phone': '0771000000', 'departure': 'Bulawayo',
+           'destination': 'Harare', 'date': '2099-01-01', 'time': '08:00 AM'}
+
+def test_customers_are_promoted_in_order():
+    waitlist = Waitlist()
+    first, position = waitlist.join(JOURNEY, dict(DETAILS, name='First'))
+    second, _ = waitlist.join(JOURNEY, dict(DETAILS, name='Second'))
+    assert position == 1
+    assert waitlist.get(second)['position'] == 2
+
+    promoted = waitlist.promote(JOURNEY, 'TICKET1')
+    assert (promoted['waitlist_id'], promoted['ticket_id'], promoted['status']) == (first, 'TICKET1', 'promoted')
+    assert waitlist.get(first)['position'] is None
+    assert waitlist.get(second)['position'] == 1
+    assert waitlist.promote(JOURNEY, 'TICKET2')['waitlist_id'] == second
+    assert waitlist.promote(JOURNEY, 'TICKET3') is None
+
+def test_leaving_the_queue_moves_everyone_up():
+    waitlist = Waitlist()
+    first, _ = waitlist.join(JOURNEY, DETAILS)
+    second, _ = waitlist.join(JOURNEY, DETAILS)
+    assert waitlist.leave(first)
+    assert not waitlist.leave(first)
+    assert waitlist.get(first)['status'] == 'cancelled'
+    assert waitlist.get(second)['position'] == 1
+    assert waitlist.promote(JOURNEY, 'TICKET1')['waitlist_id'] == second
+
+def test_queues_are_per_journey():
+    waitlist = Waitlist()
+    waitlist.join(JOURNEY, DETAILS)
+    assert waitlist.promote(JOURNEY[:3] + ('02:00 PM',), 'TICKET1') is None
+
+def test_sqlite_cancellation_books_the_seat_for_the_first_waiting_customer(sqlite_db):
+    booking = dict(DETAILS, ticket_id='CANCELLED', seat=1, fare=15, status='confirmed')
+    SQLiteDatabaseManager.reserve_seat(booking)
+    assert SQLiteDatabaseManager.join_waitlist(dict(DETAILS, waitlist_id='first', name='First', fare=15), 1) == 1
+    assert SQLiteDatabaseManager.join_waitlist(dict(DETAILS, waitlist_id='second', name='Second', fare=15), 1) == 2
+
+    assert SQLiteDatabaseManager.cancel_booking('CANCELLED', 'PROMOTED')
+    promoted = SQLiteDatabaseManager.get_booking('PROMOTED')
+    assert (promoted['name'], promoted['seat'], promoted['status']) == ('First', 1, 'confirmed')
+    assert SQLiteDatabaseManager.get_waitlist_entry('first')['ticket_id'] == 'PROMOTED'
+    assert SQLiteDatabaseManager.get_waitlist_entry('second')['position'] == 1
+    assert not SQLiteDatabaseManager.cancel_booking('CANCELLED', 'AGAIN')
+    assert SQLiteDatabaseManager.get_booking('AGAIN') is None
+
+def test_waitlist_endpoints_promote_on_cancellation(load_api):
+    client = load_api().app.test_client()
+    total_seats = client.get('/api/config').get_json()['total_seats']
+    assert client.post('/api/waitlist', json=DETAILS).status_code == 409
+
+    passengers = [dict(name='Passenger', age=30, phone='0771000000', seat=seat) for seat in range(1, total_seats + 1)]
+    bookings = client.post('/api/bookings/batch', json=dict(DETAILS, passengers=passengers)).get_json()['bookings']
+    joined = client.post('/api/waitlist', json=DETAILS)
+    assert joined.status_code == 201
+    assert joined.get_json()['position'] == 1
+
+    client.delete(f"/api/bookings/{bookings[4]['ticket_id']}")
+    entry = client.get(f"/api/waitlist/{joined.get_json()['waitlist_id']}").get_json()
+    assert entry['status'] == 'promoted'
+    promoted = client.get(f"/api/bookings/{entry['ticket_id']}").get_json()
+    assert (promoted['seat'], promoted['status']) == (5, 'confirmed')
@@ -0,0 +1,98 @@
+import os
+import random
+import re
+import secrets
+import threading
+import time
+from typing import Optional
+
+# Crockford base32: digits and letters without I, L, O and U
+ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+_VALUES = {char: value for value, char in enumerate(ALPHABET)}
+# Read-alikes accepted on input, per Crockford
+_ALIASES = str.maketrans({'I': '1', 'L': '1', 'O': '0'})
+
+EPOCH_MS = 1704067200000  # 2024-01-01T00:00:00Z
+TIME_BITS = 40            # milliseconds, good until 2058
+WORKER_BITS = 10
+SEQUENCE_BITS = 10
+PAYLOAD_LENGTH = (TIME_BITS + WORKER_BITS + SEQUENCE_BITS) // 5
+TICKET_ID_LENGTH = PAYLOAD_LENGTH + 1
+
+# How many fresh IDs an insert tries before a ticket ID clash is reported as an error
+TICKET_ID_ATTEMPTS = 3
+
+# IDs minted before this generator: 8 upper-case hex digits
+_LEGACY_TICKET_ID = re.compile(r'[0-9A-F]{8}')
+
+def _check_symbol(payload: str) -> str:
+    # Luhn mod 32: catches every single mistyped character and most swaps of neighbours
+    total = 0
+    factor = 2
+    for char in reversed(payload):
+        addend = factor * _VALUES[char]
+        total += addend // 32 + addend % 32
+        factor = 3 - factor
+    return ALPHABET[(32 - total % 32) % 32]
+
+class TicketIdGenerator:
+    """Unique ticket IDs without a database round trip
+
+    An ID is 60 bits -- milliseconds since 2024, a worker ID and a
+    per-millisecond sequence -- written as 12 Crockford base32 characters,
+    followed by one check character. IDs from one generator never repeat
+    (the clock is never allowed to go backwards), and generators with
+    different worker IDs never collide. Set ``TICKET_WORKER_ID`` (0-1023)
+    per process to guarantee that; it is required when several instances
+    share a database. Without it each process draws a worker ID from the OS
+    random source and starts every millisecond at a random sequence number,
+    so two processes can still clash on the same millisecond; inserts retry
+    those with a fresh ID (TICKET_ID_ATTEMPTS).
+    """
+
+    def __init__(self, worker_id: Optional[int] = None):
+        if worker_id is None:
+            configured = os.environ.get('TICKET_WORKER_ID')
+            worker_id = int(configured) if configured else secrets.randbits(WORKER_BITS)
+        if not 0 <= worker_id < 1 << WORKER_BITS:
+            raise ValueError(f"Worker ID must be between 0 and {(1 << WORKER_BITS) - 1}")
+        self.worker_id = worker_id
+        self._last_ms = -1
+        self._sequence = 0
+        self._first_sequence = 0
+        self._lock = threading.Lock()
+
+    def _next(self) -> int:
+        with self._lock:
+            now = int(time.time() * 1000) - EPOCH_MS
+            if now > self._last_ms:
+                self._last_ms = now
+                self._first_sequence = self._sequence = random.getrandbits(SEQUENCE_BITS)
+            else:
+                # Same millisecond, or the clock stepped back: keep counting
+                self._sequence = (self._sequence + 1) % (1 << SEQUENCE_BITS)
+                if self._sequence == self._first_sequence:
+                    # Sequence space used up; borrow the next millisecond
+                    self._last_ms += 1
+            return ((self._last_ms << (WORKER_BITS + SEQUENCE_BITS))
+                    | (self.worker_id << SEQUENCE_BITS) | self._sequence)
+
+    def generate(self) -> str:
+        """Mint a new ticket ID"""
+        value = self._next()
+        payload = ''.join(ALPHABET[(value >> shift) & 31] for shift in range(5 * (PAYLOAD_LENGTH - 1), -1, -5))
+        return payload + _check_symbol(payload)
+
+    @staticmethod
+    def normalize(ticket_id: str) -> str:
+        """Canonical form of a typed ticket ID: upper case, no spaces or hyphens, I/L -> 1, O -> 0"""
+        return ticket_id.strip().upper().replace('-', '').replace(' ', '').translate(_ALIASES)
+
+    @staticmethod
+    def is_valid(ticket_id: str) -> bool:
+        """Check a normalized ticket ID's format and check character (legacy 8-hex IDs pass on format)"""
+        if _LEGACY_TICKET_ID.fullmatch(ticket_id):
+            return True
+        if len(ticket_id) != TICKET_ID_LENGTH or any(char not in _VALUES for char in ticket_id):
+            return False
+        return _check_symbol(ticket_id[:-1]) == ticket_id[-1]
@@ -0,0 +1,76 @@
+import datetime
+import secrets
+import threading
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+
+from seat_inventory import Journey
+
+class Waitlist:
+    """Per-journey FIFO waitlists for the in-memory booking store
+
+    The in-memory counterpart of the ``waitlist`` table. Each journey keeps
+    a deque of waiting entry IDs, so promoting the head of the queue when a
+    seat is freed is O(1); leaving the queue and looking up a position scan
+    only that journey's queue.
+    """
+
+    def __init__(self):
+        self._queues: Dict[Journey, Deque[str]] = {}
+        self._entries: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def join(self, journey: Journey, details: Dict) -> Tuple[str, int]:
+        """Add a customer to the end of a journey's queue; returns the waitlist ID and position"""
+        with self._lock:
+            waitlist_id = secrets.token_hex(16)
+            self._entries[waitlist_id] = dict(details, waitlist_id=waitlist_id, status='waiting', ticket_id=None,
+                                              created_at=datetime.datetime.now().isoformat())
+            queue = self._queues.setdefault(journey, deque())
+            queue.append(waitlist_id)
+            return waitlist_id, len(queue)
+
+    def get(self, waitlist_id: str) -> Optional[Dict]:
+        """Get a copy of an entry, with its queue position while it is waiting"""
+        with self._lock:
+            entry = self._entries.get(waitlist_id)
+            if entry is None:
+                return None
+            position = None
+            if entry['status'] == 'waiting':
+                position = self._queues[self._journey(entry)].index(waitlist_id) + 1
+            return dict(entry, position=position)
+
+    def leave(self, waitlist_id: str) -> bool:
+        """Take a customer who is still waiting out of the queue"""
+        with self._lock:
+            entry = self._entries.get(waitlist_id)
+            if entry is None or entry['status'] != 'waiting':
+                return False
+            entry['status'] = 'cancelled'
+            self._remove(self._journey(entry), waitlist_id)
+            return True
+
+    def promote(self, journey: Journey, ticket_id: str) -> Optional[Dict]:
+        """Take the first waiting customer off a journey's queue, marking them booked under ``ticket_id``"""
+        with self._lock:
+            queue = self._queues.get(journey)
+            if not queue:
+                return None
+            entry = self._entries[queue.popleft()]
+            if not queue:
+                del self._queues[journey]
+            entry['status'] = 'promoted'
+            entry['ticket_id'] = ticket_id
+            entry['promoted_at'] = datetime.datetime.now().isoformat()
+            return dict(entry)
+
+    @staticmethod
+    def _journey(entry: Dict) -> Journey:
+        return (entry['departure'], entry['destination'], entry['date'], entry['time'])
+
+    def _remove(self, journey: Journey, waitlist_id: str):
+        queue = self._queues[journey]
+        queue.remove(waitlist_id)
+        if not queue:
+            del self._queues[journey]